@@ -0,0 +1,38 @@
+# ai_providers/aloop.py
+# Jedan dugovecni event loop u pozadinskoj niti za async HTTP klijente (Groq, Ollama). asgiref pravi
+# nov loop za svaki Flask zahtev, pa bi klijent vezan za loop zahteva svaki put otvarao nove konekcije
+# (i nikad ih ne bi zatvorio); ovde klijent i njegov pool konekcija zive koliko i proces.
+import os, asyncio, threading
+
+_loop = None
+_lock = threading.Lock()
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    global _loop
+    with _lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="llm-http", daemon=True).start()
+            _loop = loop
+    return _loop
+
+
+#nit se ne prenosi u fork-ovan proces (gunicorn --preload); dete pravi svoj loop i klijente
+def _after_fork():
+    global _loop
+    _loop = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+def loop_id() -> int:
+    """Changes after a fork, so callers can drop clients made for the parent's loop."""
+    return id(_get_loop())
+
+
+async def run(coro):
+    """Await coro on the shared loop from any other event loop; cancelling the caller cancels it there too."""
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, _get_loop()))
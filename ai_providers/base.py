@@ -1,4 +1,6 @@
+import json, asyncio
 from abc import ABC, abstractmethod
+from .json_extract import json_list_or_empty
 class AIProvider(ABC):
     @abstractmethod
     def summarize(self, text: str) -> dict:
@@ -22,3 +24,77 @@ class AIProvider(ABC):
         """
         Return {correct: bool, reason: str}
         """
+
+    def grade_freeform_batch(self, items: list) -> list:
+        """
+        items: list[{question, ground_truth, user_answer}]
+        Return list[{correct: bool, reason: str}] in the same order.
+        Default grades one by one; LLM providers override with a single call.
+        """
+        return [self.grade_freeform(it.get("question", ""), it.get("ground_truth", ""),
+                                    it.get("user_answer", "")) for it in items]
+
+    #ocenjivanje svih slobodnih odgovora jednim pozivom (zajednicko za LLM provajdere)
+    @staticmethod
+    def _batch_request(items: list) -> str:
+        return json.dumps({"items": [
+            {"id": i, "question": it.get("question", ""), "ground_truth": it.get("ground_truth", ""),
+             "user_answer": it.get("user_answer", "")}
+            for i, it in enumerate(items)
+        ]}, ensure_ascii=False)
+
+    #rezultati po id-u; None za stavke koje model nije vratio ispravno
+    @staticmethod
+    def _parse_batch(content: str, n: int) -> list:
+        out = [None] * n
+        for obj in json_list_or_empty(content):
+            if not isinstance(obj, dict) or "correct" not in obj:
+                continue
+            try:
+                i = int(obj.get("id"))
+            except (TypeError, ValueError):
+                continue
+            if 0 <= i < n and out[i] is None:
+                out[i] = {"correct": bool(obj.get("correct")), "reason": obj.get("reason", "")}
+        return out
+
+    #pojedinacni poziv samo za stavke koje batch nije vratio; greske poziva idu dalje pozivaocu
+    def _grade_missing(self, items: list, results: list) -> list:
+        for i, res in enumerate(results):
+            if res is None:
+                it = items[i]
+                results[i] = self.grade_freeform(it.get("question", ""), it.get("ground_truth", ""),
+                                                 it.get("user_answer", ""))
+        return results
+
+    #redom, ne sve odjednom: neparsiran batch ne sme da postane N istovremenih zahteva
+    async def _agrade_missing(self, items: list, results: list) -> list:
+        for i, res in enumerate(results):
+            if res is None:
+                it = items[i]
+                results[i] = await self.agrade_freeform(it.get("question", ""), it.get("ground_truth", ""),
+                                                        it.get("user_answer", ""))
+        return results
+
+    def summarize_stream(self, text: str):
+        """Yield summary text in pieces; default yields the whole summary at once."""
+        yield self.summarize(text).get("summary", "")
+
+    # ---- async varijante ----
+    # Podrazumevano pokrecu sync metodu u thread pool-u; provajderi sa pravim
+    # async klijentom (Groq, Ollama) ih prepisuju.
+
+    async def asummarize(self, text: str) -> dict:
+        return await asyncio.to_thread(self.summarize, text)
+
+    async def agenerate_quiz(self, text: str, config: dict) -> list:
+        return await asyncio.to_thread(self.generate_quiz, text, config)
+
+    async def agrade_freeform(self, question: str, ground_truth: str, user_answer: str) -> dict:
+        return await asyncio.to_thread(self.grade_freeform, question, ground_truth, user_answer)
+
+    async def agrade_freeform_batch(self, items: list) -> list:
+        return await asyncio.to_thread(self.grade_freeform_batch, items)
+
+    async def amake_flashcards(self, text: str, n: int) -> list:
+        return await asyncio.to_thread(self.make_flashcards, text, n)
@@ -0,0 +1,68 @@
+# ai_providers/factory.py
+# Izbor LLM backend-a preko AI_PROVIDER: groq | ollama | stub | auto (groq ako postoji kljuc, inace stub).
+import os, threading
+
+
+def provider_name() -> str:
+    name = (os.getenv("AI_PROVIDER") or "auto").strip().lower()
+    if name == "auto":
+        return "groq" if os.getenv("GROQ_API_KEY") else "stub"
+    return name
+
+
+def create_provider(name: str = None):
+    """Build the configured provider; raises if its client can't be created (e.g. no Groq key).
+
+    Unknown names and "stub" give the LocalStub, which also has a local
+    _chat/_achat for services that call them directly (coach, summarizer).
+    """
+    name = name or provider_name()
+    if name == "ollama":
+        from .ollama_provider import OllamaProvider
+        return OllamaProvider()
+    if name == "groq":
+        from .groq_provider import GroqProvider
+        return GroqProvider(model=os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile"))
+    from .local_stub import LocalStub
+    return LocalStub()
+
+
+class _LazyProvider:
+    """One service's provider, built on first use (double-checked lock) and replaceable via set()."""
+
+    def __init__(self, label: str):
+        self.label = label
+        self._provider = None
+        self._name = "stub"
+        self._lock = threading.Lock()   # prvi zahtevi iz vise niti ne smeju da naprave dva klijenta
+
+    def get(self):
+        if self._provider is not None:
+            return self._provider
+        with self._lock:
+            if self._provider is None:
+                name = provider_name()
+                try:
+                    self._provider = create_provider(name)
+                    self._name = name
+                except Exception as e:
+                    print(f"{name} init failed in {self.label}:", e)
+                    from .local_stub import LocalStub
+                    self._provider, self._name = LocalStub(), "stub"
+        return self._provider
+
+    #zamena spolja (benchmark, testovi); None vraca izbor po AI_PROVIDER pri sledecem pozivu
+    def set(self, provider, name: str = None):
+        with self._lock:
+            self._provider = provider
+            self._name = name or "stub"
+
+    def name(self) -> str:
+        self.get()
+        return self._name
+
+
+#provajder (i groq/httpx import) se pravi tek pri prvom pozivu, ne pri importu servisa
+def lazy_provider(label: str) -> _LazyProvider:
+    """Lazy per-service provider: .get(), .set(provider, name) and .name()."""
+    return _LazyProvider(label)
@@ -1,147 +1,234 @@
 # ai_providers/groq_provider.py
-import json, time
-from groq import Groq
+import json, time, threading
+from groq import Groq, AsyncGroq, DefaultAsyncHttpxClient
 from .base import AIProvider
+from .json_extract import extract_json, sanitize_json, json_list_or_empty
+from .prompts import (SYSTEM_QUIZ, SYSTEM_GRADER, SYSTEM_GRADER_BATCH, SYSTEM_SUMMARIZER, SYSTEM_CARDS,
+                      JSON_MODE_SUFFIX)
 import os
 from groq._exceptions import RateLimitError 
+import metrics
+import tracing
+import deadlines
+from . import routing, aloop
 
-SYSTEM_QUIZ = (
-  "You are a quiz generator. Use ONLY the provided context. "
-  "Language: detect the context language and write questions in that language. "
-  "Respect EXACT COUNTS per type: return exactly counts.mcq MCQ, counts.tf TF, "
-  "counts.short short-answer, and counts.fill cloze questions. "
-  "Distribute the requested difficulties (easy|medium|hard) across the returned items; "
-  "if some difficulty is missing in the request, do not use it. "
-  "If the context truly lacks material, return fewer ONLY for that type (but never more). "
-  "Output STRICT JSON array; each item is an object with fields: "
-  "{kind('mcq'|'tf'|'short'|'fill'), difficulty('easy'|'medium'|'hard'), "
-  "prompt, options(pipe-delimited for mcq/tf), correct, explanation}. "
-  "No extra text."
-)
-
-SYSTEM_GRADER = (
-  "You are an intelligent, fair grader for short/freeform quiz answers. "
-  "Return a STRICT JSON object: {\"correct\": true|false, \"reason\": \"...\"}. "
-  "Compare the student's answer ('user_answer') with the reference ('ground_truth'). "
-  "Accept answers that are correct in meaning, even if phrased differently, contain synonyms, "
-  "or differ slightly in word form, grammar, or word order. "
-  "Mark as correct if the student's answer conveys the same factual content or concept "
-  "as the ground truth, even if it's not identical textually. "
-  "Be tolerant to synonyms, abbreviations, and equivalent terminology. "
-  "Mark as incorrect only if the meaning is factually wrong or misses the key idea entirely. "
-  "Reason field must briefly explain why it was marked correct or incorrect. "
-  "Write explanations in the same language as the question."
-)
-
-SYSTEM_SUMMARIZER = (
-        "You are a world-class academic summarizer and study coach.\n"
-        "Write EVERYTHING in the SAME language as the input text. "
-        "If the input is Serbian, use Serbian (including headings). "
-        "Be concise, precise, and exam-focused. "
-        "If information is missing or unclear, explicitly state that rather than inventing content."
-        "If the text is very short (<100 words), return it verbatim as the summary."
-        "Find key concepts, terms, and names, and include them in the summary. Summary must contain at least" \
-        " 15 percent of words in text that are the most important.\n"
-        )
-
-SYSTEM_CARDS = (
-        "You are a flashcard generator that ONLY uses the provided context. "
-        "DETECT the language of the context and write the flashcards in that same language. "
-        "Return a STRICT JSON array of objects: [{\"front\": \"...\", \"back\": \"...\"}]. "
-        "Rules:\n"
-        "- Max {count} cards; return fewer only if the context truly lacks distinct facts.\n"
-        "- One atomic concept per card (definition, key idea, formula, step, cause→effect, term→example).\n"
-        "- Avoid duplicates, trivia, or vague statements; prefer syllabus-level facts and terminology.\n"
-        "- Keep it concise: each side ≤ 25 words; no markdown, no quotes, no numbering.\n"
-        "- Prefer fronts as short prompts/questions; backs as precise answers.\n"
-        "- If the context is long, prioritize: core definitions, theorems/rules, constraints, procedures, edge-cases.\n"
-        "- DO NOT invent facts not grounded in the context.\n"
-        "- Keep total output compact (token-aware). "
-        )
-
-
-#Cistimo LLM output da bismo izvukli JSON
+# gornja granica jednog poziva; rok zahteva (deadlines) je moze dodatno skratiti
+GROQ_TIMEOUT = float(os.getenv("GROQ_TIMEOUT", "60"))
+
+#Cistimo LLM output da bismo izvukli JSON (linearno, vidi json_extract)
 def _sanitize_json(txt: str) -> str:
-    if not txt:
-        return "[]"
-    t = txt.strip()
-    
-    if t.startswith("```"):
-        t = t.strip("`")
-        if t.lower().startswith("json"):
-            t = t[4:].strip()
-
-    start = min([i for i in [t.find("["), t.find("{")] if i != -1], default=-1)
-    if start == -1:
-        return "[]"
-    for end in range(len(t), start, -1):
-        chunk = t[start:end].strip()
-        try:
-            json.loads(chunk)
-            return chunk
-        except Exception:
-            continue
-    return "[]"
+    return sanitize_json(txt)
 
 
 #Parsiranje JSON liste ili vracanje prazne liste
 def _json_list_or_empty(txt: str):
-        try:
-            data = json.loads(_sanitize_json(txt))
-            return data if isinstance(data, list) else []
-        except Exception:
-            return []
+    return json_list_or_empty(txt)
+
+
+def _usage(usage):
+    if usage is None:
+        return 0, 0
+    return getattr(usage, "prompt_tokens", 0) or 0, getattr(usage, "completion_tokens", 0) or 0
+
 
 class GroqProvider(AIProvider):
-    def __init__(self, model: str = "llama-3.3-70b-versatile"):
+    def __init__(self, model: str = "llama-3.3-70b-versatile", json_mode: bool = None):
         api_key = os.getenv("GROQ_API_KEY")
-        self.client = Groq(api_key=api_key)
+        # SDK ne ponavlja sam (max_retries=0): retry i fallback model su u _chat, u okviru roka zahteva
+        self.client = Groq(api_key=api_key, timeout=GROQ_TIMEOUT, max_retries=0)
         self.model = model
+        # structured output (response_format=json_object) za kviz, kartice i ocenjivanje
+        self.json_mode = os.getenv("GROQ_JSON_MODE") == "1" if json_mode is None else json_mode
         self.fallback_model = os.getenv("GROQ_FALLBACK_MODEL", "llama-3.1-8b-instant")
+        # mali model za operacije koje routing salje na "small" (vidi routing.py)
+        self.small_model = os.getenv("GROQ_SMALL_MODEL", "llama-3.1-8b-instant")
+        # async klijent zivi na zajednickom loop-u (aloop), pa se konekcije ponovo koriste izmedju zahteva
+        self._api_key = api_key
+        self._aclient_for = (None, None)   # (loop_id, klijent)
+        self._aclient_lock = threading.Lock()
+
+    def _aclient(self) -> AsyncGroq:
+        with self._aclient_lock:
+            loop_id, client = self._aclient_for
+            if client is None or loop_id != aloop.loop_id():
+                client = AsyncGroq(api_key=self._api_key, http_client=DefaultAsyncHttpxClient(), timeout=GROQ_TIMEOUT,
+                                   max_retries=0)
+                self._aclient_for = (aloop.loop_id(), client)
+        return client
+
+    #tier=None: routing bira nivo po operaciji i velicini prompta; inace ga je izabrao pozivalac
+    #(reason je tada razlog koji pozivalac prenosi u trace)
+    def _route(self, op: str, system: str, user: str, tier: str = None, reason: str = None) -> tuple:
+        if tier is None:
+            tier, reason = routing.route(op, system, user)
+        return tier, (self.small_model if tier == "small" else self.model), reason or "caller"
 
 #chat vraca odgovor iz LLM-a
-    def _chat(self, system: str, user: str, retries: int = 2) -> str:
+    def _chat(self, system: str, user: str, retries: int = 2, json_out: bool = False, op: str = "chat",
+              tier: str = None, reason: str = None) -> str:
         #retries -  broj pokusaja ako API vrati gresku
         last = ""
-        model_to_use = self.model
+        tier, model_to_use, reason = self._route(op, system, user, tier, reason)
+        for i in range(retries + 1):
+            try:
+                t0 = time.perf_counter()
+                with tracing.span("llm", provider="groq", model=model_to_use, op=op, attempt=i, route=reason):
+                    resp = self.client.chat.completions.create(
+                        model=model_to_use,
+                        timeout=deadlines.timeout(GROQ_TIMEOUT),
+                        messages=[{"role":"system","content":system},
+                                  {"role":"user","content":user}],
+                        temperature=0.2,
+                        **self._format_kwargs(json_out),
+                    )
+                self._record(model_to_use, op, tier, time.perf_counter() - t0, resp.usage)
+                last = resp.choices[0].message.content or ""
+                if "{" in last or "[" in last:
+                    break
+                return last
+            except RateLimitError as e:
+                if model_to_use != self.fallback_model:
+                    metrics.inc("rate_limit_fallbacks_total", model=model_to_use, op=op)
+                    model_to_use = self.fallback_model
+                    continue
+                if i == retries:
+                    raise
+                deadlines.sleep(1.5 * (i + 1))
+            except deadlines.DeadlineExceeded:
+                raise
+            except Exception:
+                metrics.inc("llm_errors_total", provider="groq", op=op)
+                if i == retries:
+                    raise
+                deadlines.sleep(0.8 * (i + 1))
+        return last
+
+    #async verzija _chat-a, ista logika retry-a i fallback modela
+    async def _achat(self, system: str, user: str, retries: int = 2, json_out: bool = False,
+                     op: str = "chat", tier: str = None, reason: str = None) -> str:
+        last = ""
+        tier, model_to_use, reason = self._route(op, system, user, tier, reason)
         for i in range(retries + 1):
             try:
-                resp = self.client.chat.completions.create(
-                    model=model_to_use,
-                    messages=[{"role":"system","content":system},
-                              {"role":"user","content":user}],
-                    temperature=0.2,
-                )
+                t0 = time.perf_counter()
+                with tracing.span("llm", provider="groq", model=model_to_use, op=op, attempt=i, route=reason):
+                    resp = await aloop.run(self._aclient().chat.completions.create(
+                        model=model_to_use,
+                        timeout=deadlines.timeout(GROQ_TIMEOUT),
+                        messages=[{"role":"system","content":system},
+                                  {"role":"user","content":user}],
+                        temperature=0.2,
+                        **self._format_kwargs(json_out),
+                    ))
+                self._record(model_to_use, op, tier, time.perf_counter() - t0, resp.usage)
                 last = resp.choices[0].message.content or ""
                 if "{" in last or "[" in last:
                     break
                 return last
             except RateLimitError as e:
                 if model_to_use != self.fallback_model:
+                    metrics.inc("rate_limit_fallbacks_total", model=model_to_use, op=op)
                     model_to_use = self.fallback_model
                     continue
                 if i == retries:
                     raise
-                time.sleep(1.5 * (i + 1))
+                await deadlines.asleep(1.5 * (i + 1))
+            except deadlines.DeadlineExceeded:
+                raise
             except Exception:
+                metrics.inc("llm_errors_total", provider="groq", op=op)
                 if i == retries:
                     raise
-                time.sleep(0.8 * (i + 1))
+                await deadlines.asleep(0.8 * (i + 1))
         return last
 
+    def _record(self, model: str, op: str, tier: str, seconds: float, usage):
+        prompt_tokens, completion_tokens = _usage(usage)
+        metrics.record_llm("groq", model, op, seconds, prompt_tokens, completion_tokens)
+        # posle rate-limit fallback-a poziv nije isao na izabrani nivo, pa se ne racuna u prosek
+        if model == (self.small_model if tier == "small" else self.model):
+            routing.record(op, tier, seconds, prompt_tokens + completion_tokens)
+
+    #JSON operacije: ako odgovor malog modela ne prodje proveru, isti zahtev ide na veliki model
+    def _chat_checked(self, system: str, user: str, op: str, valid) -> str:
+        tier, _, reason = self._route(op, system, user)
+        content = self._chat(system, user, json_out=True, op=op, tier=tier, reason=reason)
+        if tier == "small" and not valid(content):
+            routing.escalated(op, "invalid_json")
+            content = self._chat(system, user, json_out=True, op=op, tier="large", reason="escalated")
+        return content
+
+    async def _achat_checked(self, system: str, user: str, op: str, valid) -> str:
+        tier, _, reason = self._route(op, system, user)
+        content = await self._achat(system, user, json_out=True, op=op, tier=tier, reason=reason)
+        if tier == "small" and not valid(content):
+            routing.escalated(op, "invalid_json")
+            content = await self._achat(system, user, json_out=True, op=op, tier="large", reason="escalated")
+        return content
+
+    def _format_kwargs(self, json_out: bool) -> dict:
+        if json_out and self.json_mode:
+            return {"response_format": {"type": "json_object"}}
+        return {}
+
+    #system prompt za JSON liste; u JSON modu trazimo omotac {"items": [...]}
+    def _list_system(self, system: str) -> str:
+        return system + JSON_MODE_SUFFIX if self.json_mode else system
+
+    #stream=True varijanta, vraca tokene kako stizu
+    def _chat_stream(self, system: str, user: str, json_out: bool = False, op: str = "chat", tier: str = None):
+        messages = [{"role":"system","content":system},
+                    {"role":"user","content":user}]
+        kwargs = self._format_kwargs(json_out)
+        tier, model, _ = self._route(op, system, user, tier)
+        t0 = time.perf_counter()
+        try:
+            stream = self.client.chat.completions.create(
+                model=model, messages=messages, temperature=0.2, stream=True,
+                timeout=deadlines.timeout(GROQ_TIMEOUT), **kwargs,
+            )
+        except RateLimitError:
+            metrics.inc("rate_limit_fallbacks_total", model=model, op=op)
+            model = self.fallback_model
+            stream = self.client.chat.completions.create(
+                model=model, messages=messages, temperature=0.2, stream=True,
+                timeout=deadlines.timeout(GROQ_TIMEOUT), **kwargs,
+            )
+        usage = None
+        for chunk in stream:
+            # Groq salje potrosnju tokena u poslednjem chunku (x_groq.usage)
+            usage = getattr(getattr(chunk, "x_groq", None), "usage", None) or usage
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                yield delta
+        self._record(model, op, tier, time.perf_counter() - t0, usage)
+
     
     def summarize(self, text: str) -> dict:
         
-        resp = self._chat(SYSTEM_SUMMARIZER, text)
+        resp = self._chat(SYSTEM_SUMMARIZER, text, op="summary")
+        return self._summary_result(text, resp)
+
+    async def asummarize(self, text: str) -> dict:
+        resp = await self._achat(SYSTEM_SUMMARIZER, text, op="summary")
+        return self._summary_result(text, resp)
+
+    def summarize_stream(self, text: str):
+        yield from self._chat_stream(SYSTEM_SUMMARIZER, text, op="summary")
+
+    @staticmethod
+    def _summary_result(text: str, resp: str) -> dict:
         return {
             "title": "Sažetak" if text.strip()[:30].isascii() is False else "Summary",
             "summary": resp.strip(),
             "word_count": len(resp.split())
         }
 
-
-    def generate_quiz(self, text: str, config: dict) -> list:
-        req = json.dumps({
+    @staticmethod
+    def _quiz_request(text: str, config: dict) -> str:
+        return json.dumps({
             "counts": {
                 "mcq": int(config.get("mcq", 5)),
                 "tf": int(config.get("tf", 5)),
@@ -151,36 +238,94 @@ class GroqProvider(AIProvider):
             "difficulties": [d.lower() for d in config.get("difficulties", ["Easy","Medium","Hard"])],
             "context": text[:8000],
         })
-        content = self._chat(SYSTEM_QUIZ, req)
-        try:
-            data = json.loads(_sanitize_json(content))
-            return data if isinstance(data, list) else []
-        except Exception:
-            return []
 
-    def grade_freeform(self, question: str, ground_truth: str, user_answer: str) -> dict:
-        req = json.dumps({
+    #bar jedno pitanje sa tekstom; inace routing ponavlja zahtev na velikom modelu
+    @staticmethod
+    def _valid_quiz(content: str) -> bool:
+        return any(isinstance(q, dict) and q.get("prompt") for q in _json_list_or_empty(content))
+
+    def generate_quiz(self, text: str, config: dict) -> list:
+        content = self._chat_checked(self._list_system(SYSTEM_QUIZ), self._quiz_request(text, config), "quiz",
+                                     self._valid_quiz)
+        return _json_list_or_empty(content)
+
+    async def agenerate_quiz(self, text: str, config: dict) -> list:
+        content = await self._achat_checked(self._list_system(SYSTEM_QUIZ), self._quiz_request(text, config), "quiz",
+                                            self._valid_quiz)
+        return _json_list_or_empty(content)
+
+    @staticmethod
+    def _grade_request(question: str, ground_truth: str, user_answer: str) -> str:
+        return json.dumps({
             "question": question, "ground_truth": ground_truth, "user_answer": user_answer
         })
-        content = self._chat(SYSTEM_GRADER, req)
-        try:
-            obj = json.loads(_sanitize_json(content))
-            return {"correct": bool(obj.get("correct")), "reason": obj.get("reason","")}
-        except Exception:
+
+    @staticmethod
+    def _parse_grade(content: str) -> dict:
+        obj = extract_json(content)
+        if not isinstance(obj, dict):
             return {"correct": False, "reason": "Parse error"}
-        
+        return {"correct": bool(obj.get("correct")), "reason": obj.get("reason","")}
+
+    @staticmethod
+    def _valid_grade(content: str) -> bool:
+        obj = extract_json(content)
+        return isinstance(obj, dict) and "correct" in obj
+
+    def grade_freeform(self, question: str, ground_truth: str, user_answer: str) -> dict:
+        content = self._chat_checked(SYSTEM_GRADER, self._grade_request(question, ground_truth, user_answer), "grade",
+                                     self._valid_grade)
+        return self._parse_grade(content)
+
+    async def agrade_freeform(self, question: str, ground_truth: str, user_answer: str) -> dict:
+        content = await self._achat_checked(SYSTEM_GRADER, self._grade_request(question, ground_truth, user_answer),
+                                            "grade", self._valid_grade)
+        return self._parse_grade(content)
+
+
+    #ceo batch na velikom modelu je jeftiniji od pojedinacnih poziva za svaku neparsiranu stavku
+    def _valid_batch(self, n: int):
+        return lambda content: None not in self._parse_batch(content, n)
+
+    def grade_freeform_batch(self, items: list) -> list:
+        if not items:
+            return []
+        content = self._chat_checked(self._list_system(SYSTEM_GRADER_BATCH), self._batch_request(items),
+                                     "grade_batch", self._valid_batch(len(items)))
+        return self._grade_missing(items, self._parse_batch(content, len(items)))
+
+    async def agrade_freeform_batch(self, items: list) -> list:
+        if not items:
+            return []
+        content = await self._achat_checked(self._list_system(SYSTEM_GRADER_BATCH), self._batch_request(items),
+                                            "grade_batch", self._valid_batch(len(items)))
+        return await self._agrade_missing(items, self._parse_batch(content, len(items)))
     
     #iz teksta pravi n kartica, koristi do 8000 karaktera teksta
 
     def make_flashcards(self, text: str, n: int) -> list:
         req = json.dumps({"n": int(n), "context": text[:8000]})
-        content = self._chat(SYSTEM_CARDS, req)
-        cards = _json_list_or_empty(content)
+        content = self._chat_checked(self._list_system(SYSTEM_CARDS), req, "cards", self._valid_cards)
+        return self._parse_cards(_json_list_or_empty(content), n)
+
+    async def amake_flashcards(self, text: str, n: int) -> list:
+        req = json.dumps({"n": int(n), "context": text[:8000]})
+        content = await self._achat_checked(self._list_system(SYSTEM_CARDS), req, "cards", self._valid_cards)
+        return self._parse_cards(_json_list_or_empty(content), n)
+
+    @classmethod
+    def _valid_cards(cls, content: str) -> bool:
+        return bool(cls._parse_cards(_json_list_or_empty(content), 1))
+
+    @staticmethod
+    def _parse_cards(cards: list, n: int) -> list:
             # normalizuj shape
         out = []
         for c in cards[:n]:
+            if not isinstance(c, dict):
+                continue
             front = (c.get("front") or "").strip()
             back  = (c.get("back") or "").strip()
             if front and back:
                 out.append({"front": front, "back": back})
-        return out
\ No newline at end of file
+        return out
@@ -0,0 +1,114 @@
+# ai_providers/json_extract.py
+# Izvlacenje JSON-a iz LLM odgovora u linearnom vremenu (raw_decode + skeniranje zagrada).
+import json
+import metrics
+
+_decoder = json.JSONDecoder()
+
+
+def _strip_fences(txt: str) -> str:
+    t = (txt or "").strip()
+    if t.startswith("```"):
+        t = t.strip("`")
+        if t.lower().startswith("json"):
+            t = t[4:].strip()
+    return t
+
+
+#indeks iza zagrade koja zatvara onu na poziciji i, ili -1 ako je tekst odsecen
+def _match_close(t: str, i: int) -> int:
+    depth = 0
+    in_str = False
+    esc = False
+    for j in range(i, len(t)):
+        ch = t[j]
+        if in_str:
+            if esc:
+                esc = False
+            elif ch == "\\":
+                esc = True
+            elif ch == '"':
+                in_str = False
+        elif ch == '"':
+            in_str = True
+        elif ch in "[{":
+            depth += 1
+        elif ch in "]}":
+            depth -= 1
+            if depth == 0:
+                return j + 1
+    return -1
+
+
+#spasava ispravne objekte iz niza koji je odsecen ili delimicno neispravan
+def _recover_items(t: str, pos: int) -> list:
+    items = []
+    n = len(t)
+    while pos < n:
+        ch = t[pos]
+        if ch in " \t\r\n,":
+            pos += 1
+            continue
+        if ch == "]":
+            break
+        if ch != "{":
+            nxt = [k for k in (t.find("{", pos), t.find("]", pos)) if k != -1]
+            if not nxt:
+                break
+            pos = min(nxt)
+            continue
+        try:
+            obj, end = _decoder.raw_decode(t, pos)
+            items.append(obj)
+            pos = end
+        except ValueError:
+            end = _match_close(t, pos)
+            if end == -1:
+                break
+            pos = end
+    return items
+
+
+def extract_json(txt: str):
+    """Return the first JSON value found in txt, salvaging array items; None if nothing usable."""
+    t = _strip_fences(txt)
+    starts = sorted(i for i in (t.find("["), t.find("{")) if i != -1)
+    for start in starts:
+        try:
+            obj, _ = _decoder.raw_decode(t, start)
+            return obj
+        except ValueError:
+            pass
+        if t[start] == "[":
+            items = _recover_items(t, start + 1)
+            if items:
+                return items
+    if t:
+        metrics.inc("json_parse_failures_total")
+    return None
+
+
+def sanitize_json(txt: str) -> str:
+    """String variant of extract_json; '[]' when nothing usable is found."""
+    obj = extract_json(txt)
+    if obj is None:
+        return "[]"
+    return json.dumps(obj, ensure_ascii=False)
+
+
+#JSON mode vraca objekat ({"items": [...]}), pa ga razmotavamo u listu
+def unwrap_list(data):
+    if isinstance(data, list):
+        return data
+    if isinstance(data, dict):
+        for key in ("items", "questions", "cards", "flashcards"):
+            if isinstance(data.get(key), list):
+                return data[key]
+        for v in data.values():
+            if isinstance(v, list):
+                return v
+    return []
+
+
+def json_list_or_empty(txt: str) -> list:
+    return unwrap_list(extract_json(txt))
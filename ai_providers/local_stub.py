@@ -1,4 +1,4 @@
-import re
+import re, json
 from .base import AIProvider
 
 class LocalStub(AIProvider):
@@ -11,6 +11,24 @@ class LocalStub(AIProvider):
         body = ' '.join(sents[:6]) if sents else (text or '')[:600]
         return {'title': 'Content Summary', 'summary': body, 'word_count': len(body.split())}
 
+    # lokalni "chat" bez modela (coach, delovi sazetka): prve recenice dostavljenog teksta;
+    # coach salje JSON, pa se uzima njegov kontekst
+    def _chat(self, system: str, user: str, **kw) -> str:
+        text = user
+        try:
+            obj = json.loads(user)
+            if isinstance(obj, dict):
+                text = str(obj.get('context') or obj.get('question') or '')
+        except ValueError:
+            pass
+        return self.summarize(text)['summary']
+
+    async def _achat(self, system: str, user: str, **kw) -> str:
+        return self._chat(system, user, **kw)
+
+    def _chat_stream(self, system: str, user: str, **kw):
+        yield self._chat(system, user, **kw)
+
     def generate_quiz(self, text: str, config: dict) -> list:
         n_mcq  = int(config.get('mcq', 5))
         n_tf   = int(config.get('tf', 5))
@@ -1,78 +1,303 @@
-import json
+# ai_providers/ollama_provider.py
+# Lokalni backend (Ollama) sa istim metodama kao GroqProvider.
+import os, json, time, asyncio, threading
 import requests
+import httpx
+from requests.adapters import HTTPAdapter
 from .base import AIProvider
+from .json_extract import extract_json, json_list_or_empty
+from .prompts import (SYSTEM_QUIZ, SYSTEM_GRADER, SYSTEM_GRADER_BATCH, SYSTEM_SUMMARIZER, SYSTEM_CARDS,
+                      JSON_MODE_SUFFIX)
+import metrics
+import tracing
+import deadlines
+from . import aloop
+
+OLLAMA_URL = os.getenv("OLLAMA_URL", "http://127.0.0.1:11434/api/chat")
+OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3")
+# koliko dugo server drzi model u memoriji posle poslednjeg poziva (bez ponovnog ucitavanja)
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+# broj istovremenih zahteva; treba da odgovara OLLAMA_NUM_PARALLEL na serveru
+OLLAMA_CONCURRENCY = int(os.getenv("OLLAMA_CONCURRENCY", "2"))
+OLLAMA_TIMEOUT = float(os.getenv("OLLAMA_TIMEOUT", "120"))
+# strimovi nemaju rok zahteva; ovoliko najduze cekaju slobodno mesto, pa ne drze niti radnika beskonacno
+OLLAMA_STREAM_WAIT_S = float(os.getenv("OLLAMA_STREAM_WAIT_S", "30"))
+OLLAMA_NUM_CTX = int(os.getenv("OLLAMA_NUM_CTX", "8192"))
+# ulaz za sazetak celog teksta mora da stane u num_ctx zajedno sa odgovorom
+OLLAMA_SUMMARY_CHARS = int(os.getenv("OLLAMA_SUMMARY_CHARS", "6000"))
+
+# jedan pool konekcija i jedan limit za sve instance u procesu
+_slots = threading.BoundedSemaphore(OLLAMA_CONCURRENCY)
+_session = None
+_session_lock = threading.Lock()
+_aclient_for = (None, None)   # (loop_id, klijent)
+
+
+def _get_session() -> requests.Session:
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(OLLAMA_CONCURRENCY, 1))
+            _session.mount("http://", adapter)
+            _session.mount("https://", adapter)
+    return _session
+
+
+#httpx klijent je vezan za event loop: jedan, na zajednickom loop-u (aloop), za sve zahteve
+def _aclient() -> httpx.AsyncClient:
+    global _aclient_for
+    with _session_lock:
+        loop_id, client = _aclient_for
+        if client is None or loop_id != aloop.loop_id():
+            limits = httpx.Limits(max_connections=OLLAMA_CONCURRENCY, max_keepalive_connections=OLLAMA_CONCURRENCY)
+            client = httpx.AsyncClient(timeout=httpx.Timeout(OLLAMA_TIMEOUT, connect=5.0), limits=limits)
+            _aclient_for = (aloop.loop_id(), client)
+    return client
+
+
+#mesto u limitu, najduze do roka zahteva (ili max_wait kada zahtev nema rok, npr. SSE strim)
+def _acquire(max_wait: float = None):
+    left = deadlines.remaining()
+    if max_wait is not None:
+        left = max_wait if left is None else min(left, max_wait)
+    if not _slots.acquire(timeout=max(left, 0) if left is not None else -1):
+        raise deadlines.exceeded("llm.wait_slot")
+
+
+#async zauzimanje istog limita; ne blokira event loop i bezbedno je pri otkazivanju
+async def _aacquire():
+    delay = 0.005
+    while not _slots.acquire(blocking=False):
+        deadlines.check("llm.wait_slot")
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 0.1)
+
+
+def _content(data: dict) -> str:
+    return (data.get("message") or {}).get("content", "")
+
+
+#Ollama vraca broj tokena u poslednjoj poruci (prompt_eval_count / eval_count)
+def _record(model: str, op: str, t0: float, data: dict):
+    metrics.record_llm("ollama", model, op, time.perf_counter() - t0,
+                       data.get("prompt_eval_count") or 0, data.get("eval_count") or 0)
+
+
+def _parse_grade(content: str) -> dict:
+    obj = extract_json(content)
+    if not isinstance(obj, dict):
+        return {"correct": False, "reason": "Model response parse error"}
+    return {"correct": bool(obj.get("correct")), "reason": obj.get("reason", "")}
+
+def _parse_cards(cards: list, n: int) -> list:
+    out = []
+    for c in cards[:n]:
+        if not isinstance(c, dict):
+            continue
+        front = (c.get("front") or "").strip()
+        back  = (c.get("back") or "").strip()
+        if front and back:
+            out.append({"front": front, "back": back})
+    return out
 
-OLLAMA_URL = "http://127.0.0.1:11434/api/chat"  
-
-SYSTEM_QUIZ = (
-  "You are a quiz generator. From the given context, create questions with answers.\n"
-  "Return STRICT JSON list of objects with keys: kind, difficulty, prompt, options (pipe-delimited for mcq/tf), correct, explanation.\n"
-  "Kinds: mcq|tf|short|fill. Difficulties: easy|medium|hard.\n"
-  "Do not include any text before or after JSON."
-)
-
-SYSTEM_GRADER = (
-  "You are a strict grader for short/freeform answers. Decide if user's answer is correct enough.\n"
-  "Return STRICT JSON object: {\"correct\": true|false, \"reason\": \"...\"}.\n"
-  "Be tolerant to synonyms and minor paraphrasing; focus on factual equivalence."
-)
-
-def _chat(model: str, system: str, user: str) -> str:
-    payload = {
-        "model": model,
-        "messages": [
-            {"role": "system", "content": system},
-            {"role": "user", "content": user},
-        ],
-        "stream": False,
-        "options": {"temperature": 0.2}
-    }
-    r = requests.post(OLLAMA_URL, json=payload, timeout=120)
-    r.raise_for_status()
-    data = r.json()
-    return data.get("message", {}).get("content", "")
 
 class OllamaProvider(AIProvider):
-    def __init__(self, model: str = "llama3"):
-        self.model = model
+    def __init__(self, model: str = None, url: str = None, json_mode: bool = None):
+        self.model = model or OLLAMA_MODEL
+        self.url = url or OLLAMA_URL
+        # format=json za kviz, kartice i ocenjivanje; male lokalne modele drzi u JSON-u
+        self.json_mode = os.getenv("OLLAMA_JSON_MODE", "1") == "1" if json_mode is None else json_mode
+
+    def _payload(self, system: str, user: str, stream: bool = False, json_out: bool = False) -> dict:
+        payload = {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": system},
+                {"role": "user", "content": user},
+            ],
+            "stream": stream,
+            "keep_alive": OLLAMA_KEEP_ALIVE,
+            "options": {"temperature": 0.2, "num_ctx": OLLAMA_NUM_CTX},
+        }
+        if json_out and self.json_mode:
+            payload["format"] = "json"
+        return payload
+
+    #system prompt za JSON liste; u JSON modu trazimo omotac {"items": [...]}
+    def _list_system(self, system: str) -> str:
+        return system + JSON_MODE_SUFFIX if self.json_mode else system
+
+    def _chat(self, system: str, user: str, retries: int = 2, json_out: bool = False, op: str = "chat") -> str:
+        payload = self._payload(system, user, json_out=json_out)
+        for i in range(retries + 1):
+            try:
+                with tracing.span("llm.wait_slot"):
+                    _acquire()
+                try:
+                    t0 = time.perf_counter()
+                    with tracing.span("llm", provider="ollama", model=self.model, op=op, attempt=i):
+                        r = _get_session().post(self.url, json=payload,
+                                                timeout=(5, deadlines.timeout(OLLAMA_TIMEOUT)))
+                finally:
+                    _slots.release()
+                r.raise_for_status()
+                data = r.json()
+                _record(self.model, op, t0, data)
+                return _content(data)
+            except deadlines.DeadlineExceeded:
+                raise
+            except Exception:
+                metrics.inc("llm_errors_total", provider="ollama", op=op)
+                if i == retries:
+                    raise
+                deadlines.sleep(0.8 * (i + 1))
+
+    async def _achat(self, system: str, user: str, retries: int = 2, json_out: bool = False,
+                     op: str = "chat") -> str:
+        payload = self._payload(system, user, json_out=json_out)
+        for i in range(retries + 1):
+            try:
+                with tracing.span("llm.wait_slot"):
+                    await _aacquire()
+                try:
+                    t0 = time.perf_counter()
+                    with tracing.span("llm", provider="ollama", model=self.model, op=op, attempt=i):
+                        r = await aloop.run(_aclient().post(
+                            self.url, json=payload, timeout=httpx.Timeout(deadlines.timeout(OLLAMA_TIMEOUT), connect=5.0)))
+                finally:
+                    _slots.release()
+                r.raise_for_status()
+                data = r.json()
+                _record(self.model, op, t0, data)
+                return _content(data)
+            except deadlines.DeadlineExceeded:
+                raise
+            except Exception:
+                metrics.inc("llm_errors_total", provider="ollama", op=op)
+                if i == retries:
+                    raise
+                await deadlines.asleep(0.8 * (i + 1))
+
+    #NDJSON strim; mesto u limitu se drzi dok strim traje
+    def _chat_stream(self, system: str, user: str, json_out: bool = False, op: str = "chat"):
+        payload = self._payload(system, user, stream=True, json_out=json_out)
+        with tracing.span("llm.wait_slot"):
+            _acquire(OLLAMA_STREAM_WAIT_S)
+        try:
+            t0 = time.perf_counter()
+            with _get_session().post(self.url, json=payload, timeout=(5, OLLAMA_TIMEOUT), stream=True) as r:
+                r.raise_for_status()
+                for line in r.iter_lines():
+                    if not line:
+                        continue
+                    data = json.loads(line)
+                    # greska usred strima (npr. model nije ucitan) stize kao red sa "error" umesto HTTP statusa
+                    if data.get("error"):
+                        metrics.inc("llm_errors_total", provider="ollama", op=op)
+                        raise RuntimeError(f"Ollama error: {data['error']}")
+                    piece = _content(data)
+                    if piece:
+                        yield piece
+                    if data.get("done"):
+                        _record(self.model, op, t0, data)
+                        break
+        finally:
+            _slots.release()
+
+    def warmup(self) -> bool:
+        """Load the model into server memory (empty chat request) so the first real call is fast."""
+        try:
+            with _slots:
+                r = _get_session().post(self.url, json={"model": self.model, "messages": [],
+                                                        "keep_alive": OLLAMA_KEEP_ALIVE},
+                                        timeout=(5, OLLAMA_TIMEOUT))
+            r.raise_for_status()
+            return True
+        except Exception as e:
+            print("Ollama warmup failed:", e)
+            return False
 
     def summarize(self, text: str) -> dict:
-        content = _chat(
-            self.model,
-            "You summarize text in 6 sentences max. Return plain text.",
-            text[:6000]
-        )
-        words = len(content.split())
-        return {"title": "Content Summary", "summary": content, "word_count": words}
+        content = self._chat(SYSTEM_SUMMARIZER, text[:OLLAMA_SUMMARY_CHARS], op="summary")
+        return self._summary_result(text, content)
 
-    def generate_quiz(self, text: str, config: dict) -> list:
+    async def asummarize(self, text: str) -> dict:
+        content = await self._achat(SYSTEM_SUMMARIZER, text[:OLLAMA_SUMMARY_CHARS], op="summary")
+        return self._summary_result(text, content)
+
+    def summarize_stream(self, text: str):
+        yield from self._chat_stream(SYSTEM_SUMMARIZER, text[:OLLAMA_SUMMARY_CHARS], op="summary")
+
+    @staticmethod
+    def _summary_result(text: str, content: str) -> dict:
+        return {
+            "title": "Sažetak" if text.strip()[:30].isascii() is False else "Summary",
+            "summary": content.strip(),
+            "word_count": len(content.split())
+        }
+
+    @staticmethod
+    def _quiz_request(text: str, config: dict) -> str:
         n_mcq  = int(config.get('mcq', 5))
         n_tf   = int(config.get('tf', 5))
         n_short= int(config.get('short', 5))
         n_fill = int(config.get('fill', 5))
         diffs  = config.get('difficulties', ['Easy','Medium','Hard'])
-        req = json.dumps({
+        return json.dumps({
             "counts": {"mcq": n_mcq, "tf": n_tf, "short": n_short, "fill": n_fill},
             "difficulties": [d.lower() for d in diffs],
             "context": text[:8000]
         })
-        content = _chat(self.model, SYSTEM_QUIZ, req)
-        try:
-            items = json.loads(content)
-            assert isinstance(items, list)
-            return items
-        except Exception:
-            return []
 
-    def grade_freeform(self, question: str, ground_truth: str, user_answer: str) -> dict:
-        req = json.dumps({
+    def generate_quiz(self, text: str, config: dict) -> list:
+        content = self._chat(self._list_system(SYSTEM_QUIZ), self._quiz_request(text, config), json_out=True,
+                             op="quiz")
+        return json_list_or_empty(content)
+
+    async def agenerate_quiz(self, text: str, config: dict) -> list:
+        content = await self._achat(self._list_system(SYSTEM_QUIZ), self._quiz_request(text, config), json_out=True,
+                                    op="quiz")
+        return json_list_or_empty(content)
+
+    @staticmethod
+    def _grade_request(question: str, ground_truth: str, user_answer: str) -> str:
+        return json.dumps({
             "question": question,
             "ground_truth": ground_truth,
             "user_answer": user_answer
         })
-        content = _chat(self.model, SYSTEM_GRADER, req)
-        try:
-            obj = json.loads(content)
-            return {"correct": bool(obj.get("correct")), "reason": obj.get("reason","")}
-        except Exception:
-            return {"correct": False, "reason": "Model response parse error"}
+
+    def grade_freeform(self, question: str, ground_truth: str, user_answer: str) -> dict:
+        content = self._chat(SYSTEM_GRADER, self._grade_request(question, ground_truth, user_answer), json_out=True,
+                             op="grade")
+        return _parse_grade(content)
+
+    async def agrade_freeform(self, question: str, ground_truth: str, user_answer: str) -> dict:
+        content = await self._achat(SYSTEM_GRADER, self._grade_request(question, ground_truth, user_answer),
+                                    json_out=True, op="grade")
+        return _parse_grade(content)
+
+    def grade_freeform_batch(self, items: list) -> list:
+        if not items:
+            return []
+        content = self._chat(self._list_system(SYSTEM_GRADER_BATCH), self._batch_request(items), json_out=True,
+                             op="grade_batch")
+        return self._grade_missing(items, self._parse_batch(content, len(items)))
+
+    async def agrade_freeform_batch(self, items: list) -> list:
+        if not items:
+            return []
+        content = await self._achat(self._list_system(SYSTEM_GRADER_BATCH), self._batch_request(items),
+                                    json_out=True, op="grade_batch")
+        return await self._agrade_missing(items, self._parse_batch(content, len(items)))
+
+    def make_flashcards(self, text: str, n: int) -> list:
+        req = json.dumps({"n": int(n), "context": text[:8000]})
+        content = self._chat(self._list_system(SYSTEM_CARDS), req, json_out=True, op="cards")
+        return _parse_cards(json_list_or_empty(content), n)
+
+    async def amake_flashcards(self, text: str, n: int) -> list:
+        req = json.dumps({"n": int(n), "context": text[:8000]})
+        content = await self._achat(self._list_system(SYSTEM_CARDS), req, json_out=True, op="cards")
+        return _parse_cards(json_list_or_empty(content), n)
@@ -0,0 +1,127 @@
+# ai_providers/routing.py
+# Izbor modela po pozivu: "small" za kratke strukturirane zadatke (ocenjivanje, kartice), "large" za
+# duze tekstove (sazetak, kviz, plan, coach). Odluka zavisi od operacije, procene tokena prompta i
+# ciljne latencije; JSON sa malog modela koji ne prodje proveru ponavlja se na velikom (escalate).
+#
+#   LLM_ROUTING=0                        - sve ide na veliki model (staro ponasanje)
+#   LLM_ROUTES=coach=small,cards=large   - podrazumevani nivo po operaciji
+#   LLM_ENDPOINT_ROUTES=quiz_grade=large - nivo za sve pozive jedne Flask rute (endpoint)
+#   LLM_SMALL_MAX_TOKENS=3000            - duzi promptovi uvek idu na veliki model
+#   LLM_LATENCY_TARGET_MS=coach=2500     - ako veliki model za op prosecno prelazi cilj, koristi mali
+#   LLM_LATENCY_PROBE_EVERY=20           - i tada svaki N-ti poziv ide na veliki, da se njegov prosek osvezi
+import os, threading, contextvars
+import metrics
+
+TIERS = ("small", "large")
+
+DEFAULT_ROUTES = {
+    "grade": "small",
+    "grade_batch": "small",
+    "cards": "small",
+    "quiz": "large",
+    "summary": "large",
+    "planner": "large",
+    "coach": "large",
+    "coach_compact": "small",
+    "chat": "large",
+}
+
+# gruba procena: ~4 karaktera po tokenu
+CHARS_PER_TOKEN = 4
+EWMA_ALPHA = 0.2
+LATENCY_PROBE_EVERY = int(os.getenv("LLM_LATENCY_PROBE_EVERY", "20"))
+
+_pinned = contextvars.ContextVar("llm_route_pin", default=None)
+_lock = threading.Lock()
+_latency = {}   # (tier, op) -> eksponencijalni prosek latencije u sekundama
+_offloaded = {}  # op -> poziva prebacenih na mali model zbog latencije od poslednje probe
+
+
+def _parse_map(raw: str) -> dict:
+    out = {}
+    for part in (raw or "").split(","):
+        key, _, value = part.partition("=")
+        if key.strip() and value.strip():
+            out[key.strip()] = value.strip().lower()
+    return out
+
+
+def enabled() -> bool:
+    return os.getenv("LLM_ROUTING", "1") != "0"
+
+
+def _tier_map(env: str) -> dict:
+    routes = _parse_map(os.getenv(env))
+    bad = {k: v for k, v in routes.items() if v not in TIERS}
+    if bad:
+        raise ValueError(f"{env}: unknown tier in {bad}; expected one of {', '.join(TIERS)}")
+    return routes
+
+
+def estimate_tokens(*texts) -> int:
+    return sum(len(t or "") for t in texts) // CHARS_PER_TOKEN
+
+
+def choose(op: str, prompt_tokens: int) -> tuple:
+    """Return (tier, reason) for one LLM call."""
+    if not enabled():
+        return "large", "disabled"
+    pinned = _pinned.get()
+    if pinned:
+        return pinned, "endpoint"
+    routes = _tier_map("LLM_ROUTES")
+    if op in routes:
+        return routes[op], "override"
+    tier = DEFAULT_ROUTES.get(op, "large")
+    if prompt_tokens > int(os.getenv("LLM_SMALL_MAX_TOKENS", "3000")):
+        return "large", "context"
+    if tier == "large":
+        target = _parse_map(os.getenv("LLM_LATENCY_TARGET_MS")).get(op)
+        avg = _latency.get(("large", op))
+        if target and avg is not None and avg * 1000 > float(target):
+            return ("large", "probe") if _probe(op) else ("small", "latency")
+    return tier, "op"
+
+
+#bez ovoga se prosek velikog modela posle prelaska na mali vise nikad ne bi menjao
+def _probe(op: str) -> bool:
+    with _lock:
+        n = _offloaded.get(op, 0) + 1
+        _offloaded[op] = 0 if n >= LATENCY_PROBE_EVERY else n
+    return n >= LATENCY_PROBE_EVERY
+
+
+def route(op: str, *texts) -> tuple:
+    """choose() for a prompt, counted in llm_route_total."""
+    tier, reason = choose(op, estimate_tokens(*texts))
+    metrics.inc("llm_route_total", op=op, tier=tier, reason=reason)
+    return tier, reason
+
+
+#posle poziva: prosek latencije po nivou i ustede u odnosu na veliki model
+def record(op: str, tier: str, seconds: float, tokens: int = 0):
+    with _lock:
+        prev = _latency.get((tier, op))
+        _latency[(tier, op)] = seconds if prev is None else prev + EWMA_ALPHA * (seconds - prev)
+        large = _latency.get(("large", op))
+    if tier != "small":
+        return
+    if tokens:
+        metrics.inc("llm_route_offloaded_tokens_total", tokens, op=op)
+    if large is not None and large > seconds:
+        metrics.inc("llm_route_saved_seconds_total", large - seconds, op=op)
+
+
+def escalated(op: str, why: str):
+    metrics.inc("llm_route_escalations_total", op=op, reason=why)
+
+
+def pin_endpoint(endpoint: str):
+    """Apply LLM_ENDPOINT_ROUTES for the current request; returns a token for unpin()."""
+    tier = _tier_map("LLM_ENDPOINT_ROUTES").get(endpoint or "")
+    return _pinned.set(tier) if tier else None
+
+
+def unpin(token):
+    if token is not None:
+        _pinned.reset(token)
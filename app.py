@@ -5,23 +5,39 @@ from dotenv import load_dotenv
 BASE_DIR = os.path.dirname(__file__)
 load_dotenv(dotenv_path=os.path.join(BASE_DIR, '.env'))
 
-from flask import Flask, render_template, request, redirect, url_for, send_file, flash
-from sqlalchemy import create_engine
+import time, threading
+from flask import Flask, render_template, request, redirect, url_for, flash, Response, stream_with_context, g, has_app_context, jsonify, session
+from flask.globals import app_ctx
+from sqlalchemy import create_engine, event, select, func
 from sqlalchemy.orm import sessionmaker, scoped_session
 from werkzeug.utils import secure_filename
 
 from services import grader  
 import services.planner as planner
 import services.coach as coach
+import services.coach_memory as coach_memory
 import services.rag as rag
 
 from models import (
     Base, Document, Summary,
-    Quiz, Question, Flashcard,
+    Quiz, Question, Flashcard, Job, CoachSession,
 )
 import services.summarizer as summarizer
 import services.quizzer as quizzer
 import services.flashcards as fc
+import services.question_bank as question_bank
+import services.export as export
+import services.jobs as jobs
+import services.precompute as precompute
+from services.streaming import sse, timed_tokens
+from ai_providers.factory import provider_name
+from ai_providers import routing
+from ai_providers.local_stub import LocalStub
+import metrics
+import tracing
+import deadlines
+import profiling
+import httpcache
 
 RUNTIME_DIR = os.path.join(BASE_DIR, "runtime")
 UPLOAD_DIR  = os.path.join(RUNTIME_DIR, 'uploads')
@@ -61,21 +77,145 @@ import os
 print("GROQ_API_KEY set? ->", bool(os.getenv("GROQ_API_KEY")))
 print("Using GROQ_MODEL ->", os.getenv("GROQ_MODEL"))
 print("OLLAMA_MODEL ->", os.getenv("OLLAMA_MODEL"))
+print("AI_PROVIDER ->", provider_name())
 
 
 app = Flask(__name__)
 app.secret_key = os.getenv('SECRET_KEY', 'dev')
 DB_PATH = os.path.join(RUNTIME_DIR, 'studyplatform.db')
 engine = create_engine(f"sqlite:///{DB_PATH}", future=True)
-Session = scoped_session(sessionmaker(bind=engine))
+
+#async rute se izvrsavaju u asgiref niti, pa sesiju vezujemo za app kontekst (ne za nit)
+#i zatvaramo je u teardown-u; van zahteva (pozadinske niti) ostaje po niti
+def _session_scope():
+    if has_app_context():
+        return id(app_ctx._get_current_object())
+    return threading.get_ident()
+
+Session = scoped_session(sessionmaker(bind=engine), scopefunc=_session_scope)
 
 Base.metadata.create_all(engine)
+question_bank.configure(Session)
+jobs.configure(Session)
+coach_memory.configure(Session)
+jobs.recover()
+Session.remove()
+precompute.configure(Session)
+
+# ============== ZAGREVANJE ==============
+
+#embedding model i provajderi se inace ucitavaju tek na prvom zahtevu koji ih koristi.
+#PRELOAD=1 to radi vec pri importu; uz `gunicorn --preload` to je master proces, pa radnici
+#dele ucitan model (copy-on-write). Namerno bez mreznih poziva: konekcije ne smeju preziveti fork.
+def warmup():
+    t0 = time.perf_counter()
+    rag.warmup()
+    name = quizzer.get_provider_name()
+    # coach, sazetak i kartice drze svoje instance (svaka sa svojim klijentom)
+    for svc in (coach, summarizer, fc):
+        svc.get_provider()
+    print(f"[warmup] embedder + {name} providers: {(time.perf_counter() - t0) * 1000:.0f} ms")
+
+if os.getenv('PRELOAD') == '1':
+    warmup()
+
+# ============== METRIKE ==============
+
+@event.listens_for(engine, "before_cursor_execute")
+def _db_start(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start', []).append((time.perf_counter(), tracing.start_span('db')))
+
+@event.listens_for(engine, "after_cursor_execute")
+def _db_end(conn, cursor, statement, parameters, context, executemany):
+    start, sp = conn.info['query_start'].pop()
+    if sp is not None:
+        sp.finish()
+    metrics.observe('stage_seconds', time.perf_counter() - start, stage='db')
+
+@app.before_request
+def _request_start():
+    g.request_start = time.perf_counter()
+    g.foreground = True
+    precompute.request_started()
+    g.trace = tracing.begin(f"{request.method} {request.path}")
+    g.llm_route = routing.pin_endpoint(request.endpoint)
+    g.deadline = deadlines.begin(request.endpoint)
+    if profiling.wanted(request.headers.get('X-Profile', '')):
+        sampler = profiling.Sampler()
+        if sampler.start():
+            g.profiler = sampler
+
+#za SSE rute meri se vreme do pocetka strima, ne trajanje celog strima
+@app.after_request
+def _request_end(response):
+    start = g.pop('request_start', None)
+    if start is not None:
+        metrics.observe('http_request_seconds', time.perf_counter() - start,
+                        endpoint=request.endpoint or 'unknown', method=request.method)
+    degraded = deadlines.degraded()
+    if degraded:
+        response.headers['X-Degraded'] = ','.join(degraded)
+    trace = g.pop('trace', None)
+    if trace is not None:
+        root, token = trace
+        ms = tracing.finish(root, token)
+        response.headers['Server-Timing'] = f'app;dur={ms:.1f}'
+        tracing.log_if_slow(root)
+    sampler = g.pop('profiler', None)
+    if sampler is not None:
+        sampler.stop()
+        path = profiling.dump(sampler, os.path.join(RUNTIME_DIR, 'profiles'), f"{request.method}-{request.path}")
+        print(f"[profile] {request.method} {request.path} -> {path}")
+    return response
+
+#ako ruta baci izuzetak after_request se ne poziva; zatvaramo trace, profiler i sesiju ovde
+@app.teardown_request
+def _request_teardown(exc):
+    trace = g.pop('trace', None)
+    if trace is not None:
+        tracing.finish(*trace)
+    sampler = g.pop('profiler', None)
+    if sampler is not None:
+        sampler.stop()
+    routing.unpin(g.pop('llm_route', None))
+    deadlines.end(g.pop('deadline', None))
+    if g.pop('foreground', False):
+        precompute.request_finished()
+    Session.remove()
+
+@app.get('/metrics')
+def metrics_view():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+httpcache.install(app)
+
+#sidebar: verzija liste dokumenata iz jednog agregatnog upita; lista (id, ime, bez sadrzaja)
+#i njen HTML fragment se ponovo citaju/renderuju samo kad se verzija promeni
+_sidebar = {'version': None, 'docs': [], 'html': ''}
+
+def _sidebar_state():
+    global _sidebar
+    if 'sidebar' not in g:
+        s = Session()
+        version = tuple(s.execute(select(func.count(Document.id), func.max(Document.id),
+                                         func.max(Document.created_at))).one())
+        cached = _sidebar
+        if cached['version'] != version:
+            docs = s.execute(select(Document.id, Document.filename)
+                             .order_by(Document.created_at.desc())).all()
+            html = app.jinja_env.get_template('_sidebar.html').render(docs=docs)
+            cached = _sidebar = {'version': version, 'docs': docs, 'html': html}
+        g.sidebar = cached
+    return g.sidebar
 
 @app.context_processor
 def inject_docs():
-    s = Session()
-    docs = s.query(Document).order_by(Document.created_at.desc()).all()
-    return {'sidebar_docs': docs}
+    state = _sidebar_state()
+    return {'sidebar_docs': state['docs'], 'sidebar_html': state['html'], 'degraded': deadlines.degraded()}
+
+def _sse_response(gen):
+    return Response(stream_with_context(gen), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 # ============== CORE ROUTES ==============
 
@@ -87,7 +227,10 @@ def home():
 def upload():
     session = Session()
     session.query(Document).delete()
+    question_bank.reset(session)
+    coach_memory.reset(session)
     session.commit()
+    precompute.reset()
 
     for f in os.listdir(UPLOAD_DIR):
         file_path = os.path.join(UPLOAD_DIR, f)
@@ -119,7 +262,9 @@ def upload():
         doc = Document(filename=fname, size_kb=size_kb, content=text)
         s.add(doc)
         s.commit()
-        rag.ensure_index(doc.id, doc.content)
+        rag.build_index(doc.id, doc.content)
+        question_bank.schedule_fill(doc.id, doc.content)
+        precompute.schedule(doc.id, doc.content)
         flash('File uploaded successfully.')
         return redirect(url_for('tools'))
 
@@ -127,19 +272,50 @@ def upload():
 
 @app.get('/tools')
 def tools():
-    return render_template('tools.html')
+    docs = _sidebar_state()['docs']
+    ready = precompute.status(Session(), docs[0].id) if docs else None
+    return render_template('tools.html', ready=ready)
 
 # ============== SUMMARIES ==============
 
 @app.route('/summaries/create/<int:doc_id>', methods=['GET','POST'])
-def create_summary(doc_id):
+async def create_summary(doc_id):
     s = Session()
     doc = s.get(Document, doc_id)
     if not doc:
         flash('Document not found.')
         return redirect(url_for('tools'))
 
-    data = summarizer.summarize_via_rag(doc.id, doc.content, query="", max_chunks=5, top_k=5)
+    # GET prikazuje stranicu koja sazetak prima preko SSE; POST je blokirajuca varijanta
+    if request.method == 'GET':
+        # sazetak pripremljen posle otpremanja se prikazuje odmah; ?fresh=1 trazi nov
+        sm = precompute.ready_summary(s, doc.id) if request.args.get('fresh') != '1' else None
+        if sm is not None:
+            return redirect(url_for('summary_view', summary_id=sm.id))
+        return render_template('summary.html', summary=None, doc=doc,
+                               stream_url=url_for('summary_stream', doc_id=doc.id))
+
+    try:
+        sm = await _build_summary(s, doc)
+    except summarizer.SummaryError:
+        flash('Sažetak nije moguće napraviti, pokušajte ponovo.')
+        return redirect(url_for('tools'))
+    if deadlines.degraded():
+        flash('AI sažetak nije stigao na vreme; prikazan je poslednji sačuvani ili lokalni sažetak.')
+    return redirect(url_for('summary_view', summary_id=sm.id))
+
+async def _build_summary(s, doc) -> Summary:
+    try:
+        data = await summarizer.asummarize_via_rag(doc.id, doc.content, query="", max_chunks=summarizer.PAGE_MAX_CHUNKS,
+                                                   top_k=summarizer.PAGE_TOP_K)
+    except deadlines.DeadlineExceeded:
+        # bez vremena za model: poslednji sazetak istog dokumenta, inace lokalni (prve recenice)
+        last = s.query(Summary).filter_by(document_id=doc.id).order_by(Summary.id.desc()).first()
+        if last is not None:
+            deadlines.degrade('summary:cached')
+            return last
+        deadlines.degrade('summary:stub')
+        data = LocalStub().summarize(doc.content)
 
     sm = Summary(
         document_id=doc.id,
@@ -148,17 +324,63 @@ def create_summary(doc_id):
         word_count=data['word_count']
     )
     s.add(sm); s.commit()
-    return redirect(url_for('summary_view', summary_id=sm.id))
+    return sm
+
+
+@app.get('/summaries/stream/<int:doc_id>')
+def summary_stream(doc_id):
+    s = Session()
+    doc = s.get(Document, doc_id)
+    if not doc:
+        return _sse_response(iter([sse('Document not found.', event='error')]))
+    doc_id, content = doc.id, doc.content
+
+    def gen():
+        parts = []
+        try:
+            tokens = summarizer.stream_summary_via_rag(doc_id, content, query="", max_chunks=summarizer.PAGE_MAX_CHUNKS,
+                                                       top_k=summarizer.PAGE_TOP_K)
+            for tok in timed_tokens(tokens, 'summary'):
+                if isinstance(tok, dict):
+                    yield sse(tok, event='progress')
+                    continue
+                parts.append(tok)
+                yield sse(tok)
+        except Exception as e:
+            yield sse(str(e), event='error')
+            return
+
+        # kada se strim zavrsi, ceo tekst se cuva kao i kod blokirajuce varijante (prazan se ne cuva)
+        data = summarizer.result(''.join(parts))
+        if not data['summary']:
+            yield sse('Sažetak nije moguće napraviti, pokušajte ponovo.', event='error')
+            return
+        s = Session()
+        sm = Summary(document_id=doc_id, title=data['title'], text=data['summary'], word_count=data['word_count'])
+        s.add(sm); s.commit()
+        yield sse({
+            'summary_id': sm.id,
+            'word_count': sm.word_count,
+            'download_url': url_for('download_summary', summary_id=sm.id),
+        }, event='done')
+
+    return _sse_response(gen())
 
 
 @app.get('/summaries/<int:summary_id>')
 def summary_view(summary_id):
+    # sazetak se ne menja posle generisanja: validator iz id-a i vremena nastanka, 304 pre ucitavanja teksta
     s = Session()
-    sm = s.get(Summary, summary_id)
-    if not sm:
+    created = s.execute(select(Summary.created_at).where(Summary.id == summary_id)).scalar()
+    if created is None:
         flash('Summary not found.')
         return redirect(url_for('tools'))
-    return render_template('summary.html', summary=sm)
+    tag = httpcache.etag('summary', summary_id, created, _sidebar_state()['version'])
+    resp = httpcache.not_modified(tag, created)
+    if resp is not None:
+        return resp
+    sm = s.get(Summary, summary_id)
+    return httpcache.cached(render_template('summary.html', summary=sm), tag, created)
 
 @app.get('/summaries/download/<int:summary_id>')
 def download_summary(summary_id):
@@ -168,10 +390,9 @@ def download_summary(summary_id):
         flash('Summary not found.')
         return redirect(url_for('tools'))
 
-    out = os.path.join(GEN_DIR, f'summary_{summary_id}.txt')
-    with open(out, 'w', encoding='utf-8') as f:
-        f.write(sm.text)
-    return send_file(out, as_attachment=True, download_name=os.path.basename(out))
+    # tekst je vec u memoriji; bez fajla u GEN_DIR koji bi ostao do sledeceg brisanja
+    return Response(sm.text, mimetype='text/plain; charset=utf-8',
+                    headers={'Content-Disposition': f'attachment; filename="summary_{summary_id}.txt"'})
 
 # ============== QUIZ ==============
 
@@ -180,7 +401,7 @@ def quiz_config(doc_id):
     return render_template('quiz_config.html', doc_id=doc_id)
 
 @app.post('/quiz/generate/<int:doc_id>')
-def quiz_generate(doc_id):
+async def quiz_generate(doc_id):
     s = Session()
     doc = s.get(Document, doc_id)
     if not doc:
@@ -188,18 +409,36 @@ def quiz_generate(doc_id):
         return redirect(url_for('tools'))
 
     cfg = {
-        'mcq': int(request.form.get('mcq', 5)),
-        'tf': int(request.form.get('tf', 5)),
-        'short': int(request.form.get('short', 5)),
-        'fill': int(request.form.get('fill', 5)),
+        'mcq': quizzer.count(request.form.get('mcq', 5)),
+        'tf': quizzer.count(request.form.get('tf', 5)),
+        'short': quizzer.count(request.form.get('short', 5)),
+        'fill': quizzer.count(request.form.get('fill', 5)),
         'difficulties': [
             d for d in ['Easy', 'Medium', 'Hard']
             if request.form.get(d.lower()) == 'on'
         ] or ['Easy', 'Medium', 'Hard']
     }
 
-    items, used_ctx, used_provider = quizzer.generate_from_rag(doc.id, doc.content, cfg, user_hint=request.form.get("hint",""))
+    quiz = await _build_quiz(s, doc, cfg, request.form.get("hint", ""))
+    if quiz is None:
+        flash('Generisanje pitanja nije uspelo, pokušajte ponovo.')
+        return redirect(url_for('quiz_config', doc_id=doc_id))
+    return render_template('quiz_view.html', quiz=quiz)
+
+#sastavljanje kviza (banka + LLM za ostatak) i upis; koriste ga HTML forma i JSON API.
+#None kada nema nijednog pitanja (banka prazna, svi LLM zahtevi pali)
+async def _build_quiz(s, doc, cfg: dict, hint: str = ""):
+    items, missing = await question_bank.assemble(s, doc.id, cfg, user_hint=hint, text=doc.content)
+
+    # LLM se poziva samo za ono sto banka nema (npr. posebna tema iz hint-a)
+    if any(missing.values()):
+        extra, used_ctx, used_provider = await quizzer.agenerate_from_rag(doc.id, doc.content, dict(cfg, **missing), user_hint=hint)
+        question_bank.schedule_add(doc.id, extra)
+        items += extra
+        items.sort(key=lambda q: quizzer.KINDS.index(q['kind']))
 
+    if not items:
+        return None
 
     quiz = Quiz(document_id=doc.id, title='Kviz', total_questions=len(items))
     s.add(quiz)
@@ -217,91 +456,132 @@ def quiz_generate(doc_id):
         ))
 
     s.commit()
-    return render_template('quiz_view.html', quiz=quiz)
+    return quiz
 
 
 
 @app.get('/quiz/<int:quiz_id>')
 def quiz_view(quiz_id):
     s = Session()
-    quiz = s.get(Quiz, quiz_id)
-    if not quiz:
+    created = s.execute(select(Quiz.created_at).where(Quiz.id == quiz_id)).scalar()
+    if created is None:
         flash('Kviz nije pronadjen.')
         return redirect(url_for('tools'))
-    return render_template('quiz_view.html', quiz=quiz)
+    tag = httpcache.etag('quiz', quiz_id, created, _sidebar_state()['version'])
+    resp = httpcache.not_modified(tag, created)
+    if resp is not None:
+        return resp
+    quiz = s.get(Quiz, quiz_id)
+    return httpcache.cached(render_template('quiz_view.html', quiz=quiz), tag, created)
 
 @app.post('/quiz/grade/<int:quiz_id>')
-def quiz_grade(quiz_id):
+async def quiz_grade(quiz_id):
     s = Session()
     quiz = s.get(Quiz, quiz_id)
     if not quiz:
         flash('Kviz nije pronadjen.')
         return redirect(url_for('tools'))
 
+    answers = {q.id: (request.form.get(f'q_{q.id}') or '').strip() for q in quiz.questions}
+    correct, details = await _grade_quiz(quiz, answers)
+
+    percent = int(round(100 * correct / max(1, len(quiz.questions))))
+    return render_template('quiz_view.html',
+        quiz=quiz, answers=answers, score=correct, percent=percent, details=details)
+
+#answers: {question_id: odgovor}; vraca (broj tacnih, {question_id: {ai, ok, reason}})
+async def _grade_quiz(quiz, answers: dict):
     correct = 0
-    answers = {}
     details = {}  # for explanations/AI reasons
+    freeform = []
 
     for q in quiz.questions:
-        key = f'q_{q.id}'
-        user = (request.form.get(key) or '').strip()
-        answers[q.id] = user
+        user = answers.get(q.id, '')
 
         if q.kind in ('mcq', 'tf'):
             ok = (user.upper() == (q.correct_answer or '').upper())
             if ok: correct += 1
             details[q.id] = {"ai": False, "ok": ok, "reason": "Exact match"}
         else:
-            # AI grading for short/fill
-            res = quizzer.grade_freeform(q.prompt, q.correct_answer or "", user)
-            ok = bool(res.get("correct"))
-            if ok: correct += 1
-            details[q.id] = {"ai": True, "ok": ok, "reason": res.get("reason","")}
+            freeform.append(q)
 
-    percent = int(round(100 * correct / max(1, len(quiz.questions))))
-    return render_template('quiz_view.html',
-        quiz=quiz, answers=answers, score=correct, percent=percent, details=details)
+    # AI grading for short/fill - jedan poziv za ceo kviz
+    results = await quizzer.agrade_freeform_batch([
+        {"question": q.prompt, "ground_truth": q.correct_answer or "", "user_answer": answers[q.id],
+         "explanation": q.explanation or ""}
+        for q in freeform
+    ])
+    for q, res in zip(freeform, results):
+        ok = bool(res.get("correct"))
+        if ok: correct += 1
+        details[q.id] = {"ai": not res.get("local"), "ok": ok, "reason": res.get("reason","")}
+    return correct, details
 
 
 # ============== FLASHCARDS ==============
 
 @app.get('/flashcards/config/<int:doc_id>')
 def flashcards_config(doc_id):
-    return render_template('flashcards_config.html', doc_id=doc_id)
+    return _flashcards_form(doc_id)
+
+def _flashcards_form(doc_id):
+    return render_template('flashcards_config.html', doc_id=doc_id,
+                           default_cards=fc.CARDS_DEFAULT, max_cards=fc.CARDS_MAX)
 
 @app.post('/flashcards/create/<int:doc_id>')
-def flashcards_create(doc_id):
+async def flashcards_create(doc_id):
     s = Session()
     doc = s.get(Document, doc_id)
     if not doc:
         flash('Document not found.')
         return redirect(url_for('tools'))
 
-    n = int(request.form.get('count', 10))
+    try:
+        n = fc.deck_size(request.form.get('count', fc.CARDS_DEFAULT))
+    except ValueError:
+        flash(f'Broj kartica mora biti ceo broj od 1 do {fc.CARDS_MAX}.')
+        return _flashcards_form(doc_id), 400
+    added, total = await _grow_deck(s, doc, n, reset=request.form.get('reset') == 'on')
+    if deadlines.degraded():
+        flash(f'Generated {added} new flashcards ({total} in deck); the AI did not finish in time, try again for more.')
+    else:
+        flash(f'Generated {added} new flashcards ({total} in deck).')
+    return redirect(url_for('flashcards_view', doc_id=doc.id))
 
-    s.query(Flashcard).filter_by(document_id=doc.id).delete(synchronize_session=False)
-    s.flush() 
+async def _grow_deck(s, doc, n: int, reset: bool = False):
+    if reset:
+        s.query(Flashcard).filter_by(document_id=doc.id).delete(synchronize_session=False)
+        s.flush()
 
-    cards = fc.make_cards_from_rag(doc.id, doc.content, n)
+    # postojece kartice (i njihovo 'known' stanje) ostaju; generisu se samo nove do ukupno n
+    existing = s.query(Flashcard).filter_by(document_id=doc.id).all()
+    cards = await fc.agrow_deck(doc.id, doc.content, [(c.front, c.back) for c in existing], n)
 
     for c in cards:
         s.add(Flashcard(document_id=doc.id, front=c['front'], back=c['back']))
 
     s.commit()
-    flash(f'Generated {len(cards)} flashcards.')
-    return redirect(url_for('flashcards_view', doc_id=doc.id))
+    return len(cards), len(existing) + len(cards)
 
 
 @app.get('/flashcards/<int:doc_id>')
 def flashcards_view(doc_id):
     s = Session()
-    doc = s.get(Document, doc_id)
-    if not doc:
+    doc_created = s.execute(select(Document.created_at).where(Document.id == doc_id)).scalar()
+    if doc_created is None:
         flash('Document not found.')
         return redirect(url_for('tools'))
 
+    # spil se menja dodavanjem kartica i oznakom 'known', pa validator pokriva (id, known) svih kartica
+    state = s.execute(select(Flashcard.id, Flashcard.known).where(Flashcard.document_id == doc_id)
+                      .order_by(Flashcard.id)).all()
+    tag = httpcache.etag('deck', doc_id, doc_created, state, _sidebar_state()['version'])
+    resp = httpcache.not_modified(tag)
+    if resp is not None:
+        return resp
+    doc = s.get(Document, doc_id)
     cards = s.query(Flashcard).filter_by(document_id=doc.id).order_by(Flashcard.id.asc()).all()
-    return render_template('flashcards_view.html', doc=doc, cards=cards)
+    return httpcache.cached(render_template('flashcards_view.html', doc=doc, cards=cards), tag)
 
 @app.post('/flashcards/mark/<int:card_id>')
 def flashcards_mark(card_id):
@@ -313,26 +593,53 @@ def flashcards_mark(card_id):
     return redirect(request.referrer or url_for('tools'))
 
 
+# ============== IZVOZ ==============
+
+#/export/<quizzes|flashcards|summaries>?format=anki|csv|jsonl&doc_id=<id>&compress=gzip
+#bez doc_id izvozi se cela biblioteka; odgovor se strimuje direktno iz kursora
+@app.get('/export/<kind>')
+def export_items(kind):
+    fmt = request.args.get('format', 'csv')
+    doc_id = request.args.get('doc_id', type=int)
+    compress = request.args.get('compress') in ('1', 'gzip')
+    if kind not in export.KINDS or fmt not in export.FORMATS:
+        return Response(f"Izvoz: vrsta {', '.join(export.KINDS)}; format {', '.join(export.FORMATS)}.",
+                        status=400, mimetype='text/plain')
+    if fmt == 'anki' and kind == 'summaries':
+        return Response("Anki izvoz postoji samo za kvizove i kartice.", status=400, mimetype='text/plain')
+
+    s = Session()
+    body = export.encode(export.lines(kind, fmt, export.rows(s, kind, doc_id)), compress=compress)
+    name = export.filename(kind, fmt, doc_id, compress)
+    return Response(stream_with_context(body), mimetype=export.mimetype(fmt, compress),
+                    headers={'Content-Disposition': f'attachment; filename="{name}"'})
+
 
 @app.get('/planner')
 def planner_form():
     return render_template('planner_form.html')
 
-@app.post('/planner/generate')
-def planner_generate():
-    level          = (request.form.get('level') or 'Undergraduate').strip()
-    learning_style = (request.form.get('learning_style') or 'mixed').strip()
-    goals          = (request.form.get('goals') or '').strip()
-    notes          = (request.form.get('notes') or '').strip()
-    start_time     = (request.form.get('start_time') or '13:00').strip()
-    end_time       = (request.form.get('end_time') or '03:00').strip()
-    daily_minutes  = int(request.form.get('daily_minutes') or 360)
-    days           = int(request.form.get('days') or 10)
-    ask            = (request.form.get('ask') or '').strip()
-
-    if not ask:
-        flash("Unesi svoj zahtev/opis (npr. Šta spremaš, koliko strana, rok...)")
-        return redirect(url_for('planner_form'))
+def _int_field(src, name: str, default: int) -> int:
+    raw = (src.get(name) or '').strip()
+    if not raw:
+        return default
+    try:
+        return int(raw)
+    except ValueError:
+        raise ValueError(f'Polje {name} mora biti ceo broj, a ne {raw!r}.')
+
+#ValueError za neispravan unos (vreme, brojevi); rute ga vracaju kao 400
+def _planner_profile(src):
+    level          = (src.get('level') or 'Undergraduate').strip()
+    learning_style = (src.get('learning_style') or 'mixed').strip()
+    goals          = (src.get('goals') or '').strip()
+    notes          = (src.get('notes') or '').strip()
+    start_time     = (src.get('start_time') or '13:00').strip()
+    end_time       = (src.get('end_time') or '03:00').strip()
+    daily_minutes  = _int_field(src, 'daily_minutes', 360)
+    days           = _int_field(src, 'days', 10)
+    technique      = (src.get('technique') or 'auto').strip()
+    ask            = (src.get('ask') or '').strip()
 
     profile = {
         "level": level,
@@ -343,29 +650,306 @@ def planner_generate():
         "end_time": end_time,
         "daily_minutes": daily_minutes,
         "days": days,
+        "technique": technique,
     }
+    planner.build_schedule(profile)   # proverava prozor pre strima
+    return profile, ask
+
+@app.post('/planner/generate')
+async def planner_generate():
+    try:
+        profile, ask = _planner_profile(request.form)
+    except ValueError as e:
+        flash(str(e))
+        return render_template('planner_form.html'), 400
+
+    if not ask:
+        flash("Unesi svoj zahtev/opis (npr. Šta spremaš, koliko strana, rok...)")
+        return redirect(url_for('planner_form'))
+
+    # plan stize preko SSE (planner_stream); ?stream=0 daje blokirajucu varijantu
+    if request.args.get('stream') == '0':
+        plan_text = await planner.agenerate_personal_plan(profile, ask)
+        return render_template('planner_result.html', plan=plan_text, profile=profile, ask=ask)
+
+    return render_template('planner_result.html', plan=None, profile=profile, ask=ask,
+                           stream_url=url_for('planner_stream', ask=ask, **profile))
+
+@app.get('/planner/stream')
+def planner_stream():
+    try:
+        profile, ask = _planner_profile(request.args)
+    except ValueError as e:
+        return _sse_response(iter([sse(str(e), event='error')])), 400
+
+    def gen():
+        try:
+            for tok in timed_tokens(planner.stream_personal_plan(profile, ask), 'planner'):
+                yield sse(tok)
+        except Exception as e:
+            yield sse(str(e), event='error')
+            return
+        yield sse({}, event='done')
 
-    plan_text = planner.generate_personal_plan(profile, ask)
-    return render_template('planner_result.html', plan=plan_text, profile=profile, ask=ask)
+    return _sse_response(gen())
+
+#razgovor sa coach-em: id u Flask sesiji, potezi i memorija u bazi (services/coach_memory)
+def _coach_conversation(s):
+    doc = s.query(Document).order_by(Document.created_at.desc()).first()
+    conv = coach_memory.open_session(s, session.get('coach_id'), doc.id if doc else None)
+    session['coach_id'] = conv.id
+    return conv, (doc.content if doc else "")
 
 @app.get('/coach')
 def coach_view():
-    return render_template('coach.html')
+    conv = Session().get(CoachSession, session['coach_id']) if session.get('coach_id') else None
+    return render_template('coach.html', turns=conv.turns if conv else [])
 
 @app.post('/coach')
-def coach_ask():
+async def coach_ask():
     q = (request.form.get('q') or '').strip()
     if not q:
         flash("Pitaj nešto.")
         return redirect(url_for('coach_view'))
     s = Session()
-    doc = s.query(Document).order_by(Document.created_at.desc()).first()
    # plan = s.query(StudyPlan).order_by(StudyPlan.id.desc()).first()
     #plan_info = f"{plan.start_date}→{plan.end_date}, strategy {plan.strategy}" if plan else "no plan"
     plan_info = 'no plan'
-    ans = coach.answer(q, doc.content if doc else "", plan_info, doc_id=doc.id if doc else None)
+    conv, content = _coach_conversation(s)
+    ans = await coach.aanswer_turn(s, conv, q, content, plan_info)
+
+    return render_template('coach.html', q=q, a=ans, turns=conv.turns[:-1])
+
+@app.post('/coach/reset')
+def coach_reset():
+    conv_id = session.pop('coach_id', None)
+    s = Session()
+    conv = s.get(CoachSession, conv_id) if conv_id else None
+    if conv is not None:
+        s.delete(conv)
+        s.commit()
+    return redirect(url_for('coach_view'))
+
+@app.get('/coach/stream')
+def coach_stream():
+    q = (request.args.get('q') or '').strip()
+    if not q:
+        return _sse_response(iter([sse("Pitaj nešto.", event='error')]))
+    s = Session()
+    conv, content = _coach_conversation(s)
+    plan_info = 'no plan'
+
+    def gen():
+        try:
+            tokens = coach.stream_turn(s, conv, q, content, plan_info)
+            for tok in timed_tokens(tokens, 'coach'):
+                yield sse(tok)
+        except Exception as e:
+            yield sse(str(e), event='error')
+            return
+        yield sse({}, event='done')
+
+    return _sse_response(gen())
+
+# ============== JSON API ==============
+# Grupne operacije u jednom zahtevu i jednoj transakciji (ocenjivanje celog kviza, oznacavanje
+# vise kartica), citanje pitanja/kartica po stranicama sa izborom polja i pozadinski poslovi.
+
+API_PAGE_MAX = 500
+
+QUESTION_FIELDS = {c: getattr(Question, c) for c in
+                   ('id', 'quiz_id', 'kind', 'difficulty', 'prompt', 'options', 'correct_answer', 'explanation')}
+CARD_FIELDS = {c: getattr(Flashcard, c) for c in ('id', 'document_id', 'front', 'back', 'known', 'created_at')}
+
+def _api_error(message: str, status: int = 400):
+    return jsonify({'error': message}), status
+
+def _json_body() -> dict:
+    body = request.get_json(silent=True)
+    return body if isinstance(body, dict) else {}
+
+#?fields=a,b&after=<id>&limit=<n>: biraju se samo trazene kolone, stranice po id-u (keyset)
+def _page(columns: dict, query_filter):
+    fields = [f.strip() for f in (request.args.get('fields') or ','.join(columns)).split(',') if f.strip()]
+    unknown = [f for f in fields if f not in columns]
+    if unknown:
+        return None, _api_error(f"unknown fields: {', '.join(unknown)}; allowed: {', '.join(columns)}")
+    if 'id' not in fields:
+        fields.insert(0, 'id')
+    limit = min(max(1, request.args.get('limit', 50, type=int)), API_PAGE_MAX)
+    after = request.args.get('after', 0, type=int)
+
+    q = select(*[columns[f] for f in fields]).where(columns['id'] > after).order_by(columns['id']).limit(limit + 1)
+    rows = Session().execute(query_filter(q)).all()
+    items = [dict(zip(fields, r)) for r in rows[:limit]]
+    for it in items:
+        if 'created_at' in it and it['created_at'] is not None:
+            it['created_at'] = it['created_at'].isoformat()
+    return {'items': items, 'next_after': items[-1]['id'] if len(rows) > limit else None}, None
+
+@app.get('/api/v1/documents')
+def api_documents():
+    rows = Session().execute(select(Document.id, Document.filename, Document.size_kb, Document.created_at)
+                             .order_by(Document.created_at.desc())).all()
+    return jsonify({'items': [{'id': r.id, 'filename': r.filename, 'size_kb': r.size_kb,
+                               'created_at': r.created_at.isoformat() if r.created_at else None} for r in rows]})
+
+#sta je od pripreme posle otpremanja spremno (tools stranica ovo prati dok priprema traje)
+@app.get('/api/v1/documents/<int:doc_id>/ready')
+def api_document_ready(doc_id):
+    s = Session()
+    if s.execute(select(Document.id).where(Document.id == doc_id)).scalar() is None:
+        return _api_error('document not found', 404)
+    return jsonify(precompute.status(s, doc_id))
+
+@app.get('/api/v1/quizzes/<int:quiz_id>/questions')
+def api_quiz_questions(quiz_id):
+    page, err = _page(QUESTION_FIELDS, lambda q: q.where(Question.quiz_id == quiz_id))
+    return err or jsonify(page)
+
+@app.get('/api/v1/documents/<int:doc_id>/flashcards')
+def api_flashcards(doc_id):
+    known = request.args.get('known')
+    def where(q):
+        q = q.where(Flashcard.document_id == doc_id)
+        return q if known is None else q.where(Flashcard.known == (known in ('1', 'true')))
+    page, err = _page(CARD_FIELDS, where)
+    return err or jsonify(page)
+
+#{"answers": {"<question_id>": "odgovor", ...}} -> ocena svih pitanja jednim pozivom
+@app.post('/api/v1/quizzes/<int:quiz_id>/grade')
+async def api_quiz_grade(quiz_id):
+    s = Session()
+    quiz = s.get(Quiz, quiz_id)
+    if not quiz:
+        return _api_error('quiz not found', 404)
+    raw = _json_body().get('answers')
+    if not isinstance(raw, dict):
+        return _api_error('body must be {"answers": {"<question_id>": "<answer>"}}')
+    answers = {}
+    for k, v in raw.items():
+        if not str(k).isdigit():
+            return _api_error(f'invalid question id {k!r}')
+        answers[int(k)] = str(v if v is not None else '').strip()
+
+    correct, details = await _grade_quiz(quiz, answers)
+    results = [{'id': q.id, 'answer': answers.get(q.id, ''), 'correct': details[q.id]['ok'],
+                'ai': details[q.id]['ai'], 'reason': details[q.id]['reason'],
+                'correct_answer': q.correct_answer, 'explanation': q.explanation}
+               for q in quiz.questions]
+    return jsonify({'quiz_id': quiz.id, 'score': correct, 'total': len(quiz.questions),
+                    'percent': int(round(100 * correct / max(1, len(quiz.questions)))), 'results': results,
+                    'degraded': deadlines.degraded()})
+
+#{"cards": [{"id": 1, "known": true}, ...]} -> jedan UPDATE po vrednosti, jedan commit
+@app.post('/api/v1/flashcards/mark')
+def api_flashcards_mark():
+    cards = _json_body().get('cards')
+    if not isinstance(cards, list) or not all(isinstance(c, dict) and isinstance(c.get('id'), int) for c in cards):
+        return _api_error('body must be {"cards": [{"id": <int>, "known": <bool>}, ...]}')
+    wanted = {c['id']: bool(c.get('known', True)) for c in cards}
+
+    s = Session()
+    found = set(s.execute(select(Flashcard.id).where(Flashcard.id.in_(list(wanted)))).scalars())
+    updated = 0
+    for value in (True, False):
+        ids = [i for i, k in wanted.items() if k is value and i in found]
+        if ids:
+            updated += s.query(Flashcard).filter(Flashcard.id.in_(ids)).update(
+                {Flashcard.known: value}, synchronize_session=False)
+    s.commit()
+    return jsonify({'updated': updated, 'missing': sorted(set(wanted) - found)})
+
+#{"type": "quiz"|"flashcards"|"summary", "doc_id": 1, ...parametri} ili {"jobs": [ ... ]}
+@app.post('/api/v1/jobs')
+def api_jobs_create():
+    body = _json_body()
+    specs = body.get('jobs') if 'jobs' in body else [body]
+    if not isinstance(specs, list) or not specs:
+        return _api_error('body must be a job object or {"jobs": [...]}')
+    s = Session()
+    created = []
+    for spec in specs:
+        if not isinstance(spec, dict):
+            s.rollback()
+            return _api_error('each job must be a JSON object')
+        kind, doc_id = spec.get('type'), spec.get('doc_id')
+        if kind not in jobs.kinds():
+            s.rollback()
+            return _api_error(f"type must be one of {', '.join(jobs.kinds())}")
+        if not isinstance(doc_id, int) or s.get(Document, doc_id) is None:
+            s.rollback()
+            return _api_error(f'document {doc_id!r} not found', 404)
+        params = {k: v for k, v in spec.items() if k not in ('type', 'doc_id')}
+        try:
+            created.append(jobs.submit(s, kind, doc_id, params))
+        except ValueError as e:
+            s.rollback()
+            return _api_error(str(e))
+    s.commit()
+    for job in created:
+        jobs.start(job.id)
+    return jsonify({'jobs': [dict(jobs.as_dict(j), status_url=url_for('api_job', job_id=j.id))
+                             for j in created]}), 202
+
+@app.get('/api/v1/jobs/<job_id>')
+def api_job(job_id):
+    s = Session()
+    job = s.get(Job, job_id)
+    if not job:
+        return _api_error('job not found', 404)
+    if jobs.stale(job):
+        jobs.recover([job.id])
+    return jsonify(jobs.as_dict(job))
+
+#?ids=a,b,c -> status vise poslova jednim zahtevom
+@app.get('/api/v1/jobs')
+def api_jobs():
+    ids = [i for i in (request.args.get('ids') or '').split(',') if i]
+    s = Session()
+    rows = s.query(Job).filter(Job.id.in_(ids)).all() if ids else []
+    stale = [j.id for j in rows if jobs.stale(j)]
+    if stale:
+        jobs.recover(stale)   # commit istekne objekte, pa as_dict cita nov status
+    return jsonify({'items': [jobs.as_dict(j) for j in rows]})
+
+async def _job_quiz(s, doc_id: int, params: dict) -> dict:
+    quiz = await _build_quiz(s, _job_doc(s, doc_id), quizzer.config_from(params), params.get('hint', ''))
+    if quiz is None:
+        raise RuntimeError('no questions could be generated')
+    return {'quiz_id': quiz.id, 'questions': quiz.total_questions}
+
+async def _job_flashcards(s, doc_id: int, params: dict) -> dict:
+    added, total = await _grow_deck(s, _job_doc(s, doc_id), fc.deck_size(params.get('count', fc.CARDS_DEFAULT)),
+                                    params.get('reset') is True)
+    return {'added': added, 'total': total}
+
+async def _job_summary(s, doc_id: int, params: dict) -> dict:
+    sm = await _build_summary(s, _job_doc(s, doc_id))
+    return {'summary_id': sm.id, 'word_count': sm.word_count}
+
+#provere parametara pri prijemu posla (ValueError -> 400), a ne tek kada posao padne u pozadini
+def _check_quiz(params: dict):
+    try:
+        quizzer.config_from(params)
+    except (TypeError, ValueError):
+        raise ValueError('quiz counts (mcq, tf, short, fill) must be integers')
+
+def _check_flashcards(params: dict):
+    fc.deck_size(params.get('count', fc.CARDS_DEFAULT))
+    if not isinstance(params.get('reset', False), bool):
+        raise ValueError('reset must be true or false')
+
+def _job_doc(s, doc_id: int):
+    doc = s.get(Document, doc_id)
+    if doc is None:
+        raise LookupError(f'document {doc_id} not found')
+    return doc
+
+jobs.register('quiz', _job_quiz, _check_quiz)
+jobs.register('flashcards', _job_flashcards, _check_flashcards)
+jobs.register('summary', _job_summary)
 
-    return render_template('coach.html', q=q, a=ans)
 
 if __name__ == '__main__':
     app.run(debug=True)
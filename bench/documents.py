@@ -0,0 +1,130 @@
+# bench/documents.py
+# Sinteticki dokumenti rastuce velicine i minimalan PDF pisac (bez dodatnih biblioteka).
+import os, re, random
+
+_WORDS = (
+    "algoritam model podatak učenje mreža sloj gradijent funkcija gubitak optimizacija klaster "
+    "klasifikacija regresija skup vektor matrica verovatnoća raspodela hipoteza uzorak trening test "
+    "validacija preciznost odziv entropija stablo odluka šuma granica margina jezgro prostor dimenzija "
+    "normalizacija aktivacija neuron težina pristrasnost epoha serija parametar hiperparametar"
+).split()
+
+_TEMPLATES = (
+    "{A} je {b} koji opisuje odnos između {c} i {d}.",
+    "Definicija: {a} predstavlja {b} u kontekstu {c}.",
+    "Primer: kada se {a} primeni na {b}, dobija se {c}.",
+    "Ključna razlika između {a} i {b} je u tome što {c} zavisi od {d}.",
+    "{A} se koristi za smanjenje {b} tokom procesa {c}.",
+)
+
+CHARS_PER_PAGE = 2500
+
+
+def synthetic_text(pages: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    out, size = [], 0
+    while size < pages * CHARS_PER_PAGE:
+        w = [rng.choice(_WORDS) for _ in range(4)]
+        s = rng.choice(_TEMPLATES).format(A=w[0].capitalize(), a=w[0], b=w[1], c=w[2], d=w[3])
+        out.append(s)
+        size += len(s) + 1
+        if rng.random() < 0.08:
+            out.append("\n\n")
+    return " ".join(out)
+
+
+_SYLLABLES = "ka ro mi te lu na vo re si da ko ne pa tu li mo ra ve zi ga".split()
+_NAMES = "Petrović Jovanović Nikolić Marković Ilić Stanković Pavlović Đorđević".split()
+
+# (cinjenica u tekstu, pitanje kako bi ga postavio student)
+_FACTS = (
+    ("Parametar {t} iznosi {n} i određuje {b} tokom procesa {c}.",
+     "Koliko iznosi parametar {t}?"),
+    ("Metodu {t} je uveo istraživač {p} {y}. godine radi poboljšanja {b}.",
+     "Ko je i kada uveo metodu {t}?"),
+    ("Pojam {t} označava {b} koji nastaje kada {c} premaši {d}.",
+     "Šta označava pojam {t}?"),
+    ("Algoritam {t} ima složenost O(n^{k}) jer za svaki {b} obilazi ceo {c}.",
+     "Kolika je složenost algoritma {t}?"),
+)
+
+
+def _term(rng: random.Random, used: set) -> str:
+    while True:
+        t = "".join(rng.choice(_SYLLABLES) for _ in range(3))
+        if t not in used:
+            used.add(t)
+            return t
+
+
+def labelled_text(pages: int, questions: int, seed: int = 0):
+    """Synthetic text with planted facts; returns (text, [{"question", "answer"}]) where answer is the fact sentence."""
+    rng = random.Random(seed)
+    sents = re.split(r"(?<=[.])\s+", synthetic_text(pages, seed=seed))
+    used, labels = set(), []
+    for _ in range(questions):
+        fact, question = rng.choice(_FACTS)
+        w = [rng.choice(_WORDS) for _ in range(3)]
+        v = dict(t=_term(rng, used), n=rng.randint(2, 999), p=rng.choice(_NAMES), y=rng.randint(1950, 2020),
+                 k=rng.randint(2, 4), b=w[0], c=w[1], d=w[2])
+        answer = fact.format(**v)
+        sents.insert(rng.randrange(len(sents) + 1), answer)
+        labels.append({"question": question.format(**v), "answer": answer})
+    return " ".join(sents), labels
+
+
+#prati ugradjene primere (generated/*.txt) do trazene velicine
+def sample_text(base_dir: str, pages: int) -> str:
+    gen = os.path.join(base_dir, "generated")
+    texts = []
+    if os.path.isdir(gen):
+        for name in sorted(os.listdir(gen)):
+            if name.endswith(".txt"):
+                with open(os.path.join(gen, name), encoding="utf-8") as f:
+                    texts.append(f.read())
+    seed = "\n\n".join(texts).strip()
+    if not seed:
+        return synthetic_text(pages)
+    reps = max(1, (pages * CHARS_PER_PAGE) // len(seed) + 1)
+    return ("\n\n".join([seed] * reps))[: pages * CHARS_PER_PAGE]
+
+
+def _pdf_escape(line: str) -> str:
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path: str, text: str, pages: int):
+    """Write a plain-text PDF with the given number of pages (Helvetica, WinAnsi, ~CHARS_PER_PAGE each)."""
+    body = text.encode("cp1252", "replace").decode("cp1252")
+    per = max(1, len(body) // pages)
+    objects = []
+
+    def add(obj: bytes) -> int:
+        objects.append(obj)
+        return len(objects)
+
+    font = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+    pages_id = len(objects) + 1 + 2 * pages
+    kids = []
+    for p in range(pages):
+        chunk = body[p * per:(p + 1) * per]
+        lines = [chunk[i:i + 90] for i in range(0, len(chunk), 90)]
+        ops = ["BT /F1 9 Tf 40 800 Td 11 TL"] + [f"({_pdf_escape(l)}) '" for l in lines] + ["ET"]
+        stream = "\n".join(ops).encode("cp1252", "replace")
+        content = add(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        kids.append(add(b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 595 842] "
+                        b"/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>" % (pages_id, font, content)))
+    add(b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(b"%d 0 R" % k for k in kids), pages))
+    catalog = add(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, obj in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % i + obj + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % o for o in offsets)
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, catalog, xref)
+    with open(path, "wb") as f:
+        f.write(out)
@@ -0,0 +1,131 @@
+# bench/fake_provider.py
+# Zamena za LLM provajdera bez mreze: odgovori iz LocalStub-a kao tekst, sa vestackim
+# kasnjenjem, jitter-om, rate-limit greskama i neispravnim JSON-om.
+import json, time, random, asyncio, threading, itertools
+from ai_providers.local_stub import LocalStub
+from ai_providers.json_extract import extract_json, json_list_or_empty
+
+
+class FakeRateLimit(Exception):
+    """Raised instead of a real 429 so callers' retry/fallback paths run."""
+
+
+class FakeProvider(LocalStub):
+    def __init__(self, latency_ms: float = 300, jitter_ms: float = 100, rate_limit: float = 0.0,
+                 malformed: float = 0.0, seed: int = 0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.rate_limit = rate_limit
+        self.malformed = malformed
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = {"ok": 0, "rate_limited": 0, "malformed": 0}
+        self._ids = itertools.count(1)
+
+    def _roll(self):
+        with self._lock:
+            delay = max(0.0, self._rng.gauss(self.latency_ms, self.jitter_ms)) / 1000
+            limited = self._rng.random() < self.rate_limit
+            broken = self._rng.random() < self.malformed
+            mode = self._rng.randrange(4)
+            if limited:
+                self.calls["rate_limited"] += 1
+            elif broken:
+                self.calls["malformed"] += 1
+            else:
+                self.calls["ok"] += 1
+        return delay, limited, broken, mode
+
+    @staticmethod
+    def _corrupt(text: str, mode: int) -> str:
+        # tipicne greske modela: proza oko JSON-a, odsecen odgovor, visak na kraju, potpuno bez JSON-a
+        if mode == 0:
+            return "Evo pitanja:\n```json\n" + text + "\n```\nNadam se da pomaže."
+        if mode == 1:
+            return text[: max(1, int(len(text) * 0.7))]
+        if mode == 2:
+            return text + "\n]}\n"
+        return "Izvinite, ne mogu da generišem odgovor."
+
+    def _respond(self, payload) -> tuple:
+        delay, limited, broken, mode = self._roll()
+        text = json.dumps(payload, ensure_ascii=False)
+        if broken:
+            text = self._corrupt(text, mode)
+        return delay, limited, text
+
+    def _call(self, payload) -> str:
+        delay, limited, text = self._respond(payload)
+        time.sleep(delay)
+        if limited:
+            raise FakeRateLimit("rate limited")
+        return text
+
+    async def _acall(self, payload) -> str:
+        delay, limited, text = self._respond(payload)
+        await asyncio.sleep(delay)
+        if limited:
+            raise FakeRateLimit("rate limited")
+        return text
+
+    # ---- isti interfejs kao pravi provajderi ----
+
+    def _chat(self, system: str, user: str, **kw) -> str:
+        return self._call(LocalStub.summarize(self, user)["summary"])
+
+    async def _achat(self, system: str, user: str, **kw) -> str:
+        return await self._acall(LocalStub.summarize(self, user)["summary"])
+
+    def _chat_stream(self, system: str, user: str, **kw):
+        text = self._chat(system, user)
+        for i in range(0, len(text), 16):
+            yield text[i:i + 16]
+
+    def summarize(self, text: str) -> dict:
+        out = self._call(LocalStub.summarize(self, text))
+        obj = extract_json(out)
+        return obj if isinstance(obj, dict) else {"title": "Summary", "summary": out, "word_count": len(out.split())}
+
+    async def asummarize(self, text: str) -> dict:
+        out = await self._acall(LocalStub.summarize(self, text))
+        obj = extract_json(out)
+        return obj if isinstance(obj, dict) else {"title": "Summary", "summary": out, "word_count": len(out.split())}
+
+    #stub vraca ista pitanja, a quizzer izbacuje duplikate, pa ih numerisemo
+    def _quiz_payload(self, text: str, config: dict) -> list:
+        items = LocalStub.generate_quiz(self, text, config)
+        for it in items:
+            it["prompt"] = f"{it['prompt']} (#{next(self._ids)})"
+        return items
+
+    def generate_quiz(self, text: str, config: dict) -> list:
+        return json_list_or_empty(self._call(self._quiz_payload(text, config)))
+
+    async def agenerate_quiz(self, text: str, config: dict) -> list:
+        return json_list_or_empty(await self._acall(self._quiz_payload(text, config)))
+
+    def make_flashcards(self, text: str, n: int) -> list:
+        return json_list_or_empty(self._call(LocalStub.make_flashcards(self, text, n)))
+
+    async def amake_flashcards(self, text: str, n: int) -> list:
+        return json_list_or_empty(await self._acall(LocalStub.make_flashcards(self, text, n)))
+
+    def grade_freeform(self, question: str, ground_truth: str, user_answer: str) -> dict:
+        obj = extract_json(self._call(LocalStub.grade_freeform(self, question, ground_truth, user_answer)))
+        return obj if isinstance(obj, dict) else {"correct": False, "reason": "Parse error"}
+
+    async def agrade_freeform(self, question: str, ground_truth: str, user_answer: str) -> dict:
+        obj = extract_json(await self._acall(LocalStub.grade_freeform(self, question, ground_truth, user_answer)))
+        return obj if isinstance(obj, dict) else {"correct": False, "reason": "Parse error"}
+
+    #jedan poziv za ceo batch, kao kod Groq/Ollama; neparsirane stavke se ocenjuju pojedinacno (redom)
+    async def agrade_freeform_batch(self, items: list) -> list:
+        if not items:
+            return []
+        payload = [dict(LocalStub.grade_freeform(self, it.get("question", ""), it.get("ground_truth", ""),
+                                                 it.get("user_answer", "")), id=i)
+                   for i, it in enumerate(items)]
+        return await self._agrade_missing(items, self._parse_batch(await self._acall(payload), len(items)))
+
+    def grade_freeform_batch(self, items: list) -> list:
+        return asyncio.run(self.agrade_freeform_batch(items))
@@ -0,0 +1,161 @@
+# bench/load.py
+"""Concurrent load test against a running app.
+
+    python -m bench.mock_llm --port 8808 &
+    GROQ_API_KEY=mock GROQ_BASE_URL=http://127.0.0.1:8808 python app.py
+    python -m bench.load --url http://127.0.0.1:5000 --levels 1,4,16 --requests 40
+
+Every route is loaded on its own at each concurrency level, so the numbers
+per route are not mixed with other traffic. /upload replaces the single
+document the app keeps, so it runs last at each level and the document and
+quiz used by the other routes are prepared again afterwards.
+"""
+import os, re, sys, json, time, argparse, threading
+from concurrent.futures import ThreadPoolExecutor
+import requests
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from bench.documents import synthetic_text   # noqa: E402
+from bench.run import _pct                   # noqa: E402
+
+ROUTES = ("quiz_generate", "quiz_grade", "coach", "planner", "upload")
+
+
+class Target:
+    """Ids of the document/quiz the routes work on, discovered from the app's HTML."""
+
+    def __init__(self, url: str, pages: int):
+        self.url = url.rstrip("/")
+        self.text = synthetic_text(pages, seed=42)
+        self.doc_id = None
+        self.quiz_id = None
+        self.question_ids = []
+
+    def upload(self, http: requests.Session) -> requests.Response:
+        files = {"file": ("load.txt", self.text.encode("utf-8"), "text/plain")}
+        return http.post(f"{self.url}/upload", files=files, allow_redirects=False, timeout=300)
+
+    def prepare(self, http: requests.Session):
+        r = self.upload(http)
+        r.raise_for_status()
+        tools = http.get(f"{self.url}/tools", timeout=60).text
+        m = re.search(r"/quiz/config/(\d+)", tools)
+        if not m:
+            raise RuntimeError("document id not found on /tools after upload")
+        self.doc_id = int(m.group(1))
+        r = http.post(f"{self.url}/quiz/generate/{self.doc_id}", data=_quiz_form(), allow_redirects=False,
+                      timeout=300)
+        m = re.search(r"/quiz/grade/(\d+)", r.text)
+        if r.status_code != 200 or not m:
+            raise RuntimeError(f"quiz generation failed during setup ({r.status_code})")
+        self.quiz_id = int(m.group(1))
+        self.question_ids = sorted(set(int(q) for q in re.findall(r'name="q_(\d+)"', r.text)))
+
+
+def _quiz_form() -> dict:
+    return {"mcq": 3, "tf": 2, "short": 2, "fill": 1, "easy": "on", "medium": "on", "hard": "on"}
+
+
+#jedan zahtev po ruti; vraca (ok, status). Preusmerenje (flash poruka) znaci da ruta nije uspela.
+def _call(route: str, t: Target, http: requests.Session, i: int):
+    url = t.url
+    if route == "quiz_generate":
+        r = http.post(f"{url}/quiz/generate/{t.doc_id}", data=_quiz_form(), allow_redirects=False, timeout=300)
+        ok = r.status_code == 200 and "/quiz/grade/" in r.text
+    elif route == "quiz_grade":
+        answers = {f"q_{q}": ("A" if j % 2 else "gradijent") for j, q in enumerate(t.question_ids)}
+        r = http.post(f"{url}/quiz/grade/{t.quiz_id}", data=answers, allow_redirects=False, timeout=300)
+        ok = r.status_code == 200
+    elif route == "coach":
+        r = http.post(f"{url}/coach", data={"q": f"Šta je gradijent? ({i})"}, allow_redirects=False, timeout=300)
+        ok = r.status_code == 200
+    elif route == "planner":
+        r = http.post(f"{url}/planner/generate", data={"ask": "Spremam ispit"},
+                      params={"stream": "0"}, allow_redirects=False, timeout=300)
+        ok = r.status_code == 200
+    elif route == "upload":
+        r = t.upload(http)
+        ok = r.status_code in (302, 303) and "/tools" in r.headers.get("Location", "")
+    else:
+        raise ValueError(route)
+    return ok, r.status_code
+
+
+def run_level(route: str, t: Target, concurrency: int, total: int) -> dict:
+    local = threading.local()
+    lat, errors, statuses = [], 0, {}
+    lock = threading.Lock()
+
+    def one(i):
+        nonlocal errors
+        http = getattr(local, "http", None)
+        if http is None:
+            http = local.http = requests.Session()
+        t0 = time.perf_counter()
+        try:
+            ok, status = _call(route, t, http, i)
+        except requests.RequestException as e:
+            ok, status = False, type(e).__name__
+        dt = time.perf_counter() - t0
+        with lock:
+            lat.append(dt)
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+            if not ok:
+                errors += 1
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(total)))
+    wall = time.perf_counter() - t0
+    ms = [x * 1000 for x in lat]
+    return {
+        "concurrency": concurrency, "requests": total, "seconds": round(wall, 3),
+        "rps": round(total / wall, 2) if wall else 0.0,
+        "p50_ms": round(_pct(ms, 50), 1), "p95_ms": round(_pct(ms, 95), 1), "p99_ms": round(_pct(ms, 99), 1),
+        "max_ms": round(max(ms), 1) if ms else 0.0,
+        "error_rate": round(errors / total, 4) if total else 0.0, "status": statuses,
+    }
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--url", default="http://127.0.0.1:5000")
+    ap.add_argument("--routes", default=",".join(ROUTES))
+    ap.add_argument("--levels", default="1,4,16", help="concurrency levels")
+    ap.add_argument("--requests", type=int, default=40, help="requests per route and level")
+    ap.add_argument("--pages", type=int, default=10, help="size of the uploaded document")
+    ap.add_argument("--out", default=os.path.join(BASE_DIR, "bench", "results", "load.json"))
+    args = ap.parse_args(argv)
+
+    routes = [r.strip() for r in args.routes.split(",") if r.strip()]
+    # upload brise dokument, pa ide poslednji
+    routes.sort(key=lambda r: r == "upload")
+    levels = [int(c) for c in args.levels.split(",")]
+    t = Target(args.url, args.pages)
+    http = requests.Session()
+    t.prepare(http)
+    print(f"[load] doc {t.doc_id}, quiz {t.quiz_id} ({len(t.question_ids)} questions)")
+
+    results = {r: [] for r in routes}
+    print(f"{'route':15} {'conc':>5} {'rps':>8} {'p50':>9} {'p95':>9} {'p99':>9} {'err':>7}")
+    for c in levels:
+        for route in routes:
+            res = run_level(route, t, c, max(args.requests, c))
+            results[route].append(res)
+            print(f"{route:15} {c:5d} {res['rps']:8.2f} {res['p50_ms']:8.0f}ms {res['p95_ms']:8.0f}ms "
+                  f"{res['p99_ms']:8.0f}ms {res['error_rate']:7.1%}")
+            if route == "upload":
+                t.prepare(http)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump({"meta": {"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "args": vars(args)},
+                   "results": results}, f, ensure_ascii=False, indent=2)
+    print(f"[load] saved {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
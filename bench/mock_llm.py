@@ -0,0 +1,255 @@
+# bench/mock_llm.py
+"""Local stand-in LLM server for load tests (no network, no API key).
+
+    python -m bench.mock_llm --port 8808 --latency-ms 400 --jitter-ms 150 --rate-429 0.05
+
+Speaks both protocols the app uses:
+- Groq/OpenAI chat completions: POST /openai/v1/chat/completions (and /v1/...),
+  plain or stream=true (SSE); point the app at it with GROQ_BASE_URL=http://127.0.0.1:8808
+- Ollama: POST /api/chat, plain or NDJSON stream;
+  OLLAMA_URL=http://127.0.0.1:8808/api/chat AI_PROVIDER=ollama
+
+Answers are scripted per task (quiz, grading, flashcards, summary, coach,
+planner), detected from the system prompt; --script file.json overrides the
+text of any task. GET /stats returns request counters.
+"""
+import sys, json, time, random, argparse, threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+_lock = threading.Lock()
+_stats = {"requests": 0, "rate_limited": 0, "streamed": 0, "by_task": {}}
+
+
+# ---- scenarijo odgovora ----
+
+def _task(system: str) -> str:
+    s = system.lower()
+    if "quiz generator" in s:
+        return "quiz"
+    if "grader" in s:
+        return "grade_batch" if '"items"' in s or "every item" in s else "grade"
+    if "flashcard" in s:
+        return "cards"
+    if "study coach. the study schedule" in s:
+        return "planner"
+    if "study coach" in s:
+        return "coach"
+    return "summary"
+
+
+def _json_arg(user: str) -> dict:
+    try:
+        obj = json.loads(user)
+        return obj if isinstance(obj, dict) else {}
+    except ValueError:
+        return {}
+
+
+def _quiz(req: dict) -> list:
+    counts = req.get("counts") or {"mcq": 5, "tf": 5, "short": 5, "fill": 5}
+    diffs = req.get("difficulties") or ["easy", "medium", "hard"]
+    out, n = [], 0
+    for kind, cnt in counts.items():
+        for i in range(int(cnt)):
+            n += 1
+            item = {"kind": kind, "difficulty": diffs[i % len(diffs)],
+                    "prompt": f"Mock pitanje {n} ({kind}) #{random.randrange(10**6)}",
+                    "correct": "gradijent", "explanation": "Mock objašnjenje."}
+            if kind == "mcq":
+                item.update(options="A) gradijent|B) entropija|C) margina|D) jezgro", correct="A")
+            elif kind == "tf":
+                item.update(options="True|False", correct="True")
+            out.append(item)
+    return out
+
+
+def answer(system: str, user: str, script: dict):
+    """Return (task, text) for one chat request."""
+    task = _task(system)
+    if task in script:
+        return task, script[task]
+    req = _json_arg(user)
+    if task == "quiz":
+        body = _quiz(req)
+    elif task == "grade_batch":
+        body = [{"id": it.get("id"), "correct": bool(it.get("user_answer")), "reason": "Mock ocena."}
+                for it in req.get("items", [])]
+    elif task == "grade":
+        return task, json.dumps({"correct": bool(req.get("user_answer")), "reason": "Mock ocena."})
+    elif task == "cards":
+        body = [{"front": f"Mock pojam {i + 1}?", "back": f"Mock definicija {i + 1}."}
+                for i in range(int(req.get("n", 5)))]
+    elif task == "planner":
+        return task, ("Zašto ova tehnika: mock obrazloženje.\nPreporuke za fokus/koncentraciju:\n"
+                      "- mock savet\nMotivacioni citat: „Mock.“")
+    elif task == "coach":
+        return task, "Mock odgovor trenera na osnovu konteksta."
+    else:
+        return task, "Mock sažetak: " + " ".join(user.split()[:60])
+    return task, json.dumps(body, ensure_ascii=False)
+
+
+#u JSON modu (response_format / format=json) odgovor mora biti objekat
+def _wrap_json(text: str, json_mode: bool) -> str:
+    if json_mode and text.lstrip().startswith("["):
+        return '{"items": ' + text + "}"
+    return text
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    cfg = None
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, code: int, body: bytes, ctype: str = "application/json", headers: dict = None):
+        self.send_response(code)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/stats":
+            with _lock:
+                body = json.dumps(_stats).encode()
+            return self._send(200, body)
+        self._send(404, b'{"error": "not found"}')
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            req = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            return self._send(400, b'{"error": "bad json"}')
+        path = self.path.split("?")[0].rstrip("/")
+        if path.endswith("/chat/completions"):
+            return self._openai(req)
+        if path == "/api/chat":
+            return self._ollama(req)
+        self._send(404, b'{"error": "not found"}')
+
+    def _common(self, req: dict):
+        cfg = self.cfg
+        msgs = req.get("messages") or []
+        system = next((m.get("content", "") for m in msgs if m.get("role") == "system"), "")
+        user = next((m.get("content", "") for m in reversed(msgs) if m.get("role") == "user"), "")
+        task, text = answer(system, user, cfg.script)
+        limited = random.random() < cfg.rate_429
+        with _lock:
+            _stats["requests"] += 1
+            _stats["by_task"][task] = _stats["by_task"].get(task, 0) + 1
+            _stats["rate_limited"] += limited
+            _stats["streamed"] += bool(req.get("stream"))
+        time.sleep(max(0.0, random.gauss(cfg.latency_ms, cfg.jitter_ms)) / 1000)
+        return system, user, text, limited
+
+    def _openai(self, req: dict):
+        system, user, text, limited = self._common(req)
+        if limited:
+            return self._send(429, json.dumps({"error": {"message": "Rate limit reached (mock)",
+                                                         "type": "rate_limit_exceeded"}}).encode(),
+                              headers={"Retry-After": "1"})
+        json_mode = (req.get("response_format") or {}).get("type") == "json_object"
+        text = _wrap_json(text, json_mode)
+        model = req.get("model", "mock")
+        usage = {"prompt_tokens": (len(system) + len(user)) // 4, "completion_tokens": len(text) // 4}
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        base = {"id": f"mock-{random.randrange(10**9)}", "created": int(time.time()), "model": model}
+        if not req.get("stream"):
+            body = dict(base, object="chat.completion", usage=usage, choices=[{
+                "index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": text}}])
+            return self._send(200, json.dumps(body, ensure_ascii=False).encode())
+
+        events = []
+        for i in range(0, len(text), self.cfg.chunk_chars):
+            events.append(dict(base, object="chat.completion.chunk", choices=[{
+                "index": 0, "finish_reason": None, "delta": {"content": text[i:i + self.cfg.chunk_chars]}}]))
+        events.append(dict(base, object="chat.completion.chunk", x_groq={"usage": usage},
+                           choices=[{"index": 0, "finish_reason": "stop", "delta": {}}]))
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        for ev in events:
+            self.wfile.write(f"data: {json.dumps(ev, ensure_ascii=False)}\n\n".encode())
+            self.wfile.flush()
+            time.sleep(self.cfg.token_ms / 1000)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.close_connection = True
+
+    def _ollama(self, req: dict):
+        if not req.get("messages"):
+            # prazan zahtev = ucitavanje modela (warmup)
+            return self._send(200, json.dumps({"model": req.get("model"), "done": True}).encode())
+        system, user, text, limited = self._common(req)
+        if limited:
+            return self._send(429, b'{"error": "server busy (mock)"}')
+        text = _wrap_json(text, req.get("format") == "json")
+        counts = {"prompt_eval_count": (len(system) + len(user)) // 4, "eval_count": len(text) // 4}
+        if req.get("stream") is False:
+            body = dict({"model": req.get("model"), "done": True,
+                         "message": {"role": "assistant", "content": text}}, **counts)
+            return self._send(200, json.dumps(body, ensure_ascii=False).encode())
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        step = self.cfg.chunk_chars
+        for i in range(0, len(text), step):
+            line = {"model": req.get("model"), "done": False,
+                    "message": {"role": "assistant", "content": text[i:i + step]}}
+            self.wfile.write((json.dumps(line, ensure_ascii=False) + "\n").encode())
+            self.wfile.flush()
+            time.sleep(self.cfg.token_ms / 1000)
+        self.wfile.write((json.dumps(dict({"model": req.get("model"), "done": True}, **counts)) + "\n").encode())
+        self.close_connection = True
+
+
+def serve(host: str = "127.0.0.1", port: int = 8808, latency_ms: float = 300, jitter_ms: float = 100,
+          rate_429: float = 0.0, token_ms: float = 5, chunk_chars: int = 24, script: dict = None):
+    """Start the server in a daemon thread and return it (server.shutdown() to stop)."""
+    cfg = argparse.Namespace(latency_ms=latency_ms, jitter_ms=jitter_ms, rate_429=rate_429,
+                             token_ms=token_ms, chunk_chars=chunk_chars, script=script or {})
+    handler = type("MockHandler", (Handler,), {"cfg": cfg})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="mock-llm", daemon=True).start()
+    return server
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8808)
+    ap.add_argument("--latency-ms", type=float, default=300, help="mean time before the first byte")
+    ap.add_argument("--jitter-ms", type=float, default=100)
+    ap.add_argument("--rate-429", type=float, default=0.0, help="share of requests answered with 429")
+    ap.add_argument("--token-ms", type=float, default=5, help="delay between streamed chunks")
+    ap.add_argument("--chunk-chars", type=int, default=24)
+    ap.add_argument("--script", help="JSON file {task: answer text} overriding generated answers")
+    args = ap.parse_args(argv)
+
+    script = {}
+    if args.script:
+        with open(args.script, encoding="utf-8") as f:
+            script = json.load(f)
+    server = serve(args.host, args.port, args.latency_ms, args.jitter_ms, args.rate_429,
+                   args.token_ms, args.chunk_chars, script)
+    print(f"[mock-llm] listening on http://{args.host}:{server.server_port}")
+    print(f"[mock-llm]   GROQ_BASE_URL=http://{args.host}:{server.server_port}")
+    print(f"[mock-llm]   OLLAMA_URL=http://{args.host}:{server.server_port}/api/chat")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
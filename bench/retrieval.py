@@ -0,0 +1,228 @@
+# bench/retrieval.py
+"""Offline retrieval sweep: index settings vs. answer recall, latency and size.
+
+    python -m bench.retrieval                                   # sinteticki korpus sa zasadjenim cinjenicama
+    python -m bench.retrieval --chunk-chars 400,600,800 --overlap 0,60,120 --embedders hashing
+    python -m bench.retrieval --corpus docs/ --questions labels.json --k 1,3,5,8
+
+For every (embedder, chunk_chars, overlap) the corpus is chunked with
+rag.chunk_text, embedded and saved the way rag.build_index saves it, then
+every labelled question is searched like rag.retrieve does. A question is
+answered at rank r when the r-th chunk contains its answer span
+(whitespace-normalized). Reported per configuration: recall@k, MRR, build
+time, query latency, index size on disk and the context size of the top
+--top-k chunks (what build_context would send to the model).
+
+The labels file is a JSON list of {"doc": "<file name in --corpus>",
+"question": "...", "answer": "<exact text from the document>"}. Without
+--corpus a synthetic corpus with planted facts is used (bench.documents).
+Configurations at least as good as the current defaults on recall@--top-k
+but with a smaller context are listed at the end.
+"""
+import os, sys, json, time, shutil, inspect, argparse, statistics, tempfile
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from bench.documents import labelled_text        # noqa: E402
+from bench.run import _summary_ms, _git_rev       # noqa: E402
+
+
+def _ints(raw: str) -> list:
+    return [int(x) for x in raw.split(",") if x.strip()]
+
+
+def _norm(text: str) -> str:
+    return " ".join((text or "").split())
+
+
+def load_corpus(corpus: str, questions: str, docs: int, pages: int, per_doc: int, seed: int):
+    """Return ({doc: text}, [{"doc", "question", "answer"}])."""
+    if not corpus:
+        texts, labels = {}, []
+        for i in range(docs):
+            name = f"synthetic_{i}"
+            texts[name], qs = labelled_text(pages, per_doc, seed=seed + i)
+            labels += [dict(q, doc=name) for q in qs]
+        return texts, labels
+    if not questions:
+        raise SystemExit("--corpus needs --questions (labelled question set)")
+    texts = {}
+    for name in sorted(os.listdir(corpus)):
+        if name.endswith((".txt", ".md")):
+            with open(os.path.join(corpus, name), encoding="utf-8") as f:
+                texts[name] = f.read()
+    with open(questions, encoding="utf-8") as f:
+        labels = json.load(f)
+    missing = sorted({q["doc"] for q in labels} - set(texts))
+    if missing:
+        raise SystemExit(f"labels refer to documents not in {corpus}: {', '.join(missing)}")
+    return texts, labels
+
+
+def _dir_kb(path: str) -> float:
+    return sum(os.path.getsize(os.path.join(path, n)) for n in os.listdir(path)) / 1024
+
+
+#isto sto i rag.build_index, ali sa zadatim embedder-om i bez metrika/rag store-a
+def build(emb, texts: dict, chunk_chars: int, overlap: int, out_dir: str) -> dict:
+    from services.rag import chunk_text
+    index = {}
+    t0 = time.perf_counter()
+    for i, (name, text) in enumerate(texts.items()):
+        chunks = chunk_text(text, chunk_chars=chunk_chars, overlap=overlap)
+        embs = emb.encode(chunks)
+        d = os.path.join(out_dir, str(i))
+        os.makedirs(d, exist_ok=True)
+        np.save(os.path.join(d, "embeddings.npy"), embs)
+        with open(os.path.join(d, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"chunks": chunks}, f, ensure_ascii=False)
+        index[name] = (embs, chunks, [_norm(c) for c in chunks])
+    build_s = time.perf_counter() - t0
+    disk_kb = sum(_dir_kb(os.path.join(out_dir, d)) for d in os.listdir(out_dir))
+    return {"index": index, "build_s": build_s, "disk_kb": disk_kb}
+
+
+def evaluate(emb, index: dict, labels: list, ks: list, top_k: int) -> dict:
+    from ai_providers.routing import estimate_tokens
+    ranks, lat, ctx = [], [], []
+    for q in labels:
+        embs, chunks, normed = index[q["doc"]]
+        t0 = time.perf_counter()
+        qv = emb.encode([q["question"]])
+        order = np.argsort(-(embs @ qv[0]))
+        lat.append(time.perf_counter() - t0)
+        answer = _norm(q["answer"])
+        ranks.append(next((r for r, i in enumerate(order) if answer in normed[int(i)]), None))
+        ctx.append(estimate_tokens("\n\n".join(chunks[int(i)] for i in order[:top_k])))
+    n = max(1, len(labels))
+    out = {f"recall@{k}": round(sum(1 for r in ranks if r is not None and r < k) / n, 4) for k in ks}
+    out["mrr"] = round(sum(1 / (r + 1) for r in ranks if r is not None) / n, 4)
+    # odgovor koji ne stane ni u jedan chunk (preseceni) nikad nije pogodak
+    out["answer_in_a_chunk"] = round(sum(1 for r in ranks if r is not None) / n, 4)
+    out["query"] = _summary_ms(lat)
+    out[f"context_tokens@{top_k}"] = round(statistics.fmean(ctx), 1) if ctx else 0.0
+    return out
+
+
+def sweep(texts: dict, labels: list, backends: list, sizes: list, overlaps: list, ks: list, top_k: int) -> list:
+    from services import embedders
+    rows = []
+    with tempfile.TemporaryDirectory(prefix="bench-retrieval-") as tmp:
+        for kind in backends:
+            try:
+                t0 = time.perf_counter()
+                emb = embedders.create_embedder(kind)
+                load_s = time.perf_counter() - t0
+            except Exception as e:   # npr. nema torch-a za float32/int8
+                print(f"[retrieval] {kind}: {type(e).__name__}: {e}")
+                rows.append({"embedder": kind, "error": f"{type(e).__name__}: {e}"})
+                continue
+            emb.encode(["warmup"])   # prvi poziv (alokacije, lenja inicijalizacija) ne ulazi u merenje
+            for size in sizes:
+                for overlap in overlaps:
+                    if overlap >= size:
+                        continue
+                    out_dir = os.path.join(tmp, f"{kind}-{size}-{overlap}")
+                    built = build(emb, texts, size, overlap, out_dir)
+                    row = {"embedder": kind, "name": emb.name, "chunk_chars": size, "overlap": overlap,
+                           "chunks": sum(len(v[1]) for v in built["index"].values()),
+                           "load_s": round(load_s, 3), "build_s": round(built["build_s"], 4),
+                           "disk_kb": round(built["disk_kb"], 1)}
+                    row.update(evaluate(emb, built["index"], labels, ks, top_k))
+                    rows.append(row)
+                    shutil.rmtree(out_dir, ignore_errors=True)
+                    print(f"[retrieval] {kind} {size}/{overlap}: recall@{ks[-1]}={row[f'recall@{ks[-1]}']} "
+                          f"mrr={row['mrr']}")
+    return rows
+
+
+def _defaults() -> tuple:
+    from services.rag import chunk_text
+    params = inspect.signature(chunk_text).parameters
+    return params["chunk_chars"].default, params["overlap"].default
+
+
+def print_table(rows: list, ks: list, top_k: int, current: tuple):
+    cols = [f"recall@{k}" for k in ks] + ["mrr"]
+    head = (f"{'embedder':9} {'chunk':>6} {'ovl':>4} {'chunks':>7} {'build_s':>8} {'disk_kb':>9} "
+            + " ".join(f"{c:>9}" for c in cols) + f" {'p50_ms':>7} {'p99_ms':>7} {f'ctx_tok@{top_k}':>11}")
+    print("\n" + head)
+    for r in rows:
+        if "error" in r:
+            print(f"{r['embedder']:9} {r['error']}")
+            continue
+        mark = "*" if (r["chunk_chars"], r["overlap"]) == current else " "
+        print(f"{r['embedder']:9} {r['chunk_chars']:>5}{mark} {r['overlap']:>4} {r['chunks']:>7} "
+              f"{r['build_s']:>8.3f} {r['disk_kb']:>9.1f} " + " ".join(f"{r[c]:>9.3f}" for c in cols)
+              + f" {r['query']['p50_ms']:>7.2f} {r['query']['p99_ms']:>7.2f} {r[f'context_tokens@{top_k}']:>11.0f}")
+    print("* = trenutna podesavanja rag.chunk_text")
+
+
+#za svaki backend: konfiguracije bar jednako dobre kao trenutna (recall@top_k), a sa manjim kontekstom
+def candidates(rows: list, top_k: int, current: tuple, tolerance: float) -> dict:
+    key, ctx = f"recall@{top_k}", f"context_tokens@{top_k}"
+    out = {}
+    for kind in dict.fromkeys(r["embedder"] for r in rows if "error" not in r):
+        mine = [r for r in rows if r.get("embedder") == kind and "error" not in r]
+        ref = next((r for r in mine if (r["chunk_chars"], r["overlap"]) == current), None)
+        if ref is None or key not in ref:
+            continue
+        better = [r for r in mine if r is not ref and r[key] >= ref[key] - tolerance and r[ctx] < ref[ctx]]
+        better.sort(key=lambda r: (r[ctx], -r[key], r["disk_kb"]))
+        out[kind] = {"current": {key: ref[key], ctx: ref[ctx], "disk_kb": ref["disk_kb"]},
+                     "better": [{"chunk_chars": r["chunk_chars"], "overlap": r["overlap"], key: r[key],
+                                 "mrr": r["mrr"], ctx: r[ctx], "disk_kb": r["disk_kb"]} for r in better[:5]]}
+    return out
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--chunk-chars", default="400,600,800,1200", help="chunk sizes to try")
+    ap.add_argument("--overlap", default="0,60,120,240", help="overlaps to try (skipped when >= chunk size)")
+    ap.add_argument("--embedders", default="float32,int8,hashing", help="RAG_EMBEDDER backends to try")
+    ap.add_argument("--k", default="1,3,5,10", help="cut-offs for recall@k")
+    ap.add_argument("--top-k", type=int, default=5, help="chunks sent to the model (context size, candidates)")
+    ap.add_argument("--tolerance", type=float, default=0.0, help="allowed recall drop for a candidate")
+    ap.add_argument("--corpus", help="directory with .txt/.md documents (default: synthetic)")
+    ap.add_argument("--questions", help="labelled questions JSON for --corpus")
+    ap.add_argument("--docs", type=int, default=3, help="synthetic documents")
+    ap.add_argument("--pages", type=int, default=20, help="pages per synthetic document")
+    ap.add_argument("--per-doc", type=int, default=25, help="planted facts (questions) per synthetic document")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", default=os.path.join(BASE_DIR, "bench", "results", "retrieval.json"))
+    args = ap.parse_args(argv)
+
+    texts, labels = load_corpus(args.corpus, args.questions, args.docs, args.pages, args.per_doc, args.seed)
+    ks = sorted(set(_ints(args.k)) | {args.top_k})
+    current = _defaults()
+    print(f"[retrieval] {len(texts)} documents, {sum(len(t) for t in texts.values())} chars, {len(labels)} questions")
+    rows = sweep(texts, labels, [b.strip() for b in args.embedders.split(",") if b.strip()],
+                 _ints(args.chunk_chars), _ints(args.overlap), ks, args.top_k)
+    print_table(rows, ks, args.top_k, current)
+
+    picks = candidates(rows, args.top_k, current, args.tolerance)
+    for kind, c in picks.items():
+        print(f"\n[retrieval] {kind}: trenutno {current[0]}/{current[1]} -> {c['current']}")
+        for r in c["better"]:
+            print(f"    {r['chunk_chars']}/{r['overlap']}: " + ", ".join(f"{k}={v}" for k, v in list(r.items())[2:]))
+        if not c["better"]:
+            print("    nema manje konfiguracije sa istim recall-om")
+
+    report = {
+        "meta": {"git": _git_rev(), "time": time.strftime("%Y-%m-%dT%H:%M:%S"), "args": vars(args),
+                 "current": {"chunk_chars": current[0], "overlap": current[1]},
+                 "documents": len(texts), "questions": len(labels)},
+        "results": rows,
+        "candidates": picks,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"[retrieval] saved {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
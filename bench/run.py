@@ -0,0 +1,304 @@
+# bench/run.py
+"""Offline performance benchmarks.
+
+    python -m bench.run                              # sve, rezultat u bench/results/latest.json
+    python -m bench.run --only rag,json --pages 5,20
+    python -m bench.run --baseline bench/results/base.json --tolerance 0.2
+
+No network is used: LLM calls go to bench.fake_provider.FakeProvider with
+configurable latency, jitter, rate-limit and malformed-JSON rates. The
+embedding model must already be in the local cache. The rag benchmark uses
+the RAG_EMBEDDER backend; `embed` compares all backends against float32.
+"""
+import os, sys, json, time, asyncio, argparse, platform, statistics, subprocess, tempfile, tracemalloc
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from bench.documents import synthetic_text, sample_text, write_pdf   # noqa: E402
+from bench.fake_provider import FakeProvider, FakeRateLimit            # noqa: E402
+
+# za svaku metriku: da li je veca vrednost bolja (za poredjenje sa baseline-om)
+HIGHER_IS_BETTER = ("_per_s",)
+
+
+def _pct(values: list, p: float) -> float:
+    if not values:
+        return 0.0
+    vs = sorted(values)
+    k = min(len(vs) - 1, max(0, int(round(p / 100 * (len(vs) - 1)))))
+    return vs[k]
+
+
+def _summary_ms(samples: list) -> dict:
+    ms = [s * 1000 for s in samples]
+    return {"p50_ms": round(_pct(ms, 50), 3), "p99_ms": round(_pct(ms, 99), 3),
+            "mean_ms": round(statistics.fmean(ms), 3) if ms else 0.0, "n": len(ms)}
+
+
+# ---- pojedinacni benchmarkovi ----
+
+def bench_extract(pages_list: list, tmp: str) -> dict:
+    from services import extract_text
+    out = {}
+    for pages in pages_list:
+        path = os.path.join(tmp, f"doc_{pages}.pdf")
+        write_pdf(path, synthetic_text(pages, seed=pages), pages)
+        t0 = time.perf_counter()
+        text = extract_text.from_pdf(path)
+        dt = time.perf_counter() - t0
+        out[f"{pages}p"] = {"pages_per_s": round(pages / dt, 2), "seconds": round(dt, 4), "chars": len(text)}
+    return out
+
+
+def bench_rag(pages_list: list, tmp: str, queries: int) -> dict:
+    import services.rag as rag
+    rag.set_store_dir(tmp)
+    rag.embed(["warmup"])   # ucitavanje modela ne ulazi u merenje
+    out = {}
+    for i, pages in enumerate(pages_list):
+        text = sample_text(BASE_DIR, pages) if i % 2 else synthetic_text(pages, seed=pages)
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        info = rag.build_index(1000 + pages, text)
+        dt = time.perf_counter() - t0
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        words = text.split()
+        lat = []
+        for q in range(queries):
+            query = " ".join(words[(q * 37) % max(1, len(words) - 8):][:8])
+            t1 = time.perf_counter()
+            rag.retrieve(1000 + pages, query, top_k=5)
+            lat.append(time.perf_counter() - t1)
+        out[f"{pages}p"] = {
+            "build_index": {"chunks": info["chunks"], "chunks_per_s": round(info["chunks"] / dt, 2),
+                            "seconds": round(dt, 4), "peak_mb": round(peak / 2**20, 2)},
+            "retrieve": _summary_ms(lat),
+        }
+    return out
+
+
+def _rss_mb() -> float:
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024   # Linux: KiB
+    except ImportError:
+        return 0.0
+
+
+#propusnost svakog backend-a i recall@k njegovog top-k u odnosu na float32 (isti chunkovi i upiti)
+def bench_embedders(backends: list, pages: int, queries: int, k: int = 5) -> dict:
+    from services import embedders
+    from services.rag import chunk_text
+    text = sample_text(BASE_DIR, pages)
+    chunks = chunk_text(text)
+    words = text.split()
+    qs = [" ".join(words[(q * 37) % max(1, len(words) - 8):][:8]) for q in range(queries)]
+
+    out, tops = {}, {}
+    for kind in backends:
+        rss0 = _rss_mb()
+        t0 = time.perf_counter()
+        try:
+            emb = embedders.create_embedder(kind)
+        except Exception as e:   # npr. nema torch-a za float32/int8
+            out[kind] = {"error": f"{type(e).__name__}: {e}"}
+            continue
+        load_s = time.perf_counter() - t0
+        emb.encode(chunks[:4])
+        t0 = time.perf_counter()
+        embs = emb.encode(chunks)
+        enc_s = time.perf_counter() - t0
+        lat = []
+        for q in qs:
+            t1 = time.perf_counter()
+            emb.encode([q])
+            lat.append(time.perf_counter() - t1)
+        qv = emb.encode(qs)
+        tops[kind] = np.argsort(-(qv @ embs.T), axis=1)[:, :k]
+        out[kind] = {"name": emb.name, "dim": int(embs.shape[1]), "chunks": len(chunks),
+                     "load_s": round(load_s, 3), "chunks_per_s": round(len(chunks) / enc_s, 2),
+                     "query": _summary_ms(lat), "rss_growth_mb": round(_rss_mb() - rss0, 1)}
+    if "float32" in tops:
+        ref = tops["float32"]
+        for kind, top in tops.items():
+            hits = [len(set(a) & set(b)) / k for a, b in zip(top, ref)]
+            out[kind][f"recall_at_{k}_vs_float32"] = round(statistics.fmean(hits), 4)
+    return out
+
+
+def _llm_output(n_items: int, broken: bool) -> str:
+    items = [{"kind": "mcq", "difficulty": "medium", "prompt": f"Pitanje {i}: šta je gradijent?" * 3,
+              "options": "A) x|B) y|C) z|D) w", "correct": "A", "explanation": "Objašnjenje. " * 10}
+             for i in range(n_items)]
+    text = "Evo JSON-a:\n```json\n" + json.dumps(items, ensure_ascii=False) + "\n```"
+    return text[: int(len(text) * 0.8)] if broken else text
+
+
+def bench_json(sizes: list, repeat: int) -> dict:
+    from ai_providers.json_extract import sanitize_json
+    out = {}
+    for n in sizes:
+        for broken in (False, True):
+            text = _llm_output(n, broken)
+            lat = []
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                sanitize_json(text)
+                lat.append(time.perf_counter() - t0)
+            res = _summary_ms(lat)
+            res["kb"] = round(len(text) / 1024, 1)
+            res["mb_per_s"] = round(len(text) / 2**20 / max(statistics.fmean(lat), 1e-9), 2)
+            out[f"{n}_items{'_truncated' if broken else ''}"] = res
+    return out
+
+
+def bench_e2e(fake: FakeProvider, tmp: str, rounds: int, pages: int) -> dict:
+    import services.rag as rag
+    import services.quizzer as quizzer
+    rag.set_store_dir(tmp)
+    quizzer.set_provider(fake, "fake")
+    doc_id = 2000
+    text = synthetic_text(pages, seed=7)
+    rag.build_index(doc_id, text)
+    cfg = {"mcq": 5, "tf": 5, "short": 3, "fill": 2, "difficulties": ["Easy", "Medium", "Hard"]}
+
+    async def run():
+        gen, grade, counts = [], [], []
+        for _ in range(rounds):
+            t0 = time.perf_counter()
+            items, _, _ = await quizzer.agenerate_from_rag(doc_id, text, cfg)
+            gen.append(time.perf_counter() - t0)
+            counts.append(len(items))
+            # pola tacnih (lokalno prihvaceni), pola netacnih/sivih (idu do provajdera)
+            open_items = [it for it in items if it["kind"] in ("short", "fill")]
+            free = [{"question": it["prompt"], "ground_truth": it.get("correct") or "",
+                     "user_answer": (it.get("correct") or "") if i % 2 else "gradijent funkcije"}
+                    for i, it in enumerate(open_items)]
+            t1 = time.perf_counter()
+            try:
+                await quizzer.agrade_freeform_batch(free)
+            except FakeRateLimit:
+                pass   # kao 429 od pravog API-ja: greska ide do rute, vreme se ipak meri
+            grade.append(time.perf_counter() - t1)
+        return gen, grade, counts
+
+    gen, grade, counts = asyncio.run(run())
+    return {
+        "quiz_generate": dict(_summary_ms(gen), mean_items=round(statistics.fmean(counts), 2),
+                              requested=sum(v for k, v in cfg.items() if k != "difficulties")),
+        "quiz_grade": _summary_ms(grade),
+        "provider_calls": dict(fake.calls),
+    }
+
+
+# ---- poredjenje sa baseline-om ----
+
+def _flatten(d: dict, prefix: str = "") -> dict:
+    out = {}
+    for k, v in d.items():
+        key = f"{prefix}.{k}" if prefix else k
+        if isinstance(v, dict):
+            out.update(_flatten(v, key))
+        elif isinstance(v, (int, float)) and not isinstance(v, bool):
+            out[key] = v
+    return out
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Return regressions as (metric, baseline, current, change) tuples."""
+    cur, base = _flatten(results), _flatten(baseline)
+    regressions = []
+    print(f"\n{'metric':60} {'baseline':>12} {'current':>12} {'change':>8}")
+    for key in sorted(set(cur) & set(base)):
+        if not (key.endswith("_ms") or key.endswith("_per_s") or key.endswith("_mb")):
+            continue
+        b, c = base[key], cur[key]
+        if not b:
+            continue
+        change = (c - b) / b
+        worse = -change if key.endswith(HIGHER_IS_BETTER) else change
+        flag = "  <-- regression" if worse > tolerance else ""
+        print(f"{key:60} {b:12.3f} {c:12.3f} {change:+8.1%}{flag}")
+        if flag:
+            regressions.append((key, b, c, change))
+    return regressions
+
+
+def _git_rev() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return ""
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--only", default="extract,rag,embed,json,e2e", help="comma separated: extract,rag,embed,json,e2e")
+    ap.add_argument("--pages", default="5,20,80", help="document sizes in pages")
+    ap.add_argument("--queries", type=int, default=50, help="retrieve calls per document")
+    ap.add_argument("--embedders", default="float32,int8,hashing", help="RAG_EMBEDDER backends to compare")
+    ap.add_argument("--json-items", default="20,200,1000", help="items in the synthetic LLM output")
+    ap.add_argument("--json-repeat", type=int, default=20)
+    ap.add_argument("--rounds", type=int, default=5, help="end-to-end quiz rounds")
+    ap.add_argument("--latency-ms", type=float, default=300)
+    ap.add_argument("--jitter-ms", type=float, default=100)
+    ap.add_argument("--rate-limit", type=float, default=0.05, help="share of fake LLM calls that raise a rate limit")
+    ap.add_argument("--malformed", type=float, default=0.1, help="share of fake LLM calls with broken JSON")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", default=os.path.join(BASE_DIR, "bench", "results", "latest.json"))
+    ap.add_argument("--baseline", help="earlier results file to compare against")
+    ap.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression")
+    args = ap.parse_args(argv)
+
+    only = {s.strip() for s in args.only.split(",") if s.strip()}
+    pages = [int(p) for p in args.pages.split(",") if p.strip()]
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="bench-") as tmp:
+        if "extract" in only:
+            print("[bench] extract_text.from_pdf")
+            results["extract"] = bench_extract(pages, tmp)
+        if "rag" in only:
+            print("[bench] rag.build_index / rag.retrieve")
+            results["rag"] = bench_rag(pages, tmp, args.queries)
+        if "embed" in only:
+            print("[bench] embedder backends (throughput, recall vs float32)")
+            results["embed"] = bench_embedders([b.strip() for b in args.embedders.split(",") if b.strip()],
+                                               pages[-1], args.queries)
+        if "json" in only:
+            print("[bench] sanitize_json")
+            results["json"] = bench_json([int(n) for n in args.json_items.split(",")], args.json_repeat)
+        if "e2e" in only:
+            print("[bench] quiz generate + grade (fake provider)")
+            fake = FakeProvider(args.latency_ms, args.jitter_ms, args.rate_limit, args.malformed, args.seed)
+            results["e2e"] = bench_e2e(fake, tmp, args.rounds, pages[0])
+
+    report = {
+        "meta": {
+            "git": _git_rev(), "time": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+            "platform": platform.platform(), "args": vars(args),
+        },
+        "results": results,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+    print(f"[bench] saved {args.out}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            base = json.load(f)
+        regressions = compare(results, base.get("results", base), args.tolerance)
+        if regressions:
+            print(f"[bench] {len(regressions)} regression(s) over {args.tolerance:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+# bench/startup.py
+"""Startup-time report: where `import app` spends its time, and time to first request.
+
+    python -m bench.startup                           # tabela + bench/results/startup.json
+    python -m bench.startup --top 30 --routes /planner,/,/static/style.css
+    PRELOAD=1 python -m bench.startup                 # sa ucitavanjem embedder-a pri importu
+
+Every measurement runs in a fresh interpreter (python -X importtime), so
+module caches of this process do not hide anything. Runtime dirs are kept
+(PERSIST_RUN=1).
+"""
+import os, sys, json, argparse, statistics, subprocess
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_FIRST_REQUEST = """
+import json, sys, time
+t0 = time.perf_counter()
+import app
+t1 = time.perf_counter()
+client = app.app.test_client()
+out = {"import_s": t1 - t0, "routes": {}}
+for route in sys.argv[1:]:
+    t = time.perf_counter()
+    r = client.get(route)
+    out["routes"][route] = {"status": r.status_code, "s": time.perf_counter() - t}
+out["total_s"] = time.perf_counter() - t0
+print("@@" + json.dumps(out))
+"""
+
+
+def _env() -> dict:
+    env = dict(os.environ, PERSIST_RUN="1")
+    env["PYTHONPATH"] = os.pathsep.join(p for p in (BASE_DIR, env.get("PYTHONPATH")) if p)
+    return env
+
+
+#-X importtime pise "import time: self [us] | cumulative | modul" (uvlaka = dubina)
+def parse_importtime(stderr: str) -> list:
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cum_us, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append({"module": name.strip(), "depth": depth, "self_ms": int(self_us) / 1000,
+                     "cum_ms": int(cum_us) / 1000})
+    return rows
+
+
+def import_breakdown(rows: list) -> dict:
+    by_package = {}
+    for r in rows:
+        top = r["module"].split(".")[0]
+        by_package[top] = by_package.get(top, 0.0) + r["self_ms"]
+    app_row = next((r for r in rows if r["module"] == "app"), None)
+    direct = []
+    if app_row:
+        # importtime ispisuje decu pre roditelja: direktni importi app-a su redovi dubine +1 pre njega
+        i = rows.index(app_row)
+        for r in reversed(rows[:i]):
+            if r["depth"] <= app_row["depth"]:
+                break
+            if r["depth"] == app_row["depth"] + 1:
+                direct.append({"module": r["module"], "cum_ms": round(r["cum_ms"], 1)})
+    return {
+        "total_ms": round(app_row["cum_ms"], 1) if app_row else None,
+        "app_module_self_ms": round(app_row["self_ms"], 1) if app_row else None,
+        "by_package_ms": {k: round(v, 1) for k, v in sorted(by_package.items(), key=lambda kv: -kv[1])},
+        "app_imports_ms": sorted(direct, key=lambda r: -r["cum_ms"]),
+    }
+
+
+def run_importtime() -> list:
+    p = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app"], cwd=BASE_DIR, env=_env(),
+                       capture_output=True, text=True)
+    if p.returncode != 0:
+        raise RuntimeError(p.stderr[-2000:])
+    return parse_importtime(p.stderr)
+
+
+def run_first_request(routes: list) -> dict:
+    p = subprocess.run([sys.executable, "-c", _FIRST_REQUEST, *routes], cwd=BASE_DIR, env=_env(),
+                       capture_output=True, text=True)
+    line = next((l for l in reversed(p.stdout.splitlines()) if l.startswith("@@")), None)
+    if p.returncode != 0 or line is None:
+        raise RuntimeError(p.stderr[-2000:])
+    return json.loads(line[2:])
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--runs", type=int, default=3, help="fresh interpreters per measurement (median is reported)")
+    ap.add_argument("--top", type=int, default=20)
+    ap.add_argument("--routes", default="/planner,/,/static/style.css", help="GET routes for time to first request")
+    ap.add_argument("--out", default=os.path.join(BASE_DIR, "bench", "results", "startup.json"))
+    args = ap.parse_args(argv)
+    routes = [r.strip() for r in args.routes.split(",") if r.strip()]
+
+    breakdowns = [import_breakdown(run_importtime()) for _ in range(args.runs)]
+    # za tabelu uzimamo run sa medijanom ukupnog vremena
+    breakdowns.sort(key=lambda b: b["total_ms"] or 0)
+    report = breakdowns[len(breakdowns) // 2]
+
+    first = [run_first_request(routes) for _ in range(args.runs)]
+    report["first_request"] = {
+        "import_ms": round(statistics.median(f["import_s"] for f in first) * 1000, 1),
+        "total_ms": round(statistics.median(f["total_s"] for f in first) * 1000, 1),
+        "routes": {r: {"status": first[0]["routes"][r]["status"],
+                       "ms": round(statistics.median(f["routes"][r]["s"] for f in first) * 1000, 1)}
+                   for r in routes},
+    }
+
+    print(f"import app: {report['total_ms']} ms (module body {report['app_module_self_ms']} ms)\n")
+    print(f"{'package (self time)':40} {'ms':>9}")
+    for name, ms in list(report["by_package_ms"].items())[: args.top]:
+        print(f"{name:40} {ms:9.1f}")
+    print(f"\n{'imported by app.py (cumulative)':40} {'ms':>9}")
+    for r in report["app_imports_ms"][: args.top]:
+        print(f"{r['module']:40} {r['cum_ms']:9.1f}")
+    fr = report["first_request"]
+    print(f"\nfirst request (import + test client), median of {args.runs}:")
+    for r, v in fr["routes"].items():
+        print(f"  GET {r:30} {v['status']}  {v['ms']:8.1f} ms")
+    print(f"  import {fr['import_ms']} ms, total {fr['total_ms']} ms")
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"[startup] saved {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,118 @@
+# deadlines.py
+# Rok (deadline) po zahtevu: postavlja se u before_request iz budzeta rute i prati kroz contextvars do
+# retrieval-a i LLM poziva. Provajderi skracuju timeout i retry-eve na preostalo vreme; kada vremena
+# nema, servisi prelaze na lokalne puteve (stub, lokalni ocenjivac, kesiran rezultat) i to oznacavaju.
+#
+#   ROUTE_DEADLINES=quiz_grade=10,coach_ask=20   - budzeti u sekundama po endpoint-u (dopunjuju DEFAULTS)
+#   ROUTE_DEADLINES=0                            - bez rokova
+import os, time, asyncio, contextvars
+import metrics
+
+# rute koje cekaju LLM; SSE strimovi nemaju rok (odgovor tece dok model pise)
+DEFAULTS = {
+    "quiz_grade": 20,
+    "api_quiz_grade": 20,
+    "coach_ask": 30,
+    "quiz_generate": 60,
+    "flashcards_create": 60,
+    "planner_generate": 45,
+    "create_summary": 90,
+}
+
+# LLM poziv se ne pokrece ako je ostalo manje od ovoga; bolje odmah na lokalni put
+MIN_CALL_S = float(os.getenv("DEADLINE_MIN_CALL_S", "1.0"))
+
+_current = contextvars.ContextVar("deadline", default=None)   # (monotonic kraj, endpoint)
+_degraded = contextvars.ContextVar("degraded", default=None)   # lista razloga, deli se sa kopijama konteksta
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+def budgets() -> dict:
+    raw = (os.getenv("ROUTE_DEADLINES") or "").strip()
+    if raw == "0":
+        return {}
+    out = dict(DEFAULTS)
+    for part in raw.split(","):
+        key, _, value = part.partition("=")
+        if key.strip() and value.strip():
+            out[key.strip()] = float(value)
+    return out
+
+
+def begin(endpoint: str, seconds: float = None):
+    """Start the budget for one request; returns a token for end()."""
+    seconds = budgets().get(endpoint or "") if seconds is None else seconds
+    until = (time.monotonic() + seconds, endpoint) if seconds else None
+    return _current.set(until), _degraded.set([])
+
+
+def end(token):
+    if token is not None:
+        _current.reset(token[0])
+        _degraded.reset(token[1])
+
+
+def remaining():
+    """Seconds left, or None when the current request has no deadline."""
+    d = _current.get()
+    return None if d is None else d[0] - time.monotonic()
+
+
+def expired() -> bool:
+    left = remaining()
+    return left is not None and left < MIN_CALL_S
+
+
+def _endpoint() -> str:
+    d = _current.get()
+    return d[1] if d else "none"
+
+
+def exceeded(stage: str) -> DeadlineExceeded:
+    metrics.inc("deadline_misses_total", endpoint=_endpoint(), stage=stage)
+    return DeadlineExceeded(f"deadline exceeded before {stage}")
+
+
+def check(stage: str):
+    if expired():
+        raise exceeded(stage)
+
+
+def timeout(default: float, stage: str = "llm") -> float:
+    """Timeout for one upstream call: the default, capped by what is left of the deadline."""
+    left = remaining()
+    if left is None:
+        return default
+    if left < MIN_CALL_S:
+        raise exceeded(stage)
+    return min(default, left)
+
+
+#pauza pred retry samo ako posle nje ostaje vremena za jos jedan poziv
+def sleep(seconds: float, stage: str = "llm.retry"):
+    left = remaining()
+    if left is not None and left - seconds < MIN_CALL_S:
+        raise exceeded(stage)
+    time.sleep(seconds)
+
+
+async def asleep(seconds: float, stage: str = "llm.retry"):
+    left = remaining()
+    if left is not None and left - seconds < MIN_CALL_S:
+        raise exceeded(stage)
+    await asyncio.sleep(seconds)
+
+
+def degrade(reason: str):
+    """Mark the current response as (partly) served by a local fallback."""
+    metrics.inc("degraded_responses_total", endpoint=_endpoint(), reason=reason)
+    reasons = _degraded.get()
+    if reasons is not None and reason not in reasons:
+        reasons.append(reason)
+
+
+def degraded() -> list:
+    return list(_degraded.get() or [])
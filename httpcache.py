@@ -0,0 +1,126 @@
+# httpcache.py
+# HTTP kes za generisane stranice: slabi ETag/Last-Modified validatori i 304 pre ucitavanja i
+# renderovanja, gzip/brotli kompresija vecih odgovora i otisci (fingerprint) statickih fajlova.
+import os, gzip, hashlib
+from datetime import timezone
+from flask import request, session, Response
+
+try:
+    import brotli
+except ImportError:   # opciono; bez njega samo gzip
+    brotli = None
+
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+COMPRESS_TYPES = ("text/html", "text/plain", "text/css", "text/csv", "application/json",
+                  "application/javascript", "text/javascript", "image/svg+xml")
+STATIC_MAX_AGE = 365 * 24 * 3600
+
+_static_hashes = {}   # putanja -> (mtime, kratak hash sadrzaja)
+
+
+# ---- validatori ----
+
+def etag(*parts) -> str:
+    return hashlib.sha1("|".join(str(p) for p in parts).encode("utf-8")).hexdigest()[:20]
+
+
+def not_modified(tag: str, last_modified=None):
+    """Return a 304 response if the client's copy is current, else None.
+
+    Pending flash messages are rendered into the page, so then the page is
+    always rendered again.
+    """
+    if session.get("_flashes"):
+        return None
+    last_modified = _utc(last_modified)
+    fresh = request.if_none_match.contains_weak(tag) if request.if_none_match else (
+        last_modified is not None and request.if_modified_since is not None
+        and request.if_modified_since >= last_modified.replace(microsecond=0))
+    if not fresh:
+        return None
+    resp = Response(status=304)
+    _validators(resp, tag, last_modified)
+    return resp
+
+
+def cached(resp, tag: str, last_modified=None):
+    """Attach validators to a rendered page (string or Response)."""
+    if not isinstance(resp, Response):
+        resp = Response(resp, mimetype="text/html")
+    _validators(resp, tag, last_modified)
+    return resp
+
+
+#vremena u bazi su naivna UTC (datetime.utcnow)
+def _utc(dt):
+    return dt.replace(tzinfo=timezone.utc) if dt is not None and dt.tzinfo is None else dt
+
+
+def _validators(resp, tag: str, last_modified):
+    # slab ETag: isti sadrzaj moze stici i kompresovan
+    resp.set_etag(tag, weak=True)
+    if last_modified is not None:
+        resp.last_modified = _utc(last_modified)
+    resp.headers["Cache-Control"] = "private, no-cache"
+
+
+# ---- kompresija ----
+
+def _encoding():
+    accept = request.accept_encodings
+    if brotli is not None and accept["br"]:
+        return "br"
+    if accept["gzip"]:
+        return "gzip"
+    return None
+
+
+def compress(resp):
+    """after_request hook: gzip/brotli for buffered text responses above COMPRESS_MIN_BYTES."""
+    if (resp.direct_passthrough or resp.is_streamed or resp.status_code < 200 or resp.status_code in (204, 304)
+            or "Content-Encoding" in resp.headers or resp.mimetype not in COMPRESS_TYPES):
+        return resp
+    resp.vary.add("Accept-Encoding")
+    data = resp.get_data()
+    enc = _encoding() if len(data) >= COMPRESS_MIN_BYTES else None
+    if enc is None:
+        return resp
+    resp.set_data(brotli.compress(data, quality=5) if enc == "br" else gzip.compress(data, 6, mtime=0))
+    resp.headers["Content-Encoding"] = enc
+    return resp
+
+
+# ---- staticki fajlovi ----
+
+def static_version(static_folder: str, filename: str) -> str:
+    path = os.path.join(static_folder, filename)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    hit = _static_hashes.get(path)
+    if hit and hit[0] == mtime:
+        return hit[1]
+    with open(path, "rb") as f:
+        v = hashlib.md5(f.read()).hexdigest()[:10]
+    _static_hashes[path] = (mtime, v)
+    return v
+
+
+def install(app):
+    """Fingerprint url_for('static') with ?v=<hash> and serve such URLs with a one-year immutable cache."""
+    @app.url_defaults
+    def _static_fingerprint(endpoint, values):
+        if endpoint == "static" and "filename" in values and "v" not in values:
+            v = static_version(app.static_folder, values["filename"])
+            if v:
+                values["v"] = v
+
+    @app.after_request
+    def _static_cache(resp):
+        if request.endpoint == "static" and request.args.get("v") and resp.status_code in (200, 304):
+            # drugi sadrzaj dobija drugi ?v=, pa ovaj URL sme da se kesira zauvek
+            resp.headers["Cache-Control"] = f"public, max-age={STATIC_MAX_AGE}, immutable"
+        return resp
+
+    app.after_request(compress)
@@ -0,0 +1,138 @@
+# metrics.py
+# Brojaci i histogrami u memoriji procesa, izvoz u Prometheus text formatu (/metrics).
+import time, threading
+from contextlib import contextmanager
+import tracing
+
+PREFIX = "studyplatform_"
+
+# granice za latenciju u sekundama (od 5 ms do 2 min)
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+HELP = {
+    "stage_seconds": "Time spent per pipeline stage (extract, chunk, embed, retrieve, db).",
+    "llm_request_seconds": "LLM request latency per provider, model and operation.",
+    "http_request_seconds": "HTTP request latency per endpoint.",
+    "llm_tokens_total": "Prompt and completion tokens per model and operation.",
+    "llm_errors_total": "Failed LLM requests per provider and operation.",
+    "rate_limit_fallbacks_total": "Requests retried on the fallback model after a rate limit.",
+    "llm_route_total": "LLM calls per operation, routed model tier and routing reason.",
+    "llm_route_escalations_total": "Small-model responses that failed validation and were redone on the large model.",
+    "llm_route_offloaded_tokens_total": "Tokens served by the small model instead of the large one.",
+    "llm_route_saved_seconds_total": "Latency saved by small-model calls versus the large model's running average.",
+    "deadline_misses_total": "Upstream calls not started or retried because the request deadline ran out.",
+    "degraded_responses_total": "Responses served partly by a local fallback (stub, local grader, cached result).",
+    "coach_context_chunks_total": "Document chunks retrieved for coach turns: new to the conversation or already in its context.",
+    "coach_compactions_total": "Coach conversation compactions into the rolling summary (llm or local fallback).",
+    "precompute_total": "Post-ingest precompute stages (contexts, cards, summary) per result.",
+    "json_parse_failures_total": "LLM responses with no usable JSON.",
+    "extract_errors_total": "Documents whose text extraction failed.",
+    "cache_hits_total": "Cache hits per cache.",
+    "cache_misses_total": "Cache misses per cache.",
+}
+
+_lock = threading.Lock()
+_counters = {}     # (name, labels) -> vrednost
+_histograms = {}   # (name, labels) -> [brojevi po granicama, suma, broj]
+
+
+def _key(name: str, labels: dict):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def inc(name: str, value: float = 1, **labels):
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(name: str, seconds: float, **labels):
+    key = _key(name, labels)
+    with _lock:
+        h = _histograms.get(key)
+        if h is None:
+            h = _histograms[key] = [[0] * len(BUCKETS), 0.0, 0]
+        for i, b in enumerate(BUCKETS):
+            if seconds <= b:
+                h[0][i] += 1
+        h[1] += seconds
+        h[2] += 1
+
+
+@contextmanager
+def timed(name: str, **labels):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - t0, **labels)
+
+
+#faza se meri u histogramu i ujedno je span u stablu zahteva
+@contextmanager
+def stage(name: str):
+    with tracing.span(name), timed("stage_seconds", stage=name):
+        yield
+
+
+#jedan LLM poziv: latencija i tokeni (tokeni su 0 kada ih provajder ne vrati)
+def record_llm(provider: str, model: str, op: str, seconds: float,
+               prompt_tokens: int = 0, completion_tokens: int = 0):
+    observe("llm_request_seconds", seconds, provider=provider, model=model, op=op)
+    if prompt_tokens:
+        inc("llm_tokens_total", prompt_tokens, model=model, op=op, kind="prompt")
+    if completion_tokens:
+        inc("llm_tokens_total", completion_tokens, model=model, op=op, kind="completion")
+
+
+def cache(name: str, hit: bool):
+    inc("cache_hits_total" if hit else "cache_misses_total", cache=name)
+
+
+def _fmt_labels(labels, extra=()) -> str:
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    body = ",".join('{}="{}"'.format(k, v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+                    for k, v in pairs)
+    return "{" + body + "}"
+
+
+def _fmt_value(v: float) -> str:
+    return str(int(v)) if float(v).is_integer() else repr(float(v))
+
+
+def render() -> str:
+    """Return all metrics in the Prometheus text exposition format."""
+    with _lock:
+        counters = dict(_counters)
+        histograms = {k: [list(v[0]), v[1], v[2]] for k, v in _histograms.items()}
+
+    lines = []
+    for name in sorted({k[0] for k in counters}):
+        full = PREFIX + name
+        lines.append(f"# HELP {full} {HELP.get(name, name)}")
+        lines.append(f"# TYPE {full} counter")
+        for (n, labels), v in sorted(counters.items()):
+            if n == name:
+                lines.append(f"{full}{_fmt_labels(labels)} {_fmt_value(v)}")
+
+    for name in sorted({k[0] for k in histograms}):
+        full = PREFIX + name
+        lines.append(f"# HELP {full} {HELP.get(name, name)}")
+        lines.append(f"# TYPE {full} histogram")
+        for (n, labels), (counts, total, count) in sorted(histograms.items()):
+            if n != name:
+                continue
+            for b, c in zip(BUCKETS, counts):
+                lines.append(f"{full}_bucket{_fmt_labels(labels, [('le', repr(b))])} {c}")
+            lines.append(f"{full}_bucket{_fmt_labels(labels, [('le', '+Inf')])} {count}")
+            lines.append(f"{full}_sum{_fmt_labels(labels)} {_fmt_value(total)}")
+            lines.append(f"{full}_count{_fmt_labels(labels)} {count}")
+    return "\n".join(lines) + "\n"
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
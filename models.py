@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean, LargeBinary
 from sqlalchemy.orm import declarative_base, relationship
 from datetime import datetime
 
@@ -15,6 +15,7 @@ class Document(Base):
     summaries = relationship('Summary', back_populates='document', cascade='all,delete')
     quizzes   = relationship('Quiz',     back_populates='document', cascade='all,delete')
     flashcards= relationship('Flashcard',back_populates='document', cascade='all,delete')
+    bank_questions = relationship('BankQuestion', back_populates='document', cascade='all,delete')
 
 class Summary(Base):
     __tablename__ = 'summaries'
@@ -53,6 +54,25 @@ class Question(Base):
 
     quiz = relationship('Quiz', back_populates='questions')
 
+# ===== QUESTION BANK =====
+
+class BankQuestion(Base):
+    __tablename__ = 'bank_questions'
+    id = Column(Integer, primary_key=True)
+    document_id = Column(Integer, ForeignKey('documents.id'), nullable=False)
+    kind = Column(String(32))         # mcq|tf|short|fill
+    difficulty = Column(String(16))   # easy|medium|hard
+    prompt = Column(Text, nullable=False)
+    options = Column(Text)
+    correct_answer = Column(Text)
+    explanation = Column(Text)
+    chunk_index = Column(Integer, default=-1)   # chunk iz rag indeksa iz kog je pitanje nastalo
+    embedding = Column(LargeBinary)             # float32, za uklanjanje duplikata
+    times_used = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    document = relationship('Document', back_populates='bank_questions')
+
 # ===== FLASHCARDS =====
 
 class Flashcard(Base):
@@ -65,3 +85,43 @@ class Flashcard(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
 
     document = relationship('Document', back_populates='flashcards')
+
+# ===== POZADINSKI POSLOVI =====
+
+class Job(Base):
+    __tablename__ = 'jobs'
+    id = Column(String(32), primary_key=True)
+    kind = Column(String(32), nullable=False)     # quiz|flashcards|summary
+    document_id = Column(Integer)                 # bez FK: upload brise dokumente masovno
+    status = Column(String(16), default='queued') # queued|running|done|failed
+    params = Column(Text)                         # JSON
+    result = Column(Text)                         # JSON
+    error = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+
+# ===== COACH RAZGOVOR =====
+
+class CoachSession(Base):
+    __tablename__ = 'coach_sessions'
+    id = Column(String(32), primary_key=True)
+    document_id = Column(Integer)                 # bez FK, kao Job; drugi dokument = nov razgovor
+    summary = Column(Text, default='')            # sazetak kompaktovanih (starijih) poteza
+    context = Column(Text, default='[]')          # JSON [[chunk_id, poslednji potez], ...] vec poslati kontekst
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    turns = relationship('CoachTurn', back_populates='session', cascade='all,delete', order_by='CoachTurn.id')
+
+class CoachTurn(Base):
+    __tablename__ = 'coach_turns'
+    id = Column(Integer, primary_key=True)
+    session_id = Column(String(32), ForeignKey('coach_sessions.id'), nullable=False)
+    question = Column(Text, nullable=False)
+    answer = Column(Text, default='')
+    chunk_ids = Column(Text, default='[]')        # JSON: chunk-ovi pronadjeni za ovo pitanje
+    compacted = Column(Boolean, default=False)    # vec ukljucen u CoachSession.summary
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    session = relationship('CoachSession', back_populates='turns')
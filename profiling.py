@@ -0,0 +1,87 @@
+# profiling.py
+# Profilisanje pojedinacnog zahteva na zahtev (header X-Profile ili PROFILE_SAMPLE_RATE).
+# Sampling profiler uzorkuje stekove svih niti, jer async rute i embedding rade u drugim nitima.
+import os, sys, time, random, threading, collections
+
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")                       # bez tokena header se ignorise
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))   # udeo zahteva koji se profilise automatski
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+
+_busy = threading.Lock()   # najvise jedan profil u isto vreme
+
+
+def wanted(header_value: str) -> bool:
+    if PROFILE_TOKEN and header_value == PROFILE_TOKEN:
+        return True
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+class Sampler:
+    def __init__(self, interval_ms: float = None):
+        self.interval = (interval_ms or PROFILE_INTERVAL_MS) / 1000
+        self.stacks = collections.Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self._owner = False
+
+    def start(self) -> bool:
+        if not _busy.acquire(blocking=False):
+            return False
+        self._owner = True
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+        return True
+
+    def _run(self):
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                # niti koje samo cekaju (idle pool, server loop) ne zanimaju nas
+                if stack and stack[0].split(" ")[0] in ("wait", "select", "_worker", "accept", "poll"):
+                    continue
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self._owner:
+            _busy.release()
+            self._owner = False
+
+    def report(self, title: str, top: int = 30) -> str:
+        own = collections.Counter()
+        total = collections.Counter()
+        for stack, n in self.stacks.items():
+            frames = stack.split(";")
+            own[frames[-1]] += n
+            for f in set(frames):
+                total[f] += n
+        ms = self.interval * 1000
+        lines = [f"# {title}", f"# {self.samples} samples every {ms:.0f} ms (all threads)", "",
+                 "## self time"]
+        lines += [f"{n * ms:8.0f} ms  {f}" for f, n in own.most_common(top)]
+        lines += ["", "## total time (incl. callees)"]
+        lines += [f"{n * ms:8.0f} ms  {f}" for f, n in total.most_common(top)]
+        # collapsed stack format, moze direktno u flamegraph.pl / speedscope
+        lines += ["", "## collapsed stacks"]
+        lines += [f"{s} {n}" for s, n in self.stacks.most_common()]
+        return "\n".join(lines) + "\n"
+
+
+def dump(sampler: Sampler, out_dir: str, name: str) -> str:
+    os.makedirs(out_dir, exist_ok=True)
+    safe = "".join(ch if ch.isalnum() or ch in "-_" else "_" for ch in name)[:60]
+    path = os.path.join(out_dir, f"{time.strftime('%Y%m%d-%H%M%S')}-{safe}.txt")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(sampler.report(name))
+    return path
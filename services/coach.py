@@ -1,9 +1,11 @@
 # services/coach.py
-from ai_providers.groq_provider import GroqProvider
+from ai_providers.factory import lazy_provider
 import services.rag as rag
-import json
+import services.coach_memory as memory
+import deadlines
 
-_provider = GroqProvider()
+_provider = lazy_provider("coach")
+get_provider = _provider.get
 
 SYSTEM_COACH = (
   "You are a study coach. Answer concisely using ONLY the given context and plan info. "
@@ -12,11 +14,52 @@ SYSTEM_COACH = (
   "Answer in the language of the question."
 )
 
-def answer(q: str, full_text: str, plan_info: str, doc_id: int = None):
-    if doc_id is not None:
-        ctx = rag.build_context(doc_id, q, top_k=6, max_chars=15000)
-    else:
-        ctx = full_text[:4000]
-    user = json.dumps({"question": q, "plan": plan_info, "context": ctx}, ensure_ascii=False)
-    resp = _provider._chat(SYSTEM_COACH, user)
-    return resp.strip()
\ No newline at end of file
+SYSTEM_COACH_CHAT = SYSTEM_COACH + (
+  " The input has 'summary' (notes of the earlier conversation), 'history' (the latest turns) and "
+  "'context' (document chunks gathered over the conversation, including ones found for earlier questions). "
+  "Use them to resolve follow-up questions."
+)
+
+#bez odgovora modela u roku: najrelevantniji delovi dokumenta umesto odgovora
+def _local_answer(ctx: str) -> str:
+    deadlines.degrade("coach:context")
+    excerpt = (ctx or "").strip()[:1500]
+    if not excerpt:
+        return "AI odgovor nije stigao na vreme. Pokušaj ponovo za nekoliko trenutaka."
+    return "AI odgovor nije stigao na vreme. Najrelevantniji delovi dokumenta:\n\n" + excerpt
+
+
+# ---- razgovor (vise poteza, vidi coach_memory) ----
+
+def _retrieve(doc_id: int, full_text: str, q: str):
+    if doc_id is None:
+        return [], []
+    rag.ensure_index(doc_id, full_text)
+    hits = rag.retrieve(doc_id, q, top_k=memory.TOP_K)
+    return hits, rag.load_index(doc_id)[1]
+
+def _turn_prompt(conv, q: str, plan_info: str, hits: list, chunks: list) -> str:
+    pool = memory.select_context(conv, hits, chunks)
+    return memory.build_prompt(conv, q, plan_info, chunks, pool)
+
+async def aanswer_turn(s, conv, q: str, full_text: str, plan_info: str) -> str:
+    hits, chunks = await rag.run_blocking(_retrieve, conv.document_id, full_text, q)
+    prompt = _turn_prompt(conv, q, plan_info, hits, chunks)
+    try:
+        ans = (await get_provider()._achat(SYSTEM_COACH_CHAT, prompt, op="coach")).strip()
+    except deadlines.DeadlineExceeded:
+        ans = _local_answer("\n\n".join(h["text"] for h in hits))
+    memory.add_turn(s, conv, q, ans, [h["index"] for h in hits])
+    memory.schedule_compact(conv, get_provider())
+    return ans
+
+#tokeni odgovora; potez se upisuje tek kada se strim zavrsi (sazimanje ide u pozadini)
+def stream_turn(s, conv, q: str, full_text: str, plan_info: str):
+    hits, chunks = _retrieve(conv.document_id, full_text, q)
+    prompt = _turn_prompt(conv, q, plan_info, hits, chunks)
+    parts = []
+    for tok in get_provider()._chat_stream(SYSTEM_COACH_CHAT, prompt, op="coach"):
+        parts.append(tok)
+        yield tok
+    memory.add_turn(s, conv, q, "".join(parts).strip(), [h["index"] for h in hits])
+    memory.schedule_compact(conv, get_provider())
@@ -0,0 +1,180 @@
+# services/coach_memory.py
+# Memorija coach razgovora. Potezi i pronadjeni chunk-ovi se cuvaju u bazi; kontekst dokumenta se
+# drzi kao skup chunk-ova razgovora (svaki jednom, najvise COACH_CONTEXT_CHARS), pa pitanje koje
+# pogadja vec poslate delove ne dodaje nista novo. Kada summary + skorasnji potezi predju
+# COACH_MEMORY_TOKENS, stariji potezi se inkrementalno sazimaju u summary, u pozadini posle odgovora.
+# Prompt zato ostaje priblizno iste velicine i posle dugog razgovora.
+import os, re, json, uuid
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy.orm import object_session
+from models import CoachSession, CoachTurn
+from ai_providers import routing
+import metrics
+
+COACH_MEMORY_TOKENS = int(os.getenv("COACH_MEMORY_TOKENS", "2000"))   # summary + nekompaktovani potezi
+COACH_CONTEXT_CHARS = int(os.getenv("COACH_CONTEXT_CHARS", "8000"))   # chunk-ovi dokumenta u promptu
+COACH_KEEP_TURNS = int(os.getenv("COACH_KEEP_TURNS", "2"))            # poslednji potezi ostaju doslovno
+COACH_SUMMARY_CHARS = int(os.getenv("COACH_SUMMARY_CHARS", "2000"))
+TOP_K = 6
+
+_Session = None
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="coach-compact")
+
+SYSTEM_COMPACT = (
+    "You maintain running notes of a tutoring conversation about one study document. "
+    "Merge the existing notes ('summary') with the new turns ('turns') into updated notes. "
+    "Keep what the student asked, the key facts and definitions from the answers, and anything the "
+    "student struggled with; drop greetings and repetition. Write in the language of the conversation. "
+    f"Dense bullet points, at most {COACH_SUMMARY_CHARS} characters, no introduction."
+)
+
+
+def configure(session_factory):
+    global _Session
+    _Session = session_factory
+
+
+def open_session(s, conv_id: str, doc_id: int) -> CoachSession:
+    """The student's conversation about doc_id; a new one if there is none or it was about another document."""
+    conv = s.get(CoachSession, conv_id) if conv_id else None
+    if conv is not None and conv.document_id == doc_id:
+        return conv
+    if conv is not None:
+        s.delete(conv)
+    conv = CoachSession(id=uuid.uuid4().hex, document_id=doc_id, summary="", context="[]")
+    s.add(conv)
+    s.commit()
+    return conv
+
+
+#upload brise dokumente, a id-jevi u SQLite mogu ponovo da se dodele, pa razgovori idu sa njima
+def reset(s):
+    s.query(CoachTurn).delete(synchronize_session=False)
+    s.query(CoachSession).delete(synchronize_session=False)
+
+
+def recent(conv: CoachSession) -> list:
+    return [t for t in conv.turns if not t.compacted]
+
+
+#chunk-ovi ovog pitanja se dodaju na kraj (postojeci samo dobijaju novi broj poteza), pa se izbacuju
+#najduze nekorisceni dok sve ne stane; redosled ostaje stabilan, pa se pocetak prompta ne menja
+def select_context(conv: CoachSession, hits: list, chunks: list) -> list:
+    """Update the conversation's chunk pool with this question's hits; returns [[chunk_id, turn], ...]."""
+    turn = len(conv.turns)
+    pool = [p for p in json.loads(conv.context or "[]") if 0 <= p[0] < len(chunks)]
+    by_id = {p[0]: p for p in pool}
+    rank = {}
+    new = 0
+    for h in hits:
+        cid = h["index"]
+        if not 0 <= cid < len(chunks) or cid in rank:
+            continue
+        rank[cid] = len(rank)
+        if cid in by_id:
+            by_id[cid][1] = turn
+        else:
+            by_id[cid] = [cid, turn]
+            pool.append(by_id[cid])
+            new += 1
+    metrics.inc("coach_context_chunks_total", len(rank) - new, kind="reused")
+    metrics.inc("coach_context_chunks_total", new, kind="new")
+
+    size = sum(len(chunks[p[0]]) for p in pool)
+    # prvo stariji potezi, pa najslabije rangirani chunk-ovi ovog pitanja; bar jedan ostaje
+    for p in sorted(pool, key=lambda p: (p[1] == turn, p[1], -rank.get(p[0], 0))):
+        if size <= COACH_CONTEXT_CHARS or len(pool) == 1:
+            break
+        pool.remove(p)
+        size -= len(chunks[p[0]])
+    conv.context = json.dumps(pool)
+    return pool
+
+
+def build_prompt(conv: CoachSession, q: str, plan_info: str, chunks: list, pool: list) -> str:
+    return json.dumps({
+        "summary": conv.summary or "",
+        "history": [{"q": t.question, "a": t.answer} for t in recent(conv)],
+        "context": [{"id": cid, "text": chunks[cid]} for cid, _ in pool],
+        "plan": plan_info,
+        "question": q,
+    }, ensure_ascii=False)
+
+
+def add_turn(s, conv: CoachSession, q: str, answer: str, chunk_ids: list):
+    conv.turns.append(CoachTurn(question=q, answer=answer, chunk_ids=json.dumps(chunk_ids)))
+    s.commit()
+
+
+# ---- sazimanje ----
+
+#potezi za sazimanje: svi nekompaktovani osim poslednjih COACH_KEEP_TURNS, ali tek kad se predje budzet
+def _due(conv: CoachSession) -> list:
+    turns = recent(conv)
+    if routing.estimate_tokens(conv.summary, *[t.question + t.answer for t in turns]) <= COACH_MEMORY_TOKENS:
+        return []
+    return turns[:len(turns) - COACH_KEEP_TURNS] if COACH_KEEP_TURNS else turns
+
+
+def _compact_request(conv: CoachSession, turns: list) -> str:
+    return json.dumps({"summary": conv.summary or "",
+                       "turns": [{"q": t.question, "a": t.answer} for t in turns]}, ensure_ascii=False)
+
+
+def _first_sentence(text: str) -> str:
+    return re.split(r"(?<=[.!?])\s+", (text or "").strip(), maxsplit=1)[0][:200]
+
+
+#bez modela (greska ili isteklo vreme): pitanje + prva recenica odgovora, najnovije beleske ostaju
+def _local_summary(conv: CoachSession, turns: list) -> str:
+    notes = [f"- {t.question.strip()} → {_first_sentence(t.answer)}" for t in turns]
+    text = "\n".join(x for x in [(conv.summary or "").strip()] + notes if x)
+    return text[-COACH_SUMMARY_CHARS:]
+
+
+def _apply(s, conv: CoachSession, turns: list, summary: str, mode: str):
+    conv.summary = summary[:COACH_SUMMARY_CHARS]
+    for t in turns:
+        t.compacted = True
+    s.commit()
+    metrics.inc("coach_compactions_total", mode=mode)
+
+
+def compact(s, conv: CoachSession, provider):
+    turns = _due(conv)
+    if not turns:
+        return
+    try:
+        out = (provider._chat(SYSTEM_COMPACT, _compact_request(conv, turns), op="coach_compact") or "").strip()
+    except Exception as e:
+        print("Coach compaction failed:", e)
+        out = ""
+    if out:
+        _apply(s, conv, turns, out, "llm")
+    else:
+        _apply(s, conv, turns, _local_summary(conv, turns), "local")
+
+
+#sazimanje je poziv modela, pa ne sme da produzi odgovor: radi ga jedna pozadinska nit sa svojom sesijom
+def schedule_compact(conv: CoachSession, provider):
+    """Compact conv in the background if it is over budget (inline when no session factory is configured)."""
+    if not _due(conv):
+        return
+    if _Session is None:
+        compact(object_session(conv), conv, provider)
+        return
+    _executor.submit(_compact_job, conv.id, provider)
+
+
+def _compact_job(conv_id: str, provider):
+    s = _Session()
+    try:
+        conv = s.get(CoachSession, conv_id)
+        if conv is not None:
+            compact(s, conv, provider)
+    except Exception as e:
+        # razgovor je u medjuvremenu obrisan (novi upload ili reset)
+        s.rollback()
+        print("Coach compaction failed:", e)
+    finally:
+        _Session.remove()
@@ -0,0 +1,88 @@
+# services/embedders.py
+# Backend-i za embedding, bira se preko RAG_EMBEDDER:
+#   float32  - sentence-transformers model u punoj preciznosti (podrazumevano)
+#   int8     - isti model, Linear slojevi dinamicki kvantizovani na int8 (brzi CPU, manji RSS)
+#   hashing  - hesirane reci i parovi reci, samo numpy (minimalne instalacije, testovi)
+import os, re, zlib
+from abc import ABC, abstractmethod
+import numpy as np
+
+BACKENDS = ("float32", "int8", "hashing")
+DEFAULT_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+HASHING_DIM = 1024
+
+
+class Embedder(ABC):
+    name = ""
+
+    @abstractmethod
+    def encode(self, texts: list) -> np.ndarray:
+        """Return L2-normalized float32 rows, one per text."""
+
+
+class SentenceTransformerEmbedder(Embedder):
+    def __init__(self, model_name: str = DEFAULT_MODEL, quantize: bool = False):
+        # torch i sentence_transformers tek ovde, da hashing backend radi i bez njih
+        from sentence_transformers import SentenceTransformer
+        model = SentenceTransformer(model_name, device="cpu" if quantize else None)
+        if quantize:
+            import torch
+            model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        self.model = model
+        self.name = backend_name("int8" if quantize else "float32", model_name)
+
+    def encode(self, texts: list) -> np.ndarray:
+        embs = self.model.encode(list(texts), convert_to_numpy=True, normalize_embeddings=True)
+        return embs.astype(np.float32, copy=False)
+
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+class HashingEmbedder(Embedder):
+    """Signed feature hashing of lowercased words, word stems and adjacent word pairs."""
+
+    def __init__(self, dim: int = HASHING_DIM):
+        self.dim = dim
+        self.name = backend_name("hashing", dim=dim)
+
+    #prefiks reci kao grubi "koren", da padezi i oblici iste reci dele feature
+    def _features(self, text: str) -> list:
+        words = _TOKEN.findall(text.lower())
+        feats = words + [w[:5] + "~" for w in words if len(w) > 6]
+        feats += [a + " " + b for a, b in zip(words, words[1:])]
+        return feats
+
+    def encode(self, texts: list) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            row = out[i]
+            for f in self._features(text or ""):
+                h = zlib.crc32(f.encode("utf-8"))
+                row[h % self.dim] += 1.0 if h & 0x80000000 else -1.0
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return out / norms
+
+
+def configured_backend() -> str:
+    kind = (os.getenv("RAG_EMBEDDER") or "float32").strip().lower()
+    if kind not in BACKENDS:
+        raise ValueError(f"RAG_EMBEDDER={kind!r}, expected one of {', '.join(BACKENDS)}")
+    return kind
+
+
+#ime koje se upisuje u indeks; racuna se bez ucitavanja modela
+def backend_name(kind: str = None, model_name: str = None, dim: int = HASHING_DIM) -> str:
+    kind = kind or configured_backend()
+    if kind == "hashing":
+        return f"hashing:{dim}"
+    model_name = model_name or os.getenv("RAG_EMBED_MODEL", DEFAULT_MODEL)
+    return f"{kind}:{model_name}"
+
+
+def create_embedder(kind: str = None) -> Embedder:
+    kind = kind or configured_backend()
+    if kind == "hashing":
+        return HashingEmbedder()
+    return SentenceTransformerEmbedder(os.getenv("RAG_EMBED_MODEL", DEFAULT_MODEL), quantize=kind == "int8")
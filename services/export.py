@@ -0,0 +1,141 @@
+# services/export.py
+# Strimovani izvoz kviz pitanja, kartica i sazetaka (Anki TSV, CSV, JSONL), opciono gzip.
+# Redovi se citaju u serijama (keyset: svaka serija je kratka transakcija) i odmah salju, bez
+# privremenih fajlova, pa memorija i disk ne rastu sa velicinom izvoza, a spor klijent ne drzi
+# read transakciju (i SQLite zakljucavanje) otvorenu tokom celog preuzimanja.
+import csv, io, json, zlib
+from sqlalchemy import select, tuple_
+from models import Document, Summary, Quiz, Question, Flashcard
+
+KINDS = ("quizzes", "flashcards", "summaries")
+FORMATS = ("anki", "csv", "jsonl")
+BATCH = 500
+
+# kolone za CSV/JSONL po vrsti izvoza
+FIELDS = {
+    "quizzes": ("document_id", "filename", "quiz_id", "question_id", "kind", "difficulty", "prompt",
+                "options", "correct_answer", "explanation"),
+    "flashcards": ("document_id", "filename", "card_id", "front", "back", "known"),
+    "summaries": ("document_id", "filename", "summary_id", "title", "word_count", "created_at", "text"),
+}
+
+_MIME = {"anki": "text/tab-separated-values", "csv": "text/csv", "jsonl": "application/x-ndjson"}
+_EXT = {"anki": "txt", "csv": "csv", "jsonl": "jsonl"}
+
+
+# kolone sortiranja (jedinstvene zajedno) i njihova mesta u redu, za nastavak posle poslednjeg reda serije
+_ORDER = {
+    "quizzes": ((Document.id, Quiz.id, Question.id), (0, 2, 3)),
+    "flashcards": ((Document.id, Flashcard.id), (0, 2)),
+    "summaries": ((Document.id, Summary.id), (0, 2)),
+}
+
+
+def _query(kind: str, doc_id: int = None):
+    if kind == "quizzes":
+        q = (select(Document.id, Document.filename, Quiz.id, Question.id, Question.kind, Question.difficulty,
+                    Question.prompt, Question.options, Question.correct_answer, Question.explanation)
+             .join(Quiz, Quiz.document_id == Document.id).join(Question, Question.quiz_id == Quiz.id)
+             .order_by(Document.id, Quiz.id, Question.id))
+    elif kind == "flashcards":
+        q = (select(Document.id, Document.filename, Flashcard.id, Flashcard.front, Flashcard.back, Flashcard.known)
+             .join(Flashcard, Flashcard.document_id == Document.id).order_by(Document.id, Flashcard.id))
+    else:
+        q = (select(Document.id, Document.filename, Summary.id, Summary.title, Summary.word_count,
+                    Summary.created_at, Summary.text)
+             .join(Summary, Summary.document_id == Document.id).order_by(Document.id, Summary.id))
+    if doc_id is not None:
+        q = q.where(Document.id == doc_id)
+    return q
+
+
+#Core redovi (bez ORM objekata), pa se nista ne gomila u identity map-u sesije.
+#Posle svake serije transakcija se zatvara; izvoz koji traje dok se pise vidi i nove redove.
+def rows(s, kind: str, doc_id: int = None):
+    cols, idx = _ORDER[kind]
+    last = None
+    while True:
+        q = _query(kind, doc_id)
+        if last is not None:
+            q = q.where(tuple_(*cols) > tuple_(*last))
+        batch = s.execute(q.limit(BATCH)).all()
+        s.rollback()
+        for row in batch:
+            yield dict(zip(FIELDS[kind], row))
+        if len(batch) < BATCH:
+            return
+        last = [batch[-1][i] for i in idx]
+
+
+# ---- formati ----
+
+def _anki_field(text) -> str:
+    # html:true u zaglavlju: novi redovi kao <br>, tab bi razbio kolone
+    t = (str(text) if text is not None else "").replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+    return t.replace("\t", " ").replace("\r\n", "\n").replace("\n", "<br>")
+
+
+def _anki_card(kind: str, r: dict):
+    if kind == "flashcards":
+        front, back = r["front"], r["back"]
+    else:
+        options = [o.strip() for o in (r["options"] or "").split("|") if o.strip()]
+        front = "\n".join([r["prompt"]] + options)
+        back = "\n\n".join(x for x in (r["correct_answer"], r["explanation"]) if x)
+    tags = f"doc{r['document_id']} {kind}" + (f" {r['kind']} {r['difficulty']}" if kind == "quizzes" else "")
+    return f"{_anki_field(front)}\t{_anki_field(back)}\t{tags}\n"
+
+
+def lines(kind: str, fmt: str, records):
+    """Yield export lines (str) for an iterable of row dicts."""
+    if fmt == "anki":
+        if kind == "summaries":
+            raise ValueError("Anki export is available for quizzes and flashcards")
+        yield "#separator:tab\n#html:true\n#tags column:3\n"
+        for r in records:
+            yield _anki_card(kind, r)
+    elif fmt == "csv":
+        buf = io.StringIO()
+        w = csv.writer(buf)
+        w.writerow(FIELDS[kind])
+        yield buf.getvalue()
+        for r in records:
+            buf.seek(0)
+            buf.truncate()
+            w.writerow(["" if r[k] is None else r[k] for k in FIELDS[kind]])
+            yield buf.getvalue()
+    elif fmt == "jsonl":
+        for r in records:
+            yield json.dumps(r, ensure_ascii=False, default=str) + "\n"
+    else:
+        raise ValueError(f"unknown format {fmt!r}")
+
+
+#spaja male redove u blokove (~64 KB) i opciono ih gzip-uje u hodu
+def encode(chunks, compress: bool = False, block: int = 64 * 1024):
+    z = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    buf, size = [], 0
+    for c in chunks:
+        b = c.encode("utf-8")
+        buf.append(b)
+        size += len(b)
+        if size >= block:
+            data = b"".join(buf)
+            buf, size = [], 0
+            data = z.compress(data) if z else data
+            if data:
+                yield data
+    data = b"".join(buf)
+    if z:
+        data = z.compress(data) + z.flush()
+    if data:
+        yield data
+
+
+def filename(kind: str, fmt: str, doc_id: int = None, compress: bool = False) -> str:
+    scope = f"doc{doc_id}" if doc_id is not None else "library"
+    return f"{kind}_{scope}.{_EXT[fmt]}" + (".gz" if compress else "")
+
+
+def mimetype(fmt: str, compress: bool = False) -> str:
+    return "application/gzip" if compress else _MIME[fmt] + "; charset=utf-8"
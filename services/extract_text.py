@@ -1,9 +1,13 @@
 from pypdf import PdfReader
+import metrics
 
 
 def from_pdf(path: str) -> str:
     try:
-        reader = PdfReader(path)
-        return '\n'.join((page.extract_text() or '') for page in reader.pages)
-    except Exception:
+        with metrics.stage("extract"):
+            reader = PdfReader(path)
+            return '\n'.join((page.extract_text() or '') for page in reader.pages)
+    except Exception as e:
+        metrics.inc("extract_errors_total")
+        print("PDF extraction failed:", e)
         return ''
\ No newline at end of file
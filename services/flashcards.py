@@ -1,39 +1,176 @@
 # services/flashcards.py
-import os
+import os, math, asyncio
+import numpy as np
 import services.rag as rag
-from ai_providers.local_stub import LocalStub
-from ai_providers.groq_provider import GroqProvider
-
-_provider = None
-
-def _get_provider():
-    global _provider
-    if _provider is not None:
-        return _provider
-    if os.getenv("GROQ_API_KEY"):
-        try:
-            _provider = GroqProvider(model=os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile"))
-            return _provider
-        except Exception as e:
-            print("Groq init failed in flashcards:", e)
-    _provider = LocalStub()
-    return _provider
-
-def make_cards_from_rag(doc_id: int, full_text: str, n: int = 10) -> list:
-    hint = "Generate concise Q/A flashcards for core definitions, key concepts and relationships."
-    ctx = rag.build_context(doc_id, hint, top_k=5, max_chars=2000)
-    if not ctx:
-        ctx = (full_text or "")[:3000]
-
-    prov = _get_provider()
-    cards = prov.make_flashcards(ctx, n) or []
-
-    if len(cards) < n:
-        extra = LocalStub().make_flashcards(ctx, n - len(cards))
-        cards.extend(extra)
+import metrics
+import deadlines
+from ai_providers.factory import lazy_provider
 
+_provider = lazy_provider("flashcards")
+get_provider = _provider.get
+
+# inkrementalni spil: koliko kartica po klasteru u jednom zahtevu, prag za duplikate, paralelni pozivi
+CARDS_PER_CLUSTER = int(os.getenv("CARDS_PER_CLUSTER", "4"))
+CARDS_DUP_SIM = float(os.getenv("CARDS_DUP_SIM", "0.9"))
+CARDS_CONCURRENCY = int(os.getenv("CARDS_CONCURRENCY", "4"))
+CARDS_ROUNDS = 2
+CARDS_DEFAULT = 10   # podrazumevana velicina spila u formi; precompute priprema njegove klastere
+CARDS_MAX = int(os.getenv("CARDS_MAX", "200"))   # najveci spil koji forma i API prihvataju
+
+#velicina spila: ceo broj 1..CARDS_MAX (forma salje string, API JSON broj)
+def deck_size(value) -> int:
+    try:
+        n = int(str(value).strip())
+    except ValueError:
+        n = None
+    if isinstance(value, bool) or n is None or not 1 <= n <= CARDS_MAX:
+        raise ValueError(f"count must be an integer between 1 and {CARDS_MAX}")
+    return n
+
+# ---- inkrementalni spil po pokrivenosti ----
+
+def _card_text(front: str, back: str) -> str:
+    return f"{front} {back}"
+
+#klasteri chunk embedding-a dokumenta; vraca (centroidi, labela po chunku)
+def _cluster(embs: np.ndarray, k: int):
+    from sklearn.cluster import KMeans
+    k = max(1, min(k, len(embs)))
+    if k == 1:
+        return embs.mean(axis=0, keepdims=True), np.zeros(len(embs), dtype=int)
+    km = KMeans(n_clusters=k, n_init=4, random_state=0).fit(embs)
+    return km.cluster_centers_, km.labels_
+
+#klasteri se cuvaju pored indeksa dokumenta i vaze dok se indeks ne izgradi ponovo
+def _clusters_path(doc_id: int, k: int) -> str:
+    return os.path.join(os.path.dirname(rag._paths(doc_id)["emb"]), f"clusters_{k}.npz")
+
+def _load_clusters(doc_id: int, k: int):
+    try:
+        with np.load(_clusters_path(doc_id, k)) as z:
+            if int(z["stamp"]) == rag.index_stamp(doc_id):
+                return z["centers"], z["labels"]
+    except (OSError, KeyError, ValueError):
+        pass
+    return None
+
+def doc_clusters(doc_id: int, embs: np.ndarray, k: int):
+    """_cluster over the document's index embeddings, cached on disk per k."""
+    cached = _load_clusters(doc_id, k)
+    metrics.cache("card_clusters", cached is not None)
+    if cached is not None:
+        return cached
+    stamp = rag.index_stamp(doc_id)
+    centers, labels = _cluster(embs, k)
+    if stamp is not None:
+        path = _clusters_path(doc_id, k)
+        tmp = path[:-len(".npz")] + ".tmp.npz"
+        np.savez(tmp, centers=centers, labels=labels, stamp=np.int64(stamp))
+        os.replace(tmp, path)
+    return centers, labels
+
+def has_clusters(doc_id: int, target: int = CARDS_DEFAULT) -> bool:
+    return _load_clusters(doc_id, math.ceil(target / CARDS_PER_CLUSTER)) is not None
+
+#unapred (posle otpremanja): klasteri za prvi spil podrazumevane velicine
+def prepare(doc_id: int, full_text: str, target: int = CARDS_DEFAULT):
+    rag.ensure_index(doc_id, full_text)
+    embs, chunks = rag.load_index(doc_id)
+    if embs is not None and chunks:
+        doc_clusters(doc_id, embs, math.ceil(target / CARDS_PER_CLUSTER))
+
+def _cluster_context(chunks: list, embs: np.ndarray, labels: np.ndarray, center: np.ndarray, c: int,
+                     max_chars: int = 2000) -> str:
+    idx = [i for i in range(len(chunks)) if labels[i] == c]
+    idx.sort(key=lambda i: -float(embs[i] @ center))
+    return "\n\n".join(chunks[i] for i in idx)[:max_chars]
+
+def _plan(coverage: np.ndarray, need: int, offset: int) -> list:
+    #najmanje pokriveni klasteri prvi; (klaster, broj kartica)
+    order = sorted(range(len(coverage)), key=lambda c: (coverage[c], c))
+    order = order[offset % len(order):] + order[:offset % len(order)]
+    plan = []
+    while need > 0:
+        for c in order:
+            if need <= 0:
+                break
+            n = min(CARDS_PER_CLUSTER, need)
+            plan.append((c, n))
+            need -= n
+    return plan
+
+async def agrow_deck(doc_id: int, full_text: str, existing: list, target: int) -> list:
+    """Return only the new cards needed to grow a deck to `target` cards.
+
+    existing: [(front, back)] of the cards already in the deck (kept as is).
+    New cards come from the least covered clusters of the document's chunk
+    embeddings and near-duplicates of any card in the deck are dropped.
+    """
+    need = target - len(existing)
+    if need <= 0:
+        return []
+
+    await rag.aensure_index(doc_id, full_text)
+    embs, chunks = rag.load_index(doc_id)
+    k = math.ceil(target / CARDS_PER_CLUSTER)
+    if embs is None or not chunks:
+        chunks = rag.chunk_text(full_text)
+        embs = await rag.run_blocking(rag.embed, chunks)
+        centers, labels = await rag.run_blocking(_cluster, embs, k)
+    else:
+        centers, labels = await rag.run_blocking(doc_clusters, doc_id, embs, k)
+    centers = centers / (np.linalg.norm(centers, axis=1, keepdims=True) + 1e-9)
+
+    kept = []
+    if existing:
+        kept = list(await rag.run_blocking(rag.embed, [_card_text(f, b) for f, b in existing]))
+    coverage = np.zeros(len(centers))
+    for e in kept:
+        coverage[int(np.argmax(centers @ e))] += 1
+
+    prov = get_provider()
+    sem = asyncio.Semaphore(CARDS_CONCURRENCY)
+
+    async def one(c: int, n: int) -> list:
+        ctx = _cluster_context(chunks, embs, labels, centers[c], c)
+        async with sem:
+            try:
+                return await prov.amake_flashcards(ctx, n) or []
+            except deadlines.DeadlineExceeded:
+                deadlines.degrade("cards:partial")
+                return []
+            except Exception as e:
+                print("Flashcard batch failed:", e)
+                return []
+
+    out = []
+    for rnd in range(CARDS_ROUNDS):
+        left = need - len(out)
+        if left <= 0:
+            break
+        if deadlines.expired():
+            deadlines.degrade("cards:partial")
+            break
+        plan = _plan(coverage, left, rnd)
+        results = await asyncio.gather(*[one(c, n) for c, n in plan])
+        cands = [c for res in results for c in _finalize_cards(res)]
+        if not cands:
+            continue
+        cand_embs = await rag.run_blocking(rag.embed, [_card_text(c["front"], c["back"]) for c in cands])
+        for card, e in zip(cands, cand_embs):
+            if len(out) >= need:
+                break
+            if kept and float(np.max(np.stack(kept) @ e)) >= CARDS_DUP_SIM:
+                continue
+            kept.append(e)
+            coverage[int(np.argmax(centers @ e))] += 1
+            out.append(card)
+    return out
+
+#normalizacija: kartice bez prednje ili zadnje strane se izbacuju
+def _finalize_cards(cards: list) -> list:
     out = []
-    for c in cards[:n]:
+    for c in cards:
         f = (c.get("front") or "").strip()
         b = (c.get("back") or "").strip()
         if f and b:
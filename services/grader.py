@@ -1,4 +1,13 @@
-from .quizzer import _get_provider
+from .quizzer import get_provider
 
 def grade_freeform(question: str, ground_truth: str, user_answer: str) -> dict:
-    return _get_provider().grade_freeform(question, ground_truth, user_answer)
+    return get_provider().grade_freeform(question, ground_truth, user_answer)
+
+async def agrade_freeform(question: str, ground_truth: str, user_answer: str) -> dict:
+    return await get_provider().agrade_freeform(question, ground_truth, user_answer)
+
+def grade_freeform_batch(items: list) -> list:
+    return get_provider().grade_freeform_batch(items)
+
+async def agrade_freeform_batch(items: list) -> list:
+    return await get_provider().agrade_freeform_batch(items)
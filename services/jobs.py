@@ -0,0 +1,106 @@
+# services/jobs.py
+# Pozadinski poslovi generisanja pokrenuti preko JSON API-ja. Status je u tabeli jobs, pa ga
+# vidi svaki radnik; sam posao se izvrsava u pool-u procesa koji ga je primio.
+import os, json, uuid, asyncio
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import func
+from models import Job
+
+JOBS_WORKERS = int(os.getenv("JOBS_WORKERS", "2"))
+JOBS_STALE_S = int(os.getenv("JOBS_STALE_S", "600"))   # posao bez napretka ovoliko dugo smatra se prekinutim
+
+_Session = None
+_executor = ThreadPoolExecutor(max_workers=JOBS_WORKERS, thread_name_prefix="jobs")
+_handlers = {}   # kind -> async fn(session, doc_id, params) -> dict
+_checks = {}     # kind -> fn(params); ValueError za neispravne parametre
+
+
+def configure(session_factory):
+    global _Session
+    _Session = session_factory
+
+
+#poslovi ostaju u redu samo u memoriji procesa koji ih je primio; ako je proces ugasen pre nego sto su
+#zavrseni, zapis bi zauvek ostao queued/running. Takvi zapisi se oznacavaju kao neuspeli pri pokretanju
+#i kad ih neko procita. Starost stiti poslove drugih radnika (gunicorn) koji su jos zivi.
+def stale(job: Job) -> bool:
+    since = job.started_at or job.created_at
+    return (job.status in ("queued", "running") and since is not None
+            and datetime.utcnow() - since > timedelta(seconds=JOBS_STALE_S))
+
+
+def recover(ids=None) -> int:
+    """Mark queued/running jobs idle for over JOBS_STALE_S (all, or only ids) as failed; returns the count."""
+    s = _Session()
+    cutoff = datetime.utcnow() - timedelta(seconds=JOBS_STALE_S)
+    q = s.query(Job).filter(Job.status.in_(("queued", "running")),
+                            func.coalesce(Job.started_at, Job.created_at) < cutoff)
+    if ids is not None:
+        q = q.filter(Job.id.in_(list(ids)))
+    n = q.update({Job.status: "failed", Job.error: "interrupted: the server stopped before the job finished",
+                  Job.finished_at: datetime.utcnow()}, synchronize_session=False)
+    s.commit()
+    if n:
+        print(f"[jobs] marked {n} interrupted job(s) as failed")
+    return n
+
+
+def register(kind: str, handler, check=None):
+    _handlers[kind] = handler
+    if check is not None:
+        _checks[kind] = check
+
+
+def kinds() -> tuple:
+    return tuple(_handlers)
+
+
+def submit(s, kind: str, doc_id: int, params: dict) -> Job:
+    """Add a queued job to the session; call start(job.id) after the caller commits.
+
+    Raises ValueError for an unknown kind or params its check rejects.
+    """
+    if kind not in _handlers:
+        raise ValueError(f"unknown job type {kind!r}")
+    if kind in _checks:
+        _checks[kind](params or {})
+    job = Job(id=uuid.uuid4().hex, kind=kind, document_id=doc_id, params=json.dumps(params or {}))
+    s.add(job)
+    return job
+
+
+def start(job_id: str):
+    _executor.submit(_run, job_id)
+
+
+def _set(job_id: str, **fields):
+    s = _Session()
+    s.query(Job).filter_by(id=job_id).update(fields, synchronize_session=False)
+    s.commit()
+
+
+def _run(job_id: str):
+    try:
+        s = _Session()
+        job = s.get(Job, job_id)
+        kind, doc_id, params = job.kind, job.document_id, json.loads(job.params or "{}")
+        _set(job_id, status="running", started_at=datetime.utcnow())
+        result = asyncio.run(_handlers[kind](s, doc_id, params))
+        _set(job_id, status="done", result=json.dumps(result, ensure_ascii=False), finished_at=datetime.utcnow())
+    except Exception as e:
+        print(f"[jobs] {job_id} failed:", e)
+        _Session.rollback()
+        _set(job_id, status="failed", error=f"{type(e).__name__}: {e}", finished_at=datetime.utcnow())
+    finally:
+        _Session.remove()
+
+
+def as_dict(job: Job) -> dict:
+    return {
+        "id": job.id, "type": job.kind, "doc_id": job.document_id, "status": job.status,
+        "result": json.loads(job.result) if job.result else None, "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
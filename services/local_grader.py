@@ -0,0 +1,196 @@
+# services/local_grader.py
+# Lokalno ocenjivanje kratkih/dopuna odgovora preko embedding-a iz services/rag.
+# Jasni slucajevi se resavaju lokalno; LLM dobija samo odgovore u "sivoj zoni".
+import os, re, threading, unicodedata
+import numpy as np
+import services.rag as rag
+from services import embedders
+import deadlines
+
+ACCEPT = float(os.getenv("LOCAL_GRADER_ACCEPT", "0.85"))
+REJECT = float(os.getenv("LOCAL_GRADER_REJECT", "0.45"))
+# kada LLM ne stigne u roku zahteva, siva zona se deli na sredini
+FALLBACK_ACCEPT = (ACCEPT + REJECT) / 2
+# najmanje preklapanje reci (|A∩B| / |A∪B|) da bi se odgovor prihvatio bez embedding-a
+TOKEN_OVERLAP = float(os.getenv("LOCAL_GRADER_OVERLAP", "0.75"))
+
+_stats = {"graded": 0, "local_accept": 0, "local_reject": 0, "escalated": 0}
+_stats_lock = threading.Lock()
+
+_NUMBERS = {
+    # srpski (bez dijakritika, vidi _strip_diacritics)
+    "nula": "0", "jedan": "1", "jedna": "1", "jedno": "1", "dva": "2", "dve": "2", "tri": "3",
+    "cetiri": "4", "pet": "5", "sest": "6", "sedam": "7", "osam": "8", "devet": "9", "deset": "10",
+    "jedanaest": "11", "dvanaest": "12", "dvadeset": "20", "trideset": "30", "sto": "100",
+    "hiljadu": "1000",
+    # engleski
+    "zero": "0", "one": "1", "two": "2", "three": "3", "four": "4", "five": "5", "six": "6",
+    "seven": "7", "eight": "8", "nine": "9", "ten": "10", "eleven": "11", "twelve": "12",
+    "twenty": "20", "thirty": "30", "hundred": "100", "thousand": "1000",
+}
+
+# eksplicitne fraze posle kojih objasnjenje navodi sinonim; samo "ili"/"or" cesce uvodi drugi,
+# pogresan pojam nego sinonim, pa se ne racuna
+_SYNONYM_RE = re.compile(
+    r"\b(?:also called|also known as|known as|i\.e\.|tj\.|odnosno|poznat(?:o|a)? kao)\s+"
+    r"([^.,;:()]{1,60})",
+    re.IGNORECASE,
+)
+
+
+def _strip_diacritics(text: str) -> str:
+    text = text.replace("đ", "dj").replace("Đ", "Dj")
+    nfkd = unicodedata.normalize("NFKD", text)
+    return "".join(ch for ch in nfkd if not unicodedata.combining(ch))
+
+
+#brojevi recima se pretvaraju samo kad je tacan odgovor broj ("pet" ili "sto" su inace obicne reci)
+def normalize(text: str, numbers: bool = False) -> str:
+    t = _strip_diacritics((text or "").lower())
+    t = re.sub(r"[^\w\s]", " ", t)
+    words = t.split()
+    if numbers:
+        words = [_NUMBERS.get(w, w) for w in words]
+    return " ".join(words)
+
+
+def is_numeric(ground_truth: str) -> bool:
+    words = normalize(ground_truth).split()
+    return bool(words) and (any(w.isdigit() for w in words) or all(w in _NUMBERS for w in words))
+
+
+#prihvatljive varijante tacnog odgovora: sam odgovor, delovi "X (Y)", "X / Y" i sinonimi iz objasnjenja
+def variants(ground_truth: str, explanation: str = "", numbers: bool = False) -> list:
+    gt = ground_truth or ""
+    raw = [gt]
+    raw += re.split(r"[/;|]", gt)
+    raw += re.findall(r"\(([^)]+)\)", gt)
+    raw.append(re.sub(r"\([^)]*\)", "", gt))
+    if explanation:
+        raw += _SYNONYM_RE.findall(_strip_diacritics(explanation))
+    out = []
+    for v in raw:
+        n = normalize(v, numbers)
+        if n and n not in out:
+            out.append(n)
+    return out
+
+
+_NEGATIONS = {"not", "no", "never", "ne", "nije", "nisu", "nema", "nikad"}
+
+
+def _token_match(answer: str, variant: str) -> bool:
+    a, v = answer.split(), variant.split()
+    if not a or not v:
+        return False
+    if answer == variant:
+        return True
+    # "nije X" ne sme da prodje kao "X"; takve odgovore ocenjuje embedding/LLM
+    if (_NEGATIONS & set(a)) - set(v):
+        return False
+    # skoro isti skup reci u oba smera; "odgovor sadrzi tacan" bi prihvatio nabrajanje svega redom
+    sa, sv = set(a), set(v)
+    return len(sa & sv) / len(sa | sv) >= TOKEN_OVERLAP
+
+
+def score_batch(items: list) -> list:
+    """Return a similarity score in [0, 1] for every {ground_truth, user_answer, explanation?} item."""
+    numeric = [is_numeric(it.get("ground_truth", "")) for it in items]
+    answers = [normalize(it.get("user_answer", ""), num) for it, num in zip(items, numeric)]
+    vars_per_item = [variants(it.get("ground_truth", ""), it.get("explanation", ""), num)
+                     for it, num in zip(items, numeric)]
+    scores = [0.0] * len(items)
+
+    to_embed, idx = [], []
+    for i, (ans, vs) in enumerate(zip(answers, vars_per_item)):
+        if not ans or not vs:
+            continue
+        if any(_token_match(ans, v) for v in vs):
+            scores[i] = 1.0
+            continue
+        idx.append(i)
+        to_embed.append(ans)
+        to_embed.extend(vs)
+
+    if to_embed:
+        embs = rag.embed(to_embed)
+        pos = 0
+        for i in idx:
+            a = embs[pos]
+            vs = embs[pos + 1: pos + 1 + len(vars_per_item[i])]
+            scores[i] = float(np.clip(np.max(vs @ a), 0.0, 1.0))
+            pos += 1 + len(vars_per_item[i])
+    return scores
+
+
+#ocenjivanje ide iz vise niti zahteva (i rag-embed executor-a)
+def _count(key: str, n: int = 1):
+    with _stats_lock:
+        _stats[key] += n
+
+
+#lokalna odluka: dict za jasne slucajeve, None za one koje treba poslati LLM-u.
+#hashing backend meri samo preklapanje reci: parafraza ima nisku slicnost (ne odbija se lokalno), a
+#odgovor sa istim recima i drugim smislom visoku (prihvata se samo poklapanje reci, score 1.0)
+def _decide(score: float):
+    hashing = embedders.configured_backend() == "hashing"
+    if score >= (1.0 if hashing else ACCEPT):
+        _count("local_accept")
+        return {"correct": True, "reason": f"Lokalna ocena: odgovor se poklapa sa tačnim ({score:.2f}).", "local": True}
+    if score <= REJECT and not hashing:
+        _count("local_reject")
+        return {"correct": False, "reason": f"Lokalna ocena: odgovor se ne poklapa sa tačnim ({score:.2f}).", "local": True}
+    return None
+
+
+def _fallback(score: float) -> dict:
+    ok = score >= FALLBACK_ACCEPT
+    return {"correct": ok, "reason": f"Lokalna ocena ({score:.2f}); AI ocena nije stigla na vreme.", "local": True}
+
+
+def fallback_batch(items: list) -> list:
+    """Grade everything locally, without a gray zone (used when the deadline leaves no time for the LLM)."""
+    deadlines.degrade("grade:local")
+    return [_fallback(sc) for sc in score_batch(items)]
+
+
+def _local_pass(items: list):
+    scores = score_batch(items)
+    results = [_decide(sc) for sc in scores]
+    borderline = [i for i, r in enumerate(results) if r is None]
+    _count("graded", len(items))
+    _count("escalated", len(borderline))
+    return results, borderline, scores
+
+
+def grade_batch(items: list, provider) -> list:
+    results, borderline, scores = _local_pass(items)
+    if borderline:
+        try:
+            escalated = provider.grade_freeform_batch([items[i] for i in borderline])
+        except deadlines.DeadlineExceeded:
+            deadlines.degrade("grade:local")
+            escalated = [_fallback(scores[i]) for i in borderline]
+        for i, res in zip(borderline, escalated):
+            results[i] = res
+    return results
+
+
+async def agrade_batch(items: list, provider) -> list:
+    results, borderline, scores = await rag.run_blocking(_local_pass, items)
+    if borderline:
+        try:
+            escalated = await provider.agrade_freeform_batch([items[i] for i in borderline])
+        except deadlines.DeadlineExceeded:
+            deadlines.degrade("grade:local")
+            escalated = [_fallback(scores[i]) for i in borderline]
+        for i, res in zip(borderline, escalated):
+            results[i] = res
+    return results
+
+
+def stats() -> dict:
+    with _stats_lock:
+        out = dict(_stats)
+    out["escalation_rate"] = out["escalated"] / out["graded"] if out["graded"] else 0.0
+    return out
@@ -1,69 +1,221 @@
-import os
+import re
+import math
 import textwrap
-from ai_providers.groq_provider import GroqProvider
-from ai_providers.local_stub import LocalStub
+from ai_providers.factory import lazy_provider
+import deadlines
 
 
-def _get_provider():
-    if os.getenv("GROQ_API_KEY"):
-        try:
-            return GroqProvider(model=os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile"))
-        except Exception:
-            pass
-    return LocalStub()
+_provider = lazy_provider("planner")
+_get_provider = _provider.get
 
-def _chat(system: str, user: str) -> str:
-    prov = _get_provider()
-    try:
-        return prov._chat(system, user)
-    except Exception:
-        return (
-            "Tehnika učenja: Fokus blokovi (45/10) — duži fokus + kratke pauze.\n\n"
-            "Dnevni plan (primer):\n"
-            "- 13:00–13:45 Učenje\n- 13:45–13:55 Pauza\n- 13:55–14:40 Učenje\n"
-            "- ... (nastavi po istom obrascu do ciljnih minuta)\n\n"
-            "Preporuke: utišaj notifikacije, jednominutni reset daha, voda pri ruci, kratke šetnje.\n"
-            "Motivacija: „Napredak, ne perfekcija.“"
-        )
-
-SYSTEM_PLANNER = """\
-You are a specialized study coach. ALWAYS reply in the SAME LANGUAGE as the user input.
-
-HARD CONSTRAINTS (all must be satisfied):
-- Exactly {days} days.
-- Study sessions MUST fill the full daily window ({start_time}–{end_time}), including both study blocks and breaks.
-- Total EFFECTIVE study time per day (learning + review, excluding breaks) must be {daily_min}±15 minutes.
-- Break duration and frequency should depend on the chosen learning technique (e.g. Pomodoro → 5-min breaks, Focus blocks → 10-min, one long break after ~4 blocks).
-- No overlapping or repeated time ranges; times strictly increase within a day.
-- If constraints are too tight, adjust break distribution or block duration, but NEVER exceed the time window.
-
-OUTPUT (exact sections in this order, no extra chatter):
-1) Tehnika učenja: <naziv> — <kratko zašto baš ta tehnika s obzirom na ciljeve i napomene>
-2) Dnevni plan (za {days} dana):
-   - Dan X ({start_time}–{end_time}):
-     - <HH:MM–HH:MM> · Učenje/Obnavljanje/Vežbanje (+ ako ima strana, navedite realan raspon)
-     - Pauze: prilagoditi dužinu prema tehnici, tako da se ceo dan završi u {end_time}
-     - Ukupno efektivno: ~{daily_min} min
-3) Preporuke za fokus/koncentraciju (3–5 kratkih, praktičnih saveta prilagođenih napomenama)
-4) Motivacioni citat (jedna rečenica)
-
-VALIDATION (do it silently before you answer):
-- [✔] Exactly {days} days
-- [✔] Daily schedule fits fully into {start_time}–{end_time}
-- [✔] No overlaps; strictly increasing times
-- [✔] Daily effective minutes = {daily_min}±15
-- [✔] Breaks adjusted according to technique
+
+# ============== LOKALNI RASPORED ==============
+# Raspored blokova i pauza racuna se lokalno (bez LLM-a); LLM pise samo obrazlozenje, savete i citat.
+
+TECHNIQUES = {
+    "pomodoro": {
+        "name": "Pomodoro (25/5)", "study": 25, "break": 5, "long_break": 15, "cycle": 4,
+        "why": "kratki blokovi i česte pauze drže pažnju kada je koncentracija problem",
+    },
+    "focus": {
+        "name": "Fokus blokovi (45/10)", "study": 45, "break": 10, "long_break": 20, "cycle": 3,
+        "why": "duži fokus uz kratke pauze odgovara većem dnevnom obimu gradiva",
+    },
+    "deep": {
+        "name": "Duboki rad (90/15)", "study": 90, "break": 15, "long_break": 30, "cycle": 2,
+        "why": "dugi neprekidni blokovi za zahtevno gradivo koje traži dublje razumevanje",
+    },
+}
+
+LONG_BREAK_MAX = 120   # najduza pauza kada se visak prozora rasporedjuje u duge pauze
+TOLERANCE = 15         # dozvoljeno odstupanje efektivnih minuta
+
+_FOCUS_WORDS = ("koncentr", "fokus", "pažnj", "paznj", "adhd", "concentrat", "distract", "focus")
+
+
+def choose_technique(profile: dict) -> str:
+    chosen = (profile.get("technique") or "auto").strip().lower()
+    if chosen in TECHNIQUES:
+        return chosen
+    notes = f"{profile.get('notes') or ''} {profile.get('goals') or ''}".lower()
+    daily = int(profile.get("daily_minutes") or 360)
+    if any(w in notes for w in _FOCUS_WORDS) or daily < 120:
+        return "pomodoro"
+    if (profile.get("level") or "") == "PhD" and daily >= 240:
+        return "deep"
+    return "focus"
+
+
+_HHMM_RE = re.compile(r"^\s*(\d{1,2}):(\d{2})\s*$")
+
+
+def _parse_hhmm(s: str) -> int:
+    m = _HHMM_RE.match(s or "")
+    if not m or int(m.group(1)) > 23 or int(m.group(2)) > 59:
+        raise ValueError(f"Neispravno vreme {s!r}, očekivan format HH:MM (npr. 13:00).")
+    return int(m.group(1)) * 60 + int(m.group(2))
+
+
+def _fmt(minutes: int) -> str:
+    minutes %= 24 * 60
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def _window(start_time: str, end_time: str):
+    start = _parse_hhmm(start_time)
+    end = _parse_hhmm(end_time)
+    if end <= start:
+        end += 24 * 60   # prozor prelazi ponoc
+    return start, end
+
+
+def _day_layout(start: int, end: int, target: int, tech: dict, warnings: list):
+    window = end - start
+    L, B, LB, cycle = tech["study"], tech["break"], tech["long_break"], tech["cycle"]
+
+    n = max(1, math.ceil(target / L))
+    breaks = [LB if (i + 1) % cycle == 0 else B for i in range(n - 1)]
+    if target + sum(breaks) > window:
+        breaks = [B] * (n - 1)
+    if target + sum(breaks) > window:
+        # ni sa kratkim pauzama ne staje: broj blokova (<= n) koji daje najvise ucenja u prozoru,
+        # blokovi najvise L minuta, pauze B izmedju njih
+        n, target = max(((k, min(target, k * L, window - B * (k - 1))) for k in range(1, n + 1)),
+                        key=lambda kt: (kt[1], -kt[0]))
+        breaks = [B] * (n - 1)
+        warnings.append(f"Dnevni cilj je smanjen na {target} min da bi plan stao u prozor.")
+
+    # visak prozora ide u duge pauze (do LONG_BREAK_MAX), ostatak je slobodno vreme na kraju
+    slack = window - target - sum(breaks)
+    long_idx = [i for i, b in enumerate(breaks) if b == LB and LB != B]
+    for i in long_idx:
+        extra = min(slack // max(1, len(long_idx)), LONG_BREAK_MAX - breaks[i])
+        if extra > 0:
+            breaks[i] += extra
+            slack -= extra
+
+    base, rem = divmod(target, n)
+    blocks = [base + (1 if i < rem else 0) for i in range(n)]
+
+    slots = []
+    t = start
+    for i, length in enumerate(blocks):
+        slots.append((t, t + length, "study"))
+        t += length
+        if i < len(breaks):
+            slots.append((t, t + breaks[i], "break"))
+            t += breaks[i]
+    return slots, target
+
+
+#poslednji dan: obnavljanje i vezbanje naizmenicno, a poslednji blok je samoprovera
+def _last_day_label(k: int, n: int) -> str:
+    if n == 1:
+        return "Obnavljanje i vežbanje celog gradiva"
+    if k == n - 1:
+        return "Samoprovera (probni test)"
+    return "Obnavljanje gradiva" if k % 2 == 0 else "Vežbanje zadataka"
+
+
+def build_schedule(profile: dict) -> dict:
+    start_time = (profile.get("start_time") or "13:00").strip()
+    end_time   = (profile.get("end_time") or "03:00").strip()
+    daily_min  = int(profile.get("daily_minutes") or 360)
+    days       = max(1, int(profile.get("days") or 10))
+
+    key = choose_technique(profile)
+    tech = TECHNIQUES[key]
+    start, end = _window(start_time, end_time)
+    warnings = []
+    slots, effective = _day_layout(start, end, daily_min, tech, warnings)
+
+    plan_days = []
+    study_idx = [i for i, s in enumerate(slots) if s[2] == "study"]
+    for d in range(days):
+        last_day = d == days - 1
+        day = []
+        for i, (a, b, kind) in enumerate(slots):
+            if kind == "break":
+                label = "Duga pauza" if b - a > tech["break"] else "Pauza"
+            elif last_day:
+                label = _last_day_label(study_idx.index(i), len(study_idx))
+            elif i == study_idx[-1] and len(study_idx) > 1:
+                label = "Obnavljanje"
+            else:
+                label = "Učenje"
+            day.append((a, b, label, kind))
+        plan_days.append(day)
+
+    return {
+        "technique": key, "tech": tech, "start": start, "end": end,
+        "start_time": start_time, "end_time": end_time,
+        "daily_min": daily_min, "effective": effective, "days": plan_days, "warnings": warnings,
+    }
+
+
+def validate_schedule(sched: dict) -> list:
+    """Return the list of violated constraints (empty when the plan is valid)."""
+    errors = []
+    for n, day in enumerate(sched["days"], 1):
+        prev = sched["start"]
+        study = 0
+        for a, b, _, kind in day:
+            if a < prev or b <= a:
+                errors.append(f"Dan {n}: vremena se preklapaju ili ne rastu")
+            prev = b
+            if kind == "study":
+                study += b - a
+        if day and day[-1][1] > sched["end"]:
+            errors.append(f"Dan {n}: plan izlazi iz prozora {sched['start_time']}–{sched['end_time']}")
+        if abs(study - sched["effective"]) > TOLERANCE:
+            errors.append(f"Dan {n}: efektivno {study} min umesto {sched['effective']}±{TOLERANCE}")
+    return errors
+
+
+def format_schedule(sched: dict) -> str:
+    lines = [f"Tehnika učenja: {sched['tech']['name']}", "", f"Dnevni plan (za {len(sched['days'])} dana):"]
+    for n, day in enumerate(sched["days"], 1):
+        lines.append(f"- Dan {n} ({sched['start_time']}–{sched['end_time']}):")
+        for a, b, label, _ in day:
+            lines.append(f"  - {_fmt(a)}–{_fmt(b)} · {label}")
+        if day and day[-1][1] < sched["end"]:
+            lines.append(f"  - {_fmt(day[-1][1])}–{_fmt(sched['end'])} · Slobodno")
+        lines.append(f"  - Ukupno efektivno: {sched['effective']} min")
+    for w in sched["warnings"] + validate_schedule(sched):
+        lines.append(f"Napomena: {w}")
+    return "\n".join(lines) + "\n\n"
+
+
+# ============== PROZA (LLM) ==============
+
+SYSTEM_PROSE = """\
+You are a study coach. The study schedule is ALREADY computed; do not write or change any schedule.
+ALWAYS reply in the SAME LANGUAGE as the user's request.
+Write exactly these sections, nothing else:
+Zašto ova tehnika: <1–2 sentences why the given technique fits the goals and notes>
+Preporuke za fokus/koncentraciju:
+- <3–5 short practical tips adapted to the notes>
+Motivacioni citat: <one sentence>
 """
 
-def _build_user_prompt(profile: dict, ask: str) -> str:
+
+def _default_prose(sched: dict) -> str:
+    return (
+        f"Zašto ova tehnika: {sched['tech']['why']}.\n"
+        "Preporuke za fokus/koncentraciju:\n"
+        "- utišaj notifikacije i drži telefon van stola\n"
+        "- na početku bloka zapiši jedan konkretan cilj\n"
+        "- u pauzi ustani, protegni se i popij vodu\n"
+        "- na kraju dana kratko ponovi ključne pojmove\n"
+        "Motivacioni citat: „Napredak, ne perfekcija.“"
+    )
+
+
+def _build_user_prompt(profile: dict, ask: str, sched: dict) -> str:
     level        = (profile.get("level") or "Undergraduate").strip()
     style        = (profile.get("learning_style") or "mixed").strip()
     goals        = (profile.get("goals") or "").strip()
     notes        = (profile.get("notes") or "").strip()
-    start_time   = (profile.get("start_time") or "13:00").strip()
-    end_time     = (profile.get("end_time") or "03:00").strip()
-    daily_min    = int(profile.get("daily_minutes") or 360)
-    days         = int(profile.get("days") or 10)
 
     return textwrap.dedent(f"""\
         PROFIL:
@@ -75,29 +227,56 @@ def _build_user_prompt(profile: dict, ask: str) -> str:
         ZAHTEV:
         {ask}
 
-        PARAMETRI:
-        - Broj dana: {days}
-        - Dnevno efektivno učenje: {daily_min} min (±15)
-        - Prozor učenja: {start_time}–{end_time}
-
-        Upute:
-        - Ne izmišljaj parametre koje nisam dao.
-        - Drži se prozora i minuta; ako je potrebno, prilagodi sadržaj (ne minute).
-        - Jasne stavke po vremenskim intervalima, bez tabela, bez suvišnog teksta.
+        TEHNIKA: {sched['tech']['name']}, {sched['effective']} min dnevno, {len(sched['days'])} dana
     """)
 
 
+def _chat(system: str, user: str, fallback: str) -> str:
+    prov = _get_provider()
+    try:
+        return prov._chat(system, user, op="planner")
+    except Exception:
+        deadlines.degrade("planner:template")
+        return fallback
+
+def _chat_stream(system: str, user: str, fallback: str):
+    prov = _get_provider()
+    sent = False
+    try:
+        for tok in prov._chat_stream(system, user, op="planner"):
+            sent = True
+            yield tok
+    except Exception:
+        if not sent:
+            deadlines.degrade("planner:template")
+            yield fallback
+
+async def _achat(system: str, user: str, fallback: str) -> str:
+    prov = _get_provider()
+    try:
+        return await prov._achat(system, user, op="planner")
+    except Exception:
+        deadlines.degrade("planner:template")
+        return fallback
+
+
+def _prepare(profile: dict, ask: str):
+    sched = build_schedule(profile)
+    return format_schedule(sched), (SYSTEM_PROSE, _build_user_prompt(profile, ask, sched), _default_prose(sched))
+
+
 def generate_personal_plan(profile: dict, ask: str) -> str:
-    start_time = (profile.get("start_time") or "13:00").strip()
-    end_time   = (profile.get("end_time") or "20:00").strip()
-    daily_min  = int(profile.get("daily_minutes") or 360)
-    days       = int(profile.get("days") or 10)
+    schedule, prose_args = _prepare(profile, ask)
+    return schedule + _chat(*prose_args).strip()
 
-    system = SYSTEM_PLANNER.format(
-        days=days,
-        start_time=start_time,
-        end_time=end_time,
-        daily_min=daily_min,
-    )
-    user = _build_user_prompt(profile, ask)
-    return _chat(system, user)
+
+async def agenerate_personal_plan(profile: dict, ask: str) -> str:
+    schedule, prose_args = _prepare(profile, ask)
+    return schedule + (await _achat(*prose_args)).strip()
+
+
+#raspored se salje odmah, proza se strimuje posle njega
+def stream_personal_plan(profile: dict, ask: str):
+    schedule, prose_args = _prepare(profile, ask)
+    yield schedule
+    yield from _chat_stream(*prose_args)
@@ -0,0 +1,184 @@
+# services/precompute.py
+# Priprema posle otpremanja: posle upload-a korisnik skoro uvek otvara sazetak, kviz ili kartice, pa se
+# u pozadini unapred pronalazi kontekst podrazumevanog upita za kviz (jedini pretrazivani upit koji
+# rute citaju bez korisnickog unosa), prave klasteri za podrazumevani spil i generise podrazumevani
+# sazetak. Radi jedna nit sa nizim prioritetom, a izmedju faza sacekuje dok traju zahtevi korisnika.
+# Spremnost se izvodi iz sacuvanih rezultata, pa je vidi svaki radnik; rute ih sluze odmah.
+# Iskljuceno je dok se ne ukljuci, jer trosi LLM pozive i za dokumente koje korisnik nece otvoriti.
+#
+#   PRECOMPUTE=1                        - sve faze
+#   PRECOMPUTE=contexts,cards,summary   - samo navedene faze; prazno ili 0 iskljucuje
+import os, sys, time, asyncio, threading
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import func
+
+import services.rag as rag
+import services.summarizer as summarizer
+import services.quizzer as quizzer
+import services.flashcards as fc
+from models import Document, Summary, BankQuestion
+import metrics
+
+STAGES = ("contexts", "cards", "summary")
+PRECOMPUTE_NICE = int(os.getenv("PRECOMPUTE_NICE", "10"))
+PRECOMPUTE_YIELD_S = float(os.getenv("PRECOMPUTE_YIELD_S", "10"))   # najduze cekanje na zahteve pre faze
+
+_Session = None
+_state = {}        # doc_id -> {"stage": faza u toku, "queued" ili None, "failed": [faze]} poslednjeg posla
+_lock = threading.Lock()
+_foreground = 0    # zahtevi korisnika u toku (ovaj proces)
+
+
+#na Linux-u nice vazi za nit, pa ostatak procesa zadrzava prioritet
+def _lower_priority():
+    if sys.platform.startswith("linux"):
+        try:
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), PRECOMPUTE_NICE)
+        except (OSError, AttributeError):
+            pass
+
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="precompute", initializer=_lower_priority)
+
+
+def configure(session_factory):
+    global _Session
+    _Session = session_factory
+
+
+def stages() -> tuple:
+    raw = (os.getenv("PRECOMPUTE") or "").strip().lower()
+    if not raw or raw == "0":
+        return ()
+    if raw == "1":
+        return STAGES
+    return tuple(s for s in STAGES if s in {p.strip() for p in raw.split(",")})
+
+
+#sazetak pravi faza summary (veliki dokument ide map-reduce putem, bez pretrage), a kartice se
+#prave iz klastera (faza cards), pa se unapred trazi samo podrazumevani upit kviza
+def queries() -> list:
+    return [quizzer.QUIZ_HINT]
+
+
+# ---- zahtevi korisnika imaju prednost ----
+
+def request_started():
+    global _foreground
+    with _lock:
+        _foreground += 1
+
+
+def request_finished():
+    global _foreground
+    with _lock:
+        _foreground = max(0, _foreground - 1)
+
+
+def _yield():
+    until = time.monotonic() + PRECOMPUTE_YIELD_S
+    while _foreground and time.monotonic() < until:
+        time.sleep(0.1)
+
+
+# ---- pokretanje ----
+
+def schedule(doc_id: int, text: str):
+    """Queue the post-ingest stages for doc_id (no-op unless PRECOMPUTE is set)."""
+    todo = stages()
+    if _Session is None or not todo:
+        return
+    st = {"stage": "queued", "failed": []}
+    with _lock:
+        _state[doc_id] = st
+    _executor.submit(_job, doc_id, text, todo, st)
+
+
+#upload brise sve dokumente; posao koji je vec u redu sam proverava da li njegov dokument jos postoji
+def reset():
+    with _lock:
+        _state.clear()
+
+
+def _job(doc_id: int, text: str, todo: tuple, st: dict):
+    s = _Session()
+    try:
+        created = _created(s, doc_id)
+        for stage in todo:
+            _yield()
+            # dokument je u medjuvremenu zamenjen novim otpremanjem (id moze biti isti)
+            if created is None or _created(s, doc_id) != created:
+                print(f"[precompute] doc {doc_id}: document replaced, stopping")
+                break
+            st["stage"] = stage
+            t0 = time.perf_counter()
+            try:
+                with metrics.stage(f"precompute.{stage}"):
+                    _run_stage(s, stage, doc_id, text, created)
+                metrics.inc("precompute_total", stage=stage, result="done")
+                print(f"[precompute] doc {doc_id}: {stage} in {time.perf_counter() - t0:.2f}s")
+            except Exception as e:
+                s.rollback()
+                metrics.inc("precompute_total", stage=stage, result="failed")
+                print(f"[precompute] doc {doc_id}: {stage} failed:", e)
+                st["failed"].append(stage)
+    finally:
+        st["stage"] = None
+        _Session.remove()
+
+
+def _created(s, doc_id: int):
+    s.expire_all()
+    return s.query(Document.created_at).filter_by(id=doc_id).scalar()
+
+
+def _run_stage(s, stage: str, doc_id: int, text: str, created):
+    if stage == "contexts":
+        rag.ensure_index(doc_id, text)
+        rag.prefetch(doc_id, queries())
+    elif stage == "cards":
+        fc.prepare(doc_id, text)
+    elif stage == "summary":
+        if ready_summary(s, doc_id) is not None:
+            return
+        data = asyncio.run(summarizer.asummarize_via_rag(
+            doc_id, text, query="", max_chunks=summarizer.PAGE_MAX_CHUNKS, top_k=summarizer.PAGE_TOP_K))
+        if not (data.get("summary") or "").strip():
+            raise ValueError("empty summary")
+        if _created(s, doc_id) != created:
+            return
+        s.add(Summary(document_id=doc_id, title=data["title"], text=data["summary"], word_count=data["word_count"]))
+        s.commit()
+
+
+# ---- spremnost ----
+
+def ready_summary(s, doc_id: int):
+    """Newest summary of the current document (ids are reused after a new upload), or None."""
+    return (s.query(Summary).join(Document, Document.id == Summary.document_id)
+            .filter(Summary.document_id == doc_id, Summary.created_at >= Document.created_at)
+            .order_by(Summary.id.desc()).first())
+
+
+def status(s, doc_id: int) -> dict:
+    """Readiness of doc_id: {"ready": {...}, "summary_id", "bank_questions", "stage", "pending", "failed"}."""
+    with _lock:
+        st = dict(_state.get(doc_id) or {})
+    sm = ready_summary(s, doc_id)
+    bank = (s.query(func.count(BankQuestion.id))
+            .filter(BankQuestion.document_id == doc_id, BankQuestion.times_used == 0).scalar())
+    ready = {
+        "index": rag.has_index(doc_id),
+        "contexts": rag.has_prefetched(doc_id, queries()),
+        "cards": fc.has_clusters(doc_id),
+        "summary": sm is not None,
+    }
+    running = st.get("stage")
+    return {
+        "ready": ready,
+        "summary_id": sm.id if sm else None,
+        "bank_questions": int(bank or 0),
+        "stage": running,
+        "pending": [k for k in stages() if not ready[k] and running and k not in st.get("failed", [])],
+        "failed": list(st.get("failed", [])),
+    }
@@ -0,0 +1,235 @@
+# services/question_bank.py
+# Banka pitanja po dokumentu: puni se u pozadini posle otpremanja,
+# a kvizovi se sastavljaju uzorkovanjem iz nje bez novog LLM poziva.
+import os, random, asyncio, threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+import services.rag as rag
+import services.quizzer as quizzer
+from ai_providers.local_stub import LocalStub
+from models import BankQuestion
+import metrics
+import tracing
+
+BANK_TARGET = int(os.getenv("BANK_TARGET_PER_KIND", "20"))   # koliko neiskoriscenih pitanja po tipu drzimo
+BANK_LOW = int(os.getenv("BANK_LOW_WATERMARK", "8"))         # ispod ovoga se banka dopunjava
+BANK_GROUP_CHUNKS = 3
+BANK_PER_GROUP = 2
+BANK_CONCURRENCY = int(os.getenv("BANK_CONCURRENCY", "4"))
+BANK_DUP_SIM = float(os.getenv("BANK_DUP_SIM", "0.92"))
+BANK_HINT_TOP_K = 4
+
+_Session = None
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="question-bank")
+_running = {}        # doc_id -> generacija posla u redu ili u toku
+_generation = 0      # raste kad otpremanje obrise banku; stariji poslovi tada ne upisuju nista
+_lock = threading.Lock()
+
+
+def configure(session_factory):
+    global _Session
+    _Session = session_factory
+
+
+# ---- punjenje ----
+
+def schedule_fill(doc_id: int, text: str):
+    """Queue a background fill for doc_id; no-op if one is already queued or running."""
+    if _Session is None:
+        return
+    with _lock:
+        if doc_id in _running:
+            return
+        gen = _running[doc_id] = _generation
+    _executor.submit(_fill_job, doc_id, text, gen)
+
+
+def schedule_add(doc_id: int, items: list, used: bool = True):
+    """Store freshly generated quiz items in the bank in the background."""
+    if _Session is None or not items:
+        return
+    _executor.submit(_add_job, doc_id, items, used, _generation)
+
+
+#id dokumenta se posle novog otpremanja ponovo koristi, pa se proverava generacija, a ne samo id
+def _current(gen: int) -> bool:
+    return gen == _generation
+
+
+#proverava se tik pred commit: generisanje i embedding traju, a upload u medjuvremenu brise banku
+def _commit(s, gen: int) -> bool:
+    if not _current(gen):
+        s.rollback()
+        return False
+    s.commit()
+    return True
+
+
+def _fill_job(doc_id: int, text: str, gen: int):
+    try:
+        added = asyncio.run(_fill(doc_id, text, gen))
+        print(f"[bank] doc {doc_id}: +{added} questions")
+    except Exception as e:
+        print(f"[bank] fill failed for doc {doc_id}:", e)
+    finally:
+        _Session.remove()
+        with _lock:
+            if _running.get(doc_id) == gen:
+                del _running[doc_id]
+
+
+def _add_job(doc_id: int, items: list, used: bool, gen: int):
+    try:
+        s = _Session()
+        if _current(gen):
+            _store(s, doc_id, items, used=used)
+            _commit(s, gen)
+    except Exception as e:
+        print(f"[bank] store failed for doc {doc_id}:", e)
+    finally:
+        _Session.remove()
+
+
+def _fresh_counts(rows) -> Counter:
+    return Counter(r.kind for r in rows if not r.times_used)
+
+
+async def _fill(doc_id: int, text: str, gen: int) -> int:
+    prov = quizzer.get_provider()
+    if isinstance(prov, LocalStub) or not _current(gen):
+        # stub nema pitanja vezana za dokument, nema sta da se cuva
+        return 0
+    await rag.aensure_index(doc_id, text)
+    _, chunks = rag.load_index(doc_id)
+    if not chunks:
+        return 0
+
+    s = _Session()
+    rows = s.query(BankQuestion).filter_by(document_id=doc_id).all()
+    fresh = _fresh_counts(rows)
+    need = {k: max(0, BANK_TARGET - fresh[k]) for k in quizzer.KINDS}
+    if not any(need.values()):
+        return 0
+
+    # najmanje pokrivene grupe chunkova idu prve
+    covered = Counter(r.chunk_index for r in rows)
+    groups = [list(range(i, min(i + BANK_GROUP_CHUNKS, len(chunks))))
+              for i in range(0, len(chunks), BANK_GROUP_CHUNKS)]
+    groups.sort(key=lambda g: sum(covered[c] for c in g))
+    n_groups = min(len(groups), -(-max(need.values()) // BANK_PER_GROUP))
+
+    sem = asyncio.Semaphore(BANK_CONCURRENCY)
+
+    async def one(group):
+        cfg = {k: (BANK_PER_GROUP if need[k] > 0 else 0) for k in quizzer.KINDS}
+        cfg['difficulties'] = ['Easy', 'Medium', 'Hard']
+        async with sem:
+            raw = await prov.agenerate_quiz("\n\n".join(chunks[c] for c in group), cfg)
+        return quizzer.normalize_items(raw)
+
+    results = await asyncio.gather(*[one(g) for g in groups[:n_groups]], return_exceptions=True)
+    items = [it for res in results if not isinstance(res, Exception) for it in res if it['prompt']]
+    if not _current(gen):
+        return 0
+    added = _store(s, doc_id, items, used=False)
+    return added if _commit(s, gen) else 0
+
+
+#upis uz uklanjanje duplikata po slicnosti embedding-a i oznaku izvornog chunka
+def _store(s, doc_id: int, items: list, used: bool = False) -> int:
+    if not items:
+        return 0
+    rows = s.query(BankQuestion).filter_by(document_id=doc_id).all()
+    chunk_embs, _ = rag.load_index(doc_id)
+    embs = rag.embed([f"{it['prompt']} {it.get('correct') or ''}" for it in items]).astype(np.float32)
+    # pitanja sacuvana pod drugim embedding backend-om mogu imati drugu dimenziju
+    kept = [e for e in (np.frombuffer(r.embedding, dtype=np.float32) for r in rows if r.embedding)
+            if e.shape[0] == embs.shape[1]]
+
+    added = 0
+    for it, e in zip(items, embs):
+        if kept and float(np.max(np.stack(kept) @ e)) >= BANK_DUP_SIM:
+            continue
+        kept.append(e)
+        chunk_index = int(np.argmax(chunk_embs @ e)) if chunk_embs is not None and len(chunk_embs) else -1
+        s.add(BankQuestion(
+            document_id=doc_id, kind=it['kind'], difficulty=it['difficulty'], prompt=it['prompt'],
+            options=it.get('options'), correct_answer=it.get('correct'), explanation=it.get('explanation'),
+            chunk_index=chunk_index, embedding=e.tobytes(), times_used=1 if used else 0,
+        ))
+        added += 1
+    return added
+
+
+def reset(s, doc_id: int = None):
+    """Delete bank rows (all of them without doc_id); a full reset also voids queued and running fills."""
+    global _generation
+    q = s.query(BankQuestion)
+    if doc_id is not None:
+        q = q.filter_by(document_id=doc_id)
+    else:
+        with _lock:
+            _generation += 1
+            _running.clear()
+    q.delete(synchronize_session=False)
+
+
+# ---- sastavljanje kviza ----
+
+def _pick(cands: list, n: int, difficulties: list) -> list:
+    #redom po tezinama, manje koriscena pitanja prva
+    random.shuffle(cands)
+    cands.sort(key=lambda r: r.times_used or 0)
+    cands = [r for r in cands if (r.difficulty or 'easy') in difficulties]
+    picked = []
+    for i in range(n):
+        want = difficulties[i % len(difficulties)]
+        row = next((r for r in cands if r.difficulty == want), None) or (cands[0] if cands else None)
+        if row is None:
+            break
+        cands.remove(row)
+        picked.append(row)
+    return picked
+
+
+async def assemble(s, doc_id: int, cfg: dict, user_hint: str = "", text: str = ""):
+    """Sample a quiz from the bank.
+
+    Returns (items, missing) where missing holds the per-kind counts the bank
+    could not provide. With a user_hint only questions from the chunks that
+    best match the hint are eligible.
+    """
+    with tracing.span("bank.assemble", doc=doc_id):
+        return await _assemble(s, doc_id, cfg, user_hint, text)
+
+
+async def _assemble(s, doc_id: int, cfg: dict, user_hint: str, text: str):
+    want = quizzer.wanted(cfg)
+    difficulties = [d.lower() for d in cfg.get('difficulties', ['Easy', 'Medium', 'Hard'])]
+    rows = s.query(BankQuestion).filter_by(document_id=doc_id).all()
+
+    if user_hint.strip() and rows:
+        hits = await rag.aretrieve(doc_id, user_hint, top_k=BANK_HINT_TOP_K)
+        allowed = {h["index"] for h in hits}
+        rows = [r for r in rows if r.chunk_index in allowed]
+
+    items, missing = [], {}
+    for k in quizzer.KINDS:
+        picked = _pick([r for r in rows if r.kind == k], want[k], difficulties)
+        missing[k] = want[k] - len(picked)
+        if want[k]:
+            metrics.cache("question_bank", not missing[k])
+        for r in picked:
+            r.times_used = (r.times_used or 0) + 1
+            items.append({
+                'kind': r.kind, 'difficulty': r.difficulty, 'prompt': r.prompt, 'options': r.options,
+                'correct': r.correct_answer, 'explanation': r.explanation,
+            })
+
+    all_rows = s.query(BankQuestion).filter_by(document_id=doc_id).all()
+    fresh = _fresh_counts(all_rows)
+    if text and any(fresh[k] < BANK_LOW for k in quizzer.KINDS):
+        schedule_fill(doc_id, text)
+    return items, missing
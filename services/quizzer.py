@@ -1,39 +1,22 @@
 # services/quizzer.py
-import os, random
-from ai_providers.local_stub import LocalStub
-from ai_providers.groq_provider import GroqProvider
+import os, random, asyncio
+from ai_providers.factory import lazy_provider
 import services.rag as rag
-from groq._exceptions import RateLimitError
+import services.local_grader as local_grader
+import tracing
+import deadlines
 
 
-_provider = None
-_provider_name = "stub"
+_provider = lazy_provider("quizzer")
+get_provider = _provider.get
+set_provider = _provider.set          # benchmark i testovi
+get_provider_name = _provider.name
 
-
-def _get_provider():
-    global _provider, _provider_name
-    if _provider is not None:
-        return _provider
-
-    if os.getenv("GROQ_API_KEY"):
-        try:
-            _provider = GroqProvider(model=os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile"))
-            _provider_name = "groq"
-            return _provider
-        except Exception as e:
-            print("Groq init failed:", e)
-
-    _provider = LocalStub()
-    _provider_name = "stub"
-    return _provider
-
-
-def get_provider_name():
-    _get_provider()
-    return _provider_name
+# lokalni ocenjivac (embedding) ispred LLM-a; LOCAL_GRADER=0 ga iskljucuje
+USE_LOCAL_GRADER = os.getenv("LOCAL_GRADER", "1") != "0"
 
 #standardizacija pitanja koja dolaze iz LLM-a
-def _normalize_items(items: list) -> list:
+def normalize_items(items: list) -> list:
     norm = []
     for it in items:
         kind = (it.get('kind', '') or '').lower()
@@ -121,64 +104,162 @@ def _normalize_items(items: list) -> list:
             })
     return norm
 
-#osiguravanje tacnog broja pitanja po tipu, dopuna iz stub-a ako treba
-def _enforce_counts(items: list, cfg: dict, context_text: str) -> list:
-    want = {
-        'mcq': int(cfg.get('mcq', 5)),
-        'tf': int(cfg.get('tf', 5)),
-        'short': int(cfg.get('short', 5)),
-        'fill': int(cfg.get('fill', 5)),
-    }
-    buckets = {'mcq': [], 'tf': [], 'short': [], 'fill': []}
-    for it in items:
-        k = it.get('kind', '').lower()
-        if k in buckets:
-            buckets[k].append(it)
-
-    for k in buckets:
-        buckets[k] = buckets[k][:want[k]]
-
-    stub = LocalStub()
-    for k in buckets:
-        need = want[k] - len(buckets[k])
-        if need > 0:
-            stub_cfg = {'mcq': 0, 'tf': 0, 'short': 0, 'fill': 0}
-            stub_cfg[k] = need
-            add = stub.generate_quiz(context_text[:2000], stub_cfg) or []
-            add = _normalize_items(add)
-            buckets[k].extend(add[:need])
+QUIZ_HINT = "Generate diverse exam questions about key facts, definitions, formulas and relationships from the document."
 
-    out = []
-    for k in ('mcq', 'tf', 'short', 'fill'):
-        out.extend(buckets[k])
+KINDS = ('mcq', 'tf', 'short', 'fill')
+
+# velicina jednog paralelnog zahteva, rok za ceo kviz i broj krugova dopune
+QUIZ_BATCH = int(os.getenv("QUIZ_BATCH", "5"))
+QUIZ_DEADLINE_S = float(os.getenv("QUIZ_DEADLINE_S", "60"))
+QUIZ_TOPUP_ROUNDS = int(os.getenv("QUIZ_TOPUP_ROUNDS", "1"))
+QUIZ_MAX_PER_KIND = int(os.getenv("QUIZ_MAX_PER_KIND", "20"))   # najvise pitanja jedne vrste po kvizu
 
+#ako RAG ne vrati nista, uzimamo nasumican isecak teksta
+def _fallback_context(full_text: str) -> str:
+    words = full_text.split()
+    if len(words) > 600:
+        start = random.randint(0, max(0, len(words) - 450))
+        return " ".join(words[start:start + 450])
+    return full_text[:4000]
+
+#kljuc za izbacivanje duplikata: ista pitanja se od modela razlikuju u velikim slovima i razmacima
+def _prompt_key(prompt: str) -> str:
+    return " ".join((prompt or "").lower().split())
+
+#broj pitanja jedne vrste iz forme ili JSON-a, ogranicen na 0..QUIZ_MAX_PER_KIND
+def count(value) -> int:
+    return max(0, min(QUIZ_MAX_PER_KIND, int(value)))
+
+#ValueError/TypeError za neispravne brojeve; API ih proverava vec pri prijemu posla
+def config_from(src: dict) -> dict:
+    """Quiz config {mcq, tf, short, fill, difficulties} from a JSON job or API body."""
+    diffs = [d.capitalize() for d in (src.get('difficulties') or []) if d.capitalize() in ('Easy', 'Medium', 'Hard')]
+    cfg = {k: count(src.get(k, 5)) for k in KINDS}
+    cfg['difficulties'] = diffs or ['Easy', 'Medium', 'Hard']
+    return cfg
+
+def wanted(cfg: dict) -> dict:
+    return {k: max(0, int(cfg.get(k, 5))) for k in KINDS}
+
+#deli trazene brojeve na (tip, n) zahteve od najvise QUIZ_BATCH pitanja
+def _plan_batches(missing: dict) -> list:
+    out = []
+    for k in KINDS:
+        left = missing.get(k, 0)
+        while left > 0:
+            n = min(QUIZ_BATCH, left)
+            out.append((k, n))
+            left -= n
     return out
 
-#glavna funkcija za generisanje pitanja iz RAG konteksta
-def generate_from_rag(doc_id: int, full_text: str, config: dict, user_hint: str = ""):
-    prov = _get_provider()
-    hint = user_hint.strip() or "Generate diverse exam questions about key facts, definitions, formulas and relationships from the document."
-    context = rag.build_context(doc_id, hint, top_k=5, max_chars=2000)
-
-    if not context:
-        words = full_text.split()
-        if len(words) > 600:
-            start = random.randint(0, max(0, len(words) - 450))
-            context = " ".join(words[start:start + 450])
-        else:
-            context = full_text[:4000]
+#svaki zahtev dobija svoj isecak konteksta (round-robin preko pogodaka), offset menja isecke pri dopuni
+async def _context_slices(doc_id: int, full_text: str, hint: str, n: int, offset: int = 0) -> list:
+    hits = await rag.aretrieve(doc_id, hint, top_k=max(5, 2 * n))
+    if not hits:
+        return [_fallback_context(full_text) for _ in range(n)]
+    per = max(2, min(5, len(hits) // n))
+    slices = []
+    for i in range(n):
+        picked = []
+        for j in range(per):
+            h = hits[(i + offset + j * n) % len(hits)]["text"]
+            if h not in picked:
+                picked.append(h)
+        slices.append("\n\n".join(picked)[:2000])
+    return slices
 
+async def _generate_batch(prov, context: str, kind: str, n: int, difficulties: list) -> list:
+    cfg = {k: 0 for k in KINDS}
+    cfg[kind] = n
+    cfg['difficulties'] = difficulties
     try:
-        raw = prov.generate_quiz(context, config)
-    except RateLimitError:
-        raw = LocalStub().generate_quiz(context, config)
+        with tracing.span("quiz.batch", kind=kind, n=n):
+            raw = await prov.agenerate_quiz(context, cfg)
+    except Exception as e:
+        print(f"Quiz batch {kind}x{n} failed:", e)
+        return []
+    return [it for it in normalize_items(raw) if it['kind'] == kind and it['prompt']][:n]
+
+#glavna funkcija za generisanje pitanja iz RAG konteksta:
+#paralelni zahtevi po tipu/grupi, pa dopuna samo onoga sto fali, sve u okviru roka
+async def agenerate_from_rag(doc_id: int, full_text: str, config: dict, user_hint: str = ""):
+    prov = get_provider()
+    hint = user_hint.strip() or QUIZ_HINT
+    want = wanted(config)
+    difficulties = config.get('difficulties', ['Easy', 'Medium', 'Hard'])
+
+    loop = asyncio.get_running_loop()
+    # unutar roka zahteva, uz rezervu za upis i renderovanje
+    left = deadlines.remaining()
+    budget = QUIZ_DEADLINE_S if left is None else min(QUIZ_DEADLINE_S, left - deadlines.MIN_CALL_S)
+    deadline = loop.time() + budget
+    buckets = {k: [] for k in KINDS}
+    seen = set()
+    used_ctx = []
+
+    for rnd in range(QUIZ_TOPUP_ROUNDS + 1):
+        batches = _plan_batches({k: want[k] - len(buckets[k]) for k in KINDS})
+        remaining = deadline - loop.time()
+        if not batches or remaining <= 0:
+            break
+
+        slices = await _context_slices(doc_id, full_text, hint, len(batches), offset=rnd)
+        tasks = [asyncio.create_task(_generate_batch(prov, ctx, kind, n, difficulties))
+                 for (kind, n), ctx in zip(batches, slices)]
+        done, pending = await asyncio.wait(tasks, timeout=remaining)
+        for t in pending:
+            t.cancel()
+
+        for (kind, n), ctx, t in zip(batches, slices, tasks):
+            if t not in done:
+                continue
+            if ctx not in used_ctx:
+                used_ctx.append(ctx)
+            for it in t.result():
+                key = _prompt_key(it['prompt'])
+                if key in seen or len(buckets[kind]) >= want[kind]:
+                    continue
+                seen.add(key)
+                buckets[kind].append(it)
 
-    items = _normalize_items(raw)
-    items = _enforce_counts(items, config, context)
+    items = [it for k in KINDS for it in buckets[k]]
+    context = "\n\n".join(used_ctx)
+    if items and len(items) < sum(want.values()) and loop.time() >= deadline:
+        deadlines.degrade("quiz:partial")
+    if not items and sum(want.values()) > 0:
+        # nijedan zahtev nije uspeo (npr. rate limit); pozivalac prijavljuje gresku umesto izmisljenih pitanja
+        deadlines.degrade("quiz:failed")
     provider_name = prov.__class__.__name__.replace("Provider", "").lower()
     return items, context, provider_name
 
+def generate_from_rag(doc_id: int, full_text: str, config: dict, user_hint: str = ""):
+    return asyncio.run(agenerate_from_rag(doc_id, full_text, config, user_hint))
+
 #ocena odgovora korisnika od strane llm-a
 def grade_freeform(question: str, ground_truth: str, user_answer: str) -> dict:
-    prov = _get_provider()
+    prov = get_provider()
     return prov.grade_freeform(question, ground_truth, user_answer)
+
+async def agrade_freeform(question: str, ground_truth: str, user_answer: str) -> dict:
+    prov = get_provider()
+    return await prov.agrade_freeform(question, ground_truth, user_answer)
+
+#sve slobodne odgovore jednog kviza ocenjuje jednim pozivom;
+#uz lokalni ocenjivac LLM dobija samo granicne slucajeve
+def grade_freeform_batch(items: list) -> list:
+    prov = get_provider()
+    if USE_LOCAL_GRADER:
+        return local_grader.grade_batch(items, prov)
+    try:
+        return prov.grade_freeform_batch(items)
+    except deadlines.DeadlineExceeded:
+        return local_grader.fallback_batch(items)
+
+async def agrade_freeform_batch(items: list) -> list:
+    prov = get_provider()
+    if USE_LOCAL_GRADER:
+        return await local_grader.agrade_batch(items, prov)
+    try:
+        return await prov.agrade_freeform_batch(items)
+    except deadlines.DeadlineExceeded:
+        return await rag.run_blocking(local_grader.fallback_batch, items)
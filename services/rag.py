@@ -1,25 +1,54 @@
 # services/rag.py
-import os, json, math, re
+import os, json, math, re, asyncio, threading, contextvars
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 from typing import List, Dict
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
+from services import embedders
+import metrics
+import tracing
+import deadlines
 
 
 
 _embedder = None
+_embedder_lock = threading.Lock()
 
-def _get_model():
+# embedding je CPU-bound; async rute ga salju u ovaj pool da ne blokiraju event loop
+_executor = ThreadPoolExecutor(max_workers=int(os.getenv("RAG_EMBED_WORKERS", "2")),
+                               thread_name_prefix="rag-embed")
+
+# backend (RAG_EMBEDDER) se pravi tek ovde: rute bez embedding-a ne placaju import torch-a
+def _get_embedder() -> embedders.Embedder:
     global _embedder
     if _embedder is None:
-        _embedder = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
+        with _embedder_lock:
+            if _embedder is None:
+                with tracing.span("rag.load_model"):
+                    _embedder = embedders.create_embedder()
     return _embedder
 
+#samo ucitava model, bez encode-a: torch thread pool pokrenut pre fork-a moze da zablokira radnike
+def warmup():
+    """Load the embedding model now (e.g. in a gunicorn master with preload_app, so workers share it)."""
+    _get_embedder()
+
+#normalizovani embedding-zi za listu tekstova (koriste ga i drugi servisi, npr. lokalni ocenjivac)
+def embed(texts: List[str]) -> np.ndarray:
+    with metrics.stage("embed"):
+        return _get_embedder().encode(list(texts))
+
 def set_store_dir(root_dir: str):
     global RAG_ROOT
     RAG_ROOT = os.path.join(root_dir, "rag_store")
     os.makedirs(RAG_ROOT, exist_ok=True)
 
+#zajednicki direktorijum u rag store-u (npr. kes delimicnih sazetaka)
+def shared_dir(name: str) -> str:
+    assert RAG_ROOT, "Call set_store_dir(RUNTIME_DIR) first"
+    d = os.path.join(RAG_ROOT, name)
+    os.makedirs(d, exist_ok=True)
+    return d
+
 def _doc_dir(doc_id: int) -> str:
     assert RAG_ROOT, "Call set_store_dir(RUNTIME_DIR) first"
     d = os.path.join(RAG_ROOT, str(doc_id))
@@ -57,48 +86,89 @@ def _paths(doc_id: int):
     d = _doc_dir(doc_id)
     return {
         "emb": os.path.join(d, "embeddings.npy"),
-        "meta": os.path.join(d, "meta.json")
+        "meta": os.path.join(d, "meta.json"),
+        "info": os.path.join(d, "index.json"),
+        "hits": os.path.join(d, "prefetch.json"),
     }
 
 def build_index(doc_id: int, text: str, chunk_chars=800, overlap=120) -> Dict:
-    chunks = chunk_text(text, chunk_chars=chunk_chars, overlap=overlap)
-    model = _get_model()
-    embs = model.encode(chunks, convert_to_numpy=True, normalize_embeddings=True)
+    with metrics.stage("chunk"):
+        chunks = chunk_text(text, chunk_chars=chunk_chars, overlap=overlap)
+    _write_index(doc_id, chunks, embed(chunks))
+    return {"doc_id": doc_id, "chunks": len(chunks)}
 
+def _write_index(doc_id: int, chunks: List[str], embs: np.ndarray) -> np.ndarray:
     p = _paths(doc_id)
     np.save(p["emb"], embs)
     with open(p["meta"], "w", encoding="utf-8") as f:
         json.dump({"chunks": chunks}, f, ensure_ascii=False)
+    # backend se upisuje poslednji: indeks bez index.json (ili sa drugim backend-om) se gradi ponovo
+    with open(p["info"], "w", encoding="utf-8") as f:
+        json.dump({"embedder": _get_embedder().name, "dim": int(embs.shape[1]), "chunks": len(chunks)}, f)
+    return embs
 
-    return {"doc_id": doc_id, "chunks": len(chunks)}
+#backend kojim je indeks napravljen (None za stare indekse bez index.json)
+def index_backend(doc_id: int):
+    try:
+        with open(_paths(doc_id)["info"], "r", encoding="utf-8") as f:
+            return json.load(f).get("embedder")
+    except (OSError, ValueError):
+        return None
 
 def has_index(doc_id: int) -> bool:
     p = _paths(doc_id)
-    return os.path.exists(p["emb"]) and os.path.exists(p["meta"])
+    if not (os.path.exists(p["emb"]) and os.path.exists(p["meta"])):
+        return False
+    # vektori drugog backend-a nisu uporedivi sa upitom, pa takav indeks ne vazi
+    return index_backend(doc_id) == embedders.backend_name()
 
 def ensure_index(doc_id: int, text: str):
     if not has_index(doc_id):
+        if os.path.exists(_paths(doc_id)["emb"]):
+            print(f"[rag] doc {doc_id}: index built with {index_backend(doc_id)}, rebuilding with {embedders.backend_name()}")
         build_index(doc_id, text)
 
 def _load(doc_id: int):
     p = _paths(doc_id)
-    embs = np.load(p["emb"])
-    meta = json.load(open(p["meta"], "r", encoding="utf-8"))
+    with tracing.span("rag.load", doc=doc_id):
+        embs = np.load(p["emb"])
+        meta = json.load(open(p["meta"], "r", encoding="utf-8"))
     chunks = meta["chunks"]
     return embs, chunks
 
+#chunkovi i njihovi embedding-zi iz postojeceg indeksa
+def load_index(doc_id: int):
+    if not has_index(doc_id):
+        return None, []
+    return _load(doc_id)
+
 def retrieve(doc_id: int, query: str, top_k: int = 5) -> List[Dict]:
     if not has_index(doc_id):
         return []
+    hits = prefetched(doc_id, query, top_k)
+    if hits is not None:
+        return hits
+    # bez vremena za upit: pozivaoci koriste pocetak teksta umesto najrelevantnijih delova
+    if deadlines.expired():
+        deadlines.degrade("retrieve:skipped")
+        return []
+    with metrics.stage("retrieve"):
+        return _retrieve(doc_id, query, top_k)
 
+def _retrieve(doc_id: int, query: str, top_k: int) -> List[Dict]:
     embs, chunks = _load(doc_id)
-    model = _get_model()
-    qv = model.encode([query], convert_to_numpy=True, normalize_embeddings=True)
-    sims = cosine_similarity(qv, embs)[0] 
+    qv = embed([query])
+    # isto ime backend-a, a druga dimenzija (npr. promenjen model pod istim imenom, ostecen fajl):
+    # sacuvani chunkovi se ponovo ugradjuju umesto greske u mnozenju
+    if embs.ndim != 2 or embs.shape[1] != qv.shape[1]:
+        print(f"[rag] doc {doc_id}: index dim {embs.shape[-1]} != query dim {qv.shape[1]}, rebuilding")
+        embs = _write_index(doc_id, chunks, embed(chunks))
+    # embedding-zi su normalizovani, pa je skalarni proizvod isto sto i kosinusna slicnost
+    sims = embs @ qv[0]
     idxs = np.argsort(-sims)[:max(1, top_k)]
     out = []
     for i in idxs:
-        out.append({"text": chunks[int(i)], "score": float(sims[int(i)])})
+        out.append({"text": chunks[int(i)], "score": float(sims[int(i)]), "index": int(i)})
     return out
 
 def build_context(doc_id: int, query: str, top_k: int = 5, max_chars: int = 15000) -> str:
@@ -106,3 +176,82 @@ def build_context(doc_id: int, query: str, top_k: int = 5, max_chars: int = 1500
     hits = retrieve(doc_id, query, top_k=top_k) or []
     combined = "\n\n".join(h["text"] for h in hits)
     return combined[:max_chars] if combined else ""
+
+
+# ---- unapred pronadjeni konteksti (precompute posle otpremanja) ----
+
+PREFETCH_TOP_K = int(os.getenv("RAG_PREFETCH_TOP_K", "20"))
+_prefetch_memo = {}   # putanja -> (mtime_ns, sadrzaj fajla)
+
+#verzija indeksa: izvedeni podaci (prefetch, klasteri kartica) vaze samo za indeks iz kog su nastali,
+#a id-jevi dokumenata se posle novog otpremanja ponovo dodeljuju
+def index_stamp(doc_id: int):
+    try:
+        return os.stat(_paths(doc_id)["emb"]).st_mtime_ns
+    except OSError:
+        return None
+
+def prefetch(doc_id: int, queries: List[str], top_k: int = PREFETCH_TOP_K) -> int:
+    """Retrieve and store hits for standard queries; retrieve() then serves them without embedding or search."""
+    if not has_index(doc_id):
+        return 0
+    stamp = index_stamp(doc_id)
+    with metrics.stage("retrieve"):
+        hits = {q: _retrieve(doc_id, q, top_k) for q in queries}
+    p = _paths(doc_id)["hits"]
+    with open(p + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"stamp": stamp, "embedder": _get_embedder().name, "top_k": top_k, "hits": hits}, f,
+                  ensure_ascii=False)
+    os.replace(p + ".tmp", p)
+    return len(hits)
+
+def _prefetch_data(doc_id: int) -> dict:
+    p = _paths(doc_id)["hits"]
+    try:
+        mtime = os.stat(p).st_mtime_ns
+    except OSError:
+        return {}
+    memo = _prefetch_memo.get(p)
+    if memo is None or memo[0] != mtime:
+        try:
+            with open(p, "r", encoding="utf-8") as f:
+                memo = _prefetch_memo[p] = (mtime, json.load(f))
+        except (OSError, ValueError):
+            return {}
+    data = memo[1]
+    if data.get("stamp") != index_stamp(doc_id) or data.get("embedder") != embedders.backend_name():
+        return {}
+    return data
+
+#pogoci istog upita za manji top_k su prefiks sacuvanih, pa vaze za svaki top_k <= sacuvanog
+def prefetched(doc_id: int, query: str, top_k: int = 5):
+    data = _prefetch_data(doc_id)
+    if not data:
+        return None
+    hits = data["hits"].get(query)
+    hit = hits is not None and top_k <= data["top_k"]
+    metrics.cache("retrieve_prefetch", hit)
+    return hits[:max(1, top_k)] if hit else None
+
+def has_prefetched(doc_id: int, queries: List[str]) -> bool:
+    data = _prefetch_data(doc_id)
+    return bool(data) and all(q in data["hits"] for q in queries)
+
+
+# ---- async varijante (embedding se izvrsava u _executor) ----
+
+#blokirajuci posao (embedding, pretraga, klasterovanje) iz async koda; koriste ga i drugi servisi
+async def run_blocking(fn, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    # run_in_executor ne prenosi contextvars, a bez njih spanovi iz pool-a ne bi imali roditelja
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(_executor, lambda: ctx.run(fn, *args, **kwargs))
+
+async def aensure_index(doc_id: int, text: str):
+    return await run_blocking(ensure_index, doc_id, text)
+
+async def aretrieve(doc_id: int, query: str, top_k: int = 5) -> List[Dict]:
+    return await run_blocking(retrieve, doc_id, query, top_k=top_k)
+
+async def aprefetch(doc_id: int, queries: List[str], top_k: int = PREFETCH_TOP_K) -> int:
+    return await run_blocking(prefetch, doc_id, queries, top_k=top_k)
@@ -0,0 +1,22 @@
+# services/streaming.py
+import json, time
+
+
+#meri vreme do prvog tokena (TTFT) i ukupno trajanje strima
+def timed_tokens(tokens, label: str, stats: dict = None):
+    stats = stats if stats is not None else {}
+    t0 = time.perf_counter()
+    stats["ttft_ms"] = None
+    for tok in tokens:
+        if stats["ttft_ms"] is None:
+            stats["ttft_ms"] = (time.perf_counter() - t0) * 1000
+            print(f"[stream:{label}] TTFT {stats['ttft_ms']:.0f} ms")
+        yield tok
+    stats["total_ms"] = (time.perf_counter() - t0) * 1000
+    print(f"[stream:{label}] total {stats['total_ms']:.0f} ms")
+
+
+#formatiranje jednog server-sent eventa; data je JSON da bi novi redovi prezivljavali
+def sse(data, event: str = None) -> str:
+    out = f"event: {event}\n" if event else ""
+    return out + f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
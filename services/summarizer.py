@@ -1,28 +1,253 @@
 # services/summarizer.py
-import json
-from ai_providers.groq_provider import GroqProvider, SYSTEM_SUMMARIZER
+import os, json, queue, asyncio, hashlib, threading, contextvars, zlib
+from ai_providers.factory import lazy_provider
+from ai_providers.prompts import SYSTEM_SUMMARIZER
 import services.rag as rag
+import metrics
 
-_provider = GroqProvider()
+_provider = lazy_provider("summarizer")
+get_provider = _provider.get
+
+DEFAULT_QUERY = "Sažmi glavne ideje, definicije, relacije i primere iz dokumenta."
+
+# podrazumevani sazetak dokumenta (stranica sazetka i priprema posle otpremanja)
+PAGE_MAX_CHUNKS = 5
+PAGE_TOP_K = 5
+
+# map-reduce: velicina grupe chunkova, budzet jednog reduce koraka i broj paralelnih poziva
+SUMMARY_GROUP_CHARS = int(os.getenv("SUMMARY_GROUP_CHARS", "6000"))
+SUMMARY_REDUCE_CHARS = int(os.getenv("SUMMARY_REDUCE_CHARS", "8000"))
+SUMMARY_CONCURRENCY = int(os.getenv("SUMMARY_CONCURRENCY", "4"))
+# map-reduce tek za dokumente sa vise chunkova od ovoga; manji idu jednim pozivom nad najboljim chunkovima
+SUMMARY_MAPREDUCE_CHUNKS = int(os.getenv("SUMMARY_MAPREDUCE_CHUNKS", "12"))
+# najvise fajlova u kesu delimicnih sazetaka; najdavnije korisceni se brisu
+SUMMARY_CACHE_FILES = int(os.getenv("SUMMARY_CACHE_FILES", "2000"))
+
+
+class SummaryError(RuntimeError):
+    """Raised when no part of the document could be summarized."""
+
+
+SYSTEM_MAP = (
+    "You summarize ONE section of a longer document for a later merge step. "
+    "Write in the SAME language as the section. "
+    "Keep every key concept, definition, term, name, formula and number; drop examples and filler. "
+    "Dense bullet-style notes, no introduction, no conclusion. Do not invent content."
+)
+
+SYSTEM_REDUCE = (
+    "You merge partial notes of consecutive sections of one document into a single set of notes. "
+    "Write in the SAME language as the notes. "
+    "Keep all key concepts, definitions, terms and relations; remove repetition; keep document order. "
+    "Dense bullet-style notes only. Do not invent content."
+)
 
 def _chat(system: str, user: str) -> str:
-    return _provider._chat(system, user)
+    return get_provider()._chat(system, user, op="summary")
+
+async def _achat(system: str, user: str) -> str:
+    return await get_provider()._achat(system, user, op="summary")
 
 def summarize(text: str) -> dict:
-    resp = _provider.summarize(text)
+    resp = get_provider().summarize(text)
     return resp
 
+async def asummarize(text: str) -> dict:
+    return await get_provider().asummarize(text)
+
+#naslov i broj reci sacuvanog sazetka; isto za blokirajuci i strim put
+def result(summary: str) -> dict:
+    summary = (summary or "").strip()
+    return {"title": "Sažetak", "summary": summary, "word_count": len(summary.split())}
+
+
+# ---- map-reduce ----
+
+#granice grupa zavise od sadrzaja chunka, pa izmena u dokumentu menja samo susedne grupe
+def _group_chunks(chunks: list) -> list:
+    groups, buf = [], []
+    size = 0
+    for c in chunks:
+        buf.append(c)
+        size += len(c)
+        boundary = zlib.crc32(c.encode("utf-8")) % 4 == 0
+        if size >= SUMMARY_GROUP_CHARS or (boundary and size >= SUMMARY_GROUP_CHARS // 2):
+            groups.append("\n\n".join(buf))
+            buf, size = [], 0
+    if buf:
+        groups.append("\n\n".join(buf))
+    return groups
+
+#pakuje delimicne sazetke u grupe do SUMMARY_REDUCE_CHARS, najmanje dva po grupi
+def _reduce_batches(parts: list) -> list:
+    batches, buf, size = [], [], 0
+    for p in parts:
+        if len(buf) >= 2 and size + len(p) > SUMMARY_REDUCE_CHARS:
+            batches.append(buf)
+            buf, size = [], 0
+        buf.append(p)
+        size += len(p)
+    if buf:
+        if len(buf) == 1 and batches:
+            batches[-1].append(buf[0])
+        else:
+            batches.append(buf)
+    return batches
+
+#medjurezultati se cuvaju po hash-u (prompt + tekst grupe), pa se ponovo koriste
+def _cache_path(system: str, text: str) -> str:
+    key = hashlib.sha1((system + "\x00" + text).encode("utf-8")).hexdigest()
+    return os.path.join(rag.shared_dir("summary_parts"), key + ".txt")
+
+#mtime sluzi kao vreme poslednjeg koriscenja; preko SUMMARY_CACHE_FILES brisu se najstariji
+def _evict(d: str):
+    try:
+        names = os.listdir(d)
+        if len(names) <= SUMMARY_CACHE_FILES:
+            return
+        paths = sorted((os.path.join(d, n) for n in names), key=os.path.getmtime)
+        for path in paths[:len(paths) - SUMMARY_CACHE_FILES]:
+            os.remove(path)
+    except OSError:
+        pass   # drugi radnik je vec obrisao isti fajl
+
+async def _cached_chat(system: str, text: str, sem: asyncio.Semaphore) -> str:
+    path = _cache_path(system, text)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            out = f.read()
+        os.utime(path)
+        metrics.cache("summary_parts", True)
+        return out
+    except FileNotFoundError:
+        pass
+    metrics.cache("summary_parts", False)
+    async with sem:
+        out = (await _achat(system, text) or "").strip()
+    if out:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(out)
+        _evict(os.path.dirname(path))
+    return out
+
+async def _doc_chunks(doc_id: int, full_text: str) -> list:
+    await rag.aensure_index(doc_id, full_text)
+    _, chunks = rag.load_index(doc_id)
+    return chunks or rag.chunk_text(full_text)
+
+#map nad grupama, pa hijerarhijski reduce dok sve ne stane u jedan finalni poziv;
+#progress(faza, gotovo, ukupno) se zove posle svakog zavrsenog poziva
+async def _map_reduce_parts(chunks: list, progress=None) -> list:
+    sem = asyncio.Semaphore(SUMMARY_CONCURRENCY)
+    groups = _group_chunks(chunks)
+    if len(groups) <= 1:
+        return groups
+
+    async def run(stage: str, system: str, texts: list) -> list:
+        done = 0
+
+        async def one(text):
+            nonlocal done
+            out = await _cached_chat(system, text, sem)
+            done += 1
+            if progress:
+                progress(stage, done, len(texts))
+            return out
+
+        return [p for p in await asyncio.gather(*[one(t) for t in texts]) if p]
+
+    parts = await run("map", SYSTEM_MAP, groups)
+    while len(parts) > 1 and sum(len(p) for p in parts) > SUMMARY_REDUCE_CHARS:
+        parts = await run("reduce", SYSTEM_REDUCE, ["\n\n".join(b) for b in _reduce_batches(parts)])
+    if not parts:
+        raise SummaryError("no part of the document could be summarized")
+    return parts
+
+async def asummarize_mapreduce(doc_id: int, full_text: str) -> dict:
+    parts = await _map_reduce_parts(await _doc_chunks(doc_id, full_text))
+    sem = asyncio.Semaphore(1)
+    return result(await _cached_chat(SYSTEM_SUMMARIZER, "\n\n".join(parts), sem))
+
+def summarize_mapreduce(doc_id: int, full_text: str) -> dict:
+    return asyncio.run(asummarize_mapreduce(doc_id, full_text))
+
+#ceo dokument (map-reduce) kada nema posebnog upita i dokument ima vise chunkova nego sto staje u jedan poziv
+def _use_mapreduce(doc_id: int, query: str, max_chunks: int) -> bool:
+    if query.strip():
+        return False
+    _, chunks = rag.load_index(doc_id)
+    return len(chunks) > max(max_chunks, SUMMARY_MAPREDUCE_CHUNKS)
+
+
+# ---- RAG sazetak ----
+
 def summarize_via_rag(doc_id: int, full_text: str, *, query: str = "",
                       max_chunks: int = 8, top_k: int = 10) -> dict:
     rag.ensure_index(doc_id, full_text)
-    q = (query or "Sažmi glavne ideje, definicije, relacije i primere iz dokumenta.").strip()
+    if _use_mapreduce(doc_id, query, max_chunks):
+        return summarize_mapreduce(doc_id, full_text)
+    q = (query or DEFAULT_QUERY).strip()
     hits = rag.retrieve(doc_id, q, top_k=top_k)
     if not hits:
         return summarize(full_text)
 
     chunks = [h["text"] for h in hits[:max_chunks]]
     combined = "\n\n".join(chunks)
-    reduced_raw = _chat(SYSTEM_SUMMARIZER, combined) or ""
-    summary = reduced_raw.strip()
-    wc = len(summary.split())
-    return {"title": "Sažetak", "summary": summary, "word_count": wc}
+    return result(_chat(SYSTEM_SUMMARIZER, combined))
+
+
+async def asummarize_via_rag(doc_id: int, full_text: str, *, query: str = "",
+                             max_chunks: int = 8, top_k: int = 10) -> dict:
+    await rag.aensure_index(doc_id, full_text)
+    if _use_mapreduce(doc_id, query, max_chunks):
+        return await asummarize_mapreduce(doc_id, full_text)
+    q = (query or DEFAULT_QUERY).strip()
+    hits = await rag.aretrieve(doc_id, q, top_k=top_k)
+    if not hits:
+        return await asummarize(full_text)
+
+    chunks = [h["text"] for h in hits[:max_chunks]]
+    combined = "\n\n".join(chunks)
+    return result(await _achat(SYSTEM_SUMMARIZER, combined))
+
+
+#map i reduce rade u pozadinskoj niti, a strim odmah salje napredak ({"stage", "done", "total"}),
+#pa finalni korak token po token. Ako klijent ode, nit zavrsava i puni kes za sledeci pokusaj.
+def _stream_mapreduce(chunks: list):
+    events = queue.Queue()
+
+    def work():
+        try:
+            parts = asyncio.run(_map_reduce_parts(chunks, lambda *p: events.put(("progress", p))))
+            events.put(("parts", parts))
+        except BaseException as e:
+            events.put(("error", e))
+
+    ctx = contextvars.copy_context()
+    threading.Thread(target=ctx.run, args=(work,), name="summary-map", daemon=True).start()
+    while True:
+        kind, val = events.get()
+        if kind == "progress":
+            stage, done, total = val
+            yield {"stage": stage, "done": done, "total": total}
+        elif kind == "error":
+            raise val
+        else:
+            break
+    yield from get_provider()._chat_stream(SYSTEM_SUMMARIZER, "\n\n".join(val), op="summary")
+
+#strim varijanta: vraca generator tokena, bez cekanja celog odgovora;
+#kod map-reduce generator pre tokena daje dict-ove sa napretkom
+def stream_summary_via_rag(doc_id: int, full_text: str, *, query: str = "",
+                           max_chunks: int = 8, top_k: int = 10):
+    rag.ensure_index(doc_id, full_text)
+    if _use_mapreduce(doc_id, query, max_chunks):
+        return _stream_mapreduce(rag.load_index(doc_id)[1])
+    q = (query or DEFAULT_QUERY).strip()
+    hits = rag.retrieve(doc_id, q, top_k=top_k)
+    if not hits:
+        return get_provider().summarize_stream(full_text)
+
+    chunks = [h["text"] for h in hits[:max_chunks]]
+    combined = "\n\n".join(chunks)
+    return get_provider()._chat_stream(SYSTEM_SUMMARIZER, combined, op="summary")
@@ -0,0 +1,26 @@
+// Prima SSE tokene sa servera i dopisuje ih u element kako stizu.
+// Strim se uvek zatvara na 'done'/'error', da EventSource ne bi ponovo pokrenuo generisanje.
+// 'progress' ({stage, done, total}) stize pre prvog tokena kod dugih dokumenata.
+function streamInto(url, el, onDone) {
+  const es = new EventSource(url);
+  let started = false;
+  el.textContent = '';
+  es.onmessage = (e) => {
+    if (!started) { el.textContent = ''; started = true; }
+    el.textContent += JSON.parse(e.data);
+  };
+  es.addEventListener('progress', (e) => {
+    const p = JSON.parse(e.data);
+    const what = p.stage === 'map' ? 'Sažimam delove dokumenta' : 'Spajam beleške';
+    if (!started) el.textContent = what + ': ' + p.done + '/' + p.total + '…';
+  });
+  es.addEventListener('done', (e) => {
+    es.close();
+    if (onDone) onDone(JSON.parse(e.data));
+  });
+  es.addEventListener('error', (e) => {
+    es.close();
+    if (e.data) el.textContent += '\n[Greška: ' + JSON.parse(e.data) + ']';
+  });
+  return es;
+}
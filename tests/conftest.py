@@ -0,0 +1,23 @@
+# tests/conftest.py
+# Testovi se pokrecu iz korena repozitorijuma (python -m pytest); moduli se uvoze kao u app.py.
+import os, sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from models import Base, Document
+
+
+@pytest.fixture
+def session():
+    """In-memory SQLite session with one document (id 1)."""
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    s = sessionmaker(bind=engine)()
+    s.add(Document(id=1, filename="a.txt", content="tekst"))
+    s.commit()
+    yield s
+    s.close()
+    engine.dispose()
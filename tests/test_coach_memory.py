@@ -0,0 +1,97 @@
+import json
+from services import coach_memory as cm
+
+CHUNKS = ["a" * 10, "b" * 10, "c" * 10, "d" * 10]
+
+
+def _hits(*ids):
+    return [{"index": i} for i in ids]
+
+
+def test_select_context_reuses_chunks_in_stable_order(session):
+    conv = cm.open_session(session, "", 1)
+    assert cm.select_context(conv, _hits(0, 1), CHUNKS) == [[0, 0], [1, 0]]
+    cm.add_turn(session, conv, "q1", "a1", [0, 1])
+    #vec poslat chunk samo dobija novi potez, novi ide na kraj
+    assert cm.select_context(conv, _hits(1, 2), CHUNKS) == [[0, 0], [1, 1], [2, 1]]
+    assert json.loads(conv.context) == [[0, 0], [1, 1], [2, 1]]
+
+
+def test_select_context_ignores_unknown_and_repeated_hits(session):
+    conv = cm.open_session(session, "", 1)
+    assert cm.select_context(conv, _hits(9, 0, 0, -1), CHUNKS) == [[0, 0]]
+
+
+def test_select_context_evicts_older_turns_first(session, monkeypatch):
+    monkeypatch.setattr(cm, "COACH_CONTEXT_CHARS", 25)
+    conv = cm.open_session(session, "", 1)
+    cm.select_context(conv, _hits(0, 1), CHUNKS)
+    cm.add_turn(session, conv, "q1", "a1", [0, 1])
+    assert cm.select_context(conv, _hits(2), CHUNKS) == [[1, 0], [2, 1]]
+
+
+def test_select_context_evicts_weakest_hit_of_this_turn(session, monkeypatch):
+    monkeypatch.setattr(cm, "COACH_CONTEXT_CHARS", 25)
+    conv = cm.open_session(session, "", 1)
+    assert cm.select_context(conv, _hits(3, 0, 1), CHUNKS) == [[3, 0], [0, 0]]
+
+
+def test_select_context_keeps_one_chunk_over_budget(session, monkeypatch):
+    monkeypatch.setattr(cm, "COACH_CONTEXT_CHARS", 5)
+    conv = cm.open_session(session, "", 1)
+    assert cm.select_context(conv, _hits(2, 1), CHUNKS) == [[2, 0]]
+
+
+def _conversation(session, n):
+    conv = cm.open_session(session, "", 1)
+    for i in range(n):
+        cm.add_turn(session, conv, f"pitanje {i}", f"Odgovor {i}. Detalji {i}.", [])
+    return conv
+
+
+class _Provider:
+    def __init__(self, out=None, error=None):
+        self.out, self.error, self.calls = out, error, []
+
+    def _chat(self, system, user, op=None):
+        self.calls.append(json.loads(user))
+        if self.error:
+            raise self.error
+        return self.out
+
+
+def test_due_waits_for_the_token_budget(session, monkeypatch):
+    conv = _conversation(session, 4)
+    assert cm._due(conv) == []
+    monkeypatch.setattr(cm, "COACH_MEMORY_TOKENS", 0)
+    monkeypatch.setattr(cm, "COACH_KEEP_TURNS", 2)
+    assert [t.question for t in cm._due(conv)] == ["pitanje 0", "pitanje 1"]
+
+
+def test_compact_merges_old_turns_into_summary(session, monkeypatch):
+    monkeypatch.setattr(cm, "COACH_MEMORY_TOKENS", 0)
+    monkeypatch.setattr(cm, "COACH_KEEP_TURNS", 2)
+    conv = _conversation(session, 3)
+    conv.summary = "stare beleske"
+    prov = _Provider(out="  nove beleske \n")
+    cm.compact(session, conv, prov)
+    assert prov.calls == [{"summary": "stare beleske", "turns": [{"q": "pitanje 0", "a": "Odgovor 0. Detalji 0."}]}]
+    assert conv.summary == "nove beleske"
+    assert [t.question for t in cm.recent(conv)] == ["pitanje 1", "pitanje 2"]
+
+
+def test_compact_falls_back_to_local_summary(session, monkeypatch):
+    monkeypatch.setattr(cm, "COACH_MEMORY_TOKENS", 0)
+    monkeypatch.setattr(cm, "COACH_KEEP_TURNS", 1)
+    conv = _conversation(session, 3)
+    cm.compact(session, conv, _Provider(error=RuntimeError("timeout")))
+    assert conv.summary == "- pitanje 0 → Odgovor 0.\n- pitanje 1 → Odgovor 1."
+    assert [t.question for t in cm.recent(conv)] == ["pitanje 2"]
+
+
+def test_compact_does_nothing_under_budget(session):
+    conv = _conversation(session, 3)
+    prov = _Provider(out="x")
+    cm.compact(session, conv, prov)
+    assert prov.calls == [] and conv.summary == ""
+    assert len(cm.recent(conv)) == 3
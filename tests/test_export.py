@@ -0,0 +1,52 @@
+import gzip
+from models import Document, Flashcard, Quiz, Question
+from services import export
+
+
+def _cards(s, doc_id, n):
+    for i in range(n):
+        s.add(Flashcard(document_id=doc_id, front=f"f{doc_id}-{i}", back="b"))
+    s.commit()
+
+
+def test_rows_cover_every_card_once_across_batches(session, monkeypatch):
+    monkeypatch.setattr(export, "BATCH", 3)
+    session.add(Document(id=2, filename="b.txt", content="x"))
+    _cards(session, 2, 4)
+    _cards(session, 1, 5)
+    rows = list(export.rows(session, "flashcards"))
+    assert [r["front"] for r in rows] == [f"f1-{i}" for i in range(5)] + [f"f2-{i}" for i in range(4)]
+    assert [r["document_id"] for r in export.rows(session, "flashcards", doc_id=2)] == [2] * 4
+
+
+def test_keyset_resumes_on_composite_key(session, monkeypatch):
+    monkeypatch.setattr(export, "BATCH", 2)
+    for quiz in range(2):
+        q = Quiz(document_id=1, total_questions=3)
+        session.add(q)
+        session.flush()
+        for i in range(3):
+            session.add(Question(quiz_id=q.id, kind="tf", difficulty="easy", prompt=f"q{quiz}-{i}"))
+    session.commit()
+    prompts = [r["prompt"] for r in export.rows(session, "quizzes")]
+    assert prompts == [f"q{quiz}-{i}" for quiz in range(2) for i in range(3)]
+
+
+def test_batches_do_not_hold_a_transaction(session, monkeypatch):
+    monkeypatch.setattr(export, "BATCH", 2)
+    _cards(session, 1, 5)
+    it = export.rows(session, "flashcards")
+    next(it)
+    assert not session.in_transaction()
+    # novi red posle poslednjeg procitanog kljuca ulazi u izvoz koji je u toku
+    _cards(session, 1, 1)
+    assert len(list(it)) == 5
+
+
+def test_csv_gzip_roundtrip(session):
+    _cards(session, 1, 2)
+    body = b"".join(export.encode(export.lines("flashcards", "csv", export.rows(session, "flashcards")),
+                                  compress=True))
+    text = gzip.decompress(body).decode("utf-8").splitlines()
+    assert text[0] == ",".join(export.FIELDS["flashcards"])
+    assert len(text) == 3
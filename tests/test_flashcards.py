@@ -0,0 +1,57 @@
+import asyncio
+import numpy as np
+from services import flashcards as fc
+
+
+def test_plan_starts_with_least_covered_clusters(monkeypatch):
+    monkeypatch.setattr(fc, "CARDS_PER_CLUSTER", 4)
+    assert fc._plan(np.array([3, 0, 1]), 6, 0) == [(1, 4), (2, 2)]
+
+
+def test_plan_wraps_around_and_rotates_by_round(monkeypatch):
+    monkeypatch.setattr(fc, "CARDS_PER_CLUSTER", 2)
+    assert fc._plan(np.array([0, 0]), 6, 0) == [(0, 2), (1, 2), (0, 2)]
+    assert fc._plan(np.array([0, 0]), 2, 1) == [(1, 2)]
+
+
+_VOCAB = {}
+
+
+#jedna dimenzija po reci: kartice istog teksta su identicne, a bez zajednickih reci ortogonalne
+def _embed(texts):
+    rows = np.zeros((len(texts), 64), dtype=np.float32)
+    for i, t in enumerate(texts):
+        for w in t.split():
+            rows[i, _VOCAB.setdefault(w, len(_VOCAB))] += 1.0
+    return rows / np.linalg.norm(rows, axis=1, keepdims=True)
+
+
+class _Provider:
+    def __init__(self, cards):
+        self.cards = cards
+
+    async def amake_flashcards(self, ctx, n):
+        return list(self.cards)
+
+
+def test_grow_deck_drops_near_duplicates(monkeypatch):
+    chunks = ["alfa tekst", "beta tekst"]
+
+    async def aensure_index(doc_id, text):
+        return None
+
+    monkeypatch.setattr(fc.rag, "aensure_index", aensure_index)
+    monkeypatch.setattr(fc.rag, "load_index", lambda doc_id: (_embed(chunks), chunks))
+    monkeypatch.setattr(fc.rag, "embed", _embed)
+    monkeypatch.setattr(fc, "doc_clusters", lambda doc_id, embs, k: (embs[:1], np.zeros(len(embs), dtype=int)))
+    prov = _Provider([
+        {"front": "alfa", "back": "prva"},     # vec u spilu
+        {"front": "beta", "back": "druga"},
+        {"front": "beta", "back": "druga"},    # duplikat nove kartice
+        {"front": "gama", "back": ""},         # bez odgovora
+        {"front": "delta", "back": "cetvrta"},
+    ])
+    monkeypatch.setattr(fc, "get_provider", lambda: prov)
+
+    out = asyncio.run(fc.agrow_deck(1, "tekst", [("alfa", "prva")], 10))
+    assert out == [{"front": "beta", "back": "druga"}, {"front": "delta", "back": "cetvrta"}]
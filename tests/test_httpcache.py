@@ -0,0 +1,63 @@
+import gzip
+from datetime import datetime
+import pytest
+from flask import Flask, flash
+import httpcache
+
+CREATED = datetime(2026, 1, 2, 3, 4, 5, 678000)
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    app.secret_key = "test"
+    app.after_request(httpcache.compress)
+    app.renders = 0
+
+    @app.get("/page")
+    def page():
+        tag = httpcache.etag("page", 1, CREATED)
+        resp = httpcache.not_modified(tag, CREATED)
+        if resp is not None:
+            return resp
+        app.renders += 1
+        return httpcache.cached("<p>" + "sadrzaj " * 500 + "</p>", tag, CREATED)
+
+    @app.get("/flash")
+    def with_flash():
+        flash("poruka")
+        return "ok"
+
+    c = app.test_client()
+    c.app = app
+    return c
+
+
+def test_matching_etag_short_circuits_before_render(client):
+    first = client.get("/page")
+    assert first.status_code == 200 and client.app.renders == 1
+    tag = first.headers["ETag"]
+    assert tag.startswith('W/"')
+    again = client.get("/page", headers={"If-None-Match": tag})
+    assert again.status_code == 304 and again.data == b""
+    assert again.headers["ETag"] == tag
+    assert client.app.renders == 1
+
+
+def test_if_modified_since_ignores_microseconds(client):
+    lm = client.get("/page").headers["Last-Modified"]
+    assert client.get("/page", headers={"If-Modified-Since": lm}).status_code == 304
+    assert client.get("/page", headers={"If-None-Match": 'W/"other"'}).status_code == 200
+
+
+def test_pending_flash_forces_render(client):
+    tag = client.get("/page").headers["ETag"]
+    client.get("/flash")
+    assert client.get("/page", headers={"If-None-Match": tag}).status_code == 200
+
+
+def test_large_html_is_gzipped(client):
+    resp = client.get("/page", headers={"Accept-Encoding": "gzip"})
+    assert resp.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(resp.data).startswith(b"<p>sadrzaj")
+    assert "Accept-Encoding" in resp.headers.get("Vary", "")
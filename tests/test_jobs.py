@@ -0,0 +1,78 @@
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy.orm import scoped_session, sessionmaker
+from models import Job
+from services import jobs, quizzer, flashcards as fc
+
+
+@pytest.fixture
+def registry(session, monkeypatch):
+    monkeypatch.setattr(jobs, "_handlers", {})
+    monkeypatch.setattr(jobs, "_checks", {})
+    factory = scoped_session(sessionmaker(bind=session.get_bind()))
+    monkeypatch.setattr(jobs, "_Session", factory)
+    yield session
+    factory.remove()
+
+
+def test_quiz_config_is_clamped_and_rejects_non_numbers(monkeypatch):
+    monkeypatch.setattr(quizzer, "QUIZ_MAX_PER_KIND", 20)
+    cfg = quizzer.config_from({"mcq": 10 ** 6, "tf": -3, "short": "4", "difficulties": ["hard", "bogus"]})
+    assert (cfg["mcq"], cfg["tf"], cfg["short"], cfg["fill"]) == (20, 0, 4, 5)
+    assert cfg["difficulties"] == ["Hard"]
+    with pytest.raises(ValueError):
+        quizzer.config_from({"mcq": "abc"})
+    with pytest.raises(TypeError):
+        quizzer.config_from({"mcq": [1]})
+
+
+@pytest.mark.parametrize("value", ["abc", "1.5", 0, -1, 201, True, None, ""])
+def test_deck_size_rejects_bad_counts(value, monkeypatch):
+    monkeypatch.setattr(fc, "CARDS_MAX", 200)
+    with pytest.raises(ValueError):
+        fc.deck_size(value)
+
+
+def test_deck_size_accepts_form_and_json_values(monkeypatch):
+    monkeypatch.setattr(fc, "CARDS_MAX", 200)
+    assert fc.deck_size("12") == 12 and fc.deck_size(200) == 200
+
+
+async def _noop(s, doc_id, params):
+    return {}
+
+
+def _reject_odd(params):
+    if params.get("n", 0) % 2:
+        raise ValueError("n must be even")
+
+
+def test_submit_runs_the_kind_check(registry):
+    jobs.register("even", _noop, _reject_odd)
+    with pytest.raises(ValueError, match="even"):
+        jobs.submit(registry, "even", 1, {"n": 3})
+    with pytest.raises(ValueError, match="unknown job type"):
+        jobs.submit(registry, "other", 1, {})
+    job = jobs.submit(registry, "even", 1, {"n": 2})
+    registry.commit()
+    assert registry.get(Job, job.id).status == "queued"
+
+
+def test_recover_fails_only_jobs_idle_past_the_limit(registry, monkeypatch):
+    monkeypatch.setattr(jobs, "JOBS_STALE_S", 60)
+    old = datetime.utcnow() - timedelta(seconds=120)
+    registry.add_all([
+        Job(id="queued-old", kind="quiz", status="queued", created_at=old),
+        Job(id="running-old", kind="quiz", status="running", created_at=old, started_at=old),
+        Job(id="running-new", kind="quiz", status="running", created_at=old, started_at=datetime.utcnow()),
+        Job(id="queued-new", kind="quiz", status="queued"),
+        Job(id="done-old", kind="quiz", status="done", created_at=old),
+    ])
+    registry.commit()
+    assert jobs.stale(registry.get(Job, "queued-old")) and not jobs.stale(registry.get(Job, "running-new"))
+    assert jobs.recover() == 2
+    registry.expire_all()
+    status = {j.id: j.status for j in registry.query(Job)}
+    assert status == {"queued-old": "failed", "running-old": "failed", "running-new": "running",
+                      "queued-new": "queued", "done-old": "done"}
+    assert registry.get(Job, "queued-old").error.startswith("interrupted")
@@ -0,0 +1,40 @@
+from ai_providers.json_extract import extract_json, sanitize_json, unwrap_list, json_list_or_empty
+
+
+def test_plain_object_and_list():
+    assert extract_json('{"a": 1}') == {"a": 1}
+    assert extract_json('[1, 2]') == [1, 2]
+
+
+def test_code_fence_and_prose_around_json():
+    assert extract_json('```json\n[{"a": 1}]\n```') == [{"a": 1}]
+    assert extract_json('Evo pitanja:\n[{"a": 1}]\nNadam se da pomaže.') == [{"a": 1}]
+
+
+def test_truncated_array_keeps_complete_items():
+    txt = '[{"prompt": "p1"}, {"prompt": "p2"}, {"prompt": "p3'
+    assert extract_json(txt) == [{"prompt": "p1"}, {"prompt": "p2"}]
+
+
+def test_broken_item_is_skipped():
+    txt = '[{"a": 1}, {"b": 2,,}, {"c": 3}]'
+    assert extract_json(txt) == [{"a": 1}, {"c": 3}]
+
+
+def test_brackets_inside_strings():
+    assert extract_json('[{"t": "x ] y { z"}, {"t": "w') == [{"t": "x ] y { z"}]
+
+
+def test_nothing_usable():
+    assert extract_json("Izvinite, ne mogu da generišem odgovor.") is None
+    assert extract_json("") is None
+    assert sanitize_json("bez json-a") == "[]"
+
+
+def test_unwrap_json_mode_wrapper():
+    assert unwrap_list({"items": [1]}) == [1]
+    assert unwrap_list({"cards": [2]}) == [2]
+    assert unwrap_list({"other": [3]}) == [3]
+    assert unwrap_list({"a": 1}) == []
+    assert json_list_or_empty('{"questions": [{"q": 1}]}') == [{"q": 1}]
+    assert json_list_or_empty("nista") == []
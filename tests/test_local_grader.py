@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+from services import local_grader
+
+
+@pytest.fixture
+def fake_embed(monkeypatch):
+    """Embedding by word overlap, so the tests need neither the model nor the index."""
+    vocab = {}
+
+    def embed(texts):
+        rows = []
+        for t in texts:
+            v = np.zeros(64, dtype=np.float32)
+            for w in t.split():
+                v[vocab.setdefault(w, len(vocab) % 64)] += 1.0
+            rows.append(v / (np.linalg.norm(v) or 1.0))
+        return np.stack(rows)
+
+    monkeypatch.setattr(local_grader.rag, "embed", embed)
+    monkeypatch.setenv("RAG_EMBEDDER", "float32")
+    return embed
+
+
+def test_normalize_strips_case_punctuation_and_diacritics():
+    assert local_grader.normalize("Đak, ČITA!") == "djak cita"
+
+
+def test_number_words_only_for_numeric_answers():
+    assert local_grader.normalize("pet slojeva") == "pet slojeva"
+    assert local_grader.normalize("pet slojeva", numbers=True) == "5 slojeva"
+    assert local_grader.is_numeric("5")
+    assert local_grader.is_numeric("five")
+    assert not local_grader.is_numeric("što je to")
+
+
+def test_variants_use_explicit_markers_only():
+    vs = local_grader.variants("epsilon (eps)", "Also known as neighbourhood radius, or something else.")
+    assert "eps" in vs and "epsilon" in vs and "neighbourhood radius" in vs
+    assert "something else" not in vs
+    assert local_grader.variants("precision or recall") == ["precision or recall"]
+    assert "recall" in local_grader.variants("precision / recall")
+
+
+def test_token_match_needs_near_equality():
+    assert local_grader._token_match("gradient descent", "gradient descent")
+    assert local_grader._token_match("descent gradient", "gradient descent")
+    assert not local_grader._token_match("gradient descent adam sgd momentum", "gradient descent")
+    assert not local_grader._token_match("nije gradient descent", "gradient descent")
+
+
+def test_score_batch(fake_embed):
+    items = [
+        {"ground_truth": "epsilon (eps)", "user_answer": "eps"},
+        {"ground_truth": "5", "user_answer": "pet"},
+        {"ground_truth": "sigmoid", "user_answer": ""},
+    ]
+    scores = local_grader.score_batch(items)
+    assert scores[0] == 1.0 and scores[1] == 1.0 and scores[2] == 0.0
+
+
+class _Provider:
+    def __init__(self):
+        self.seen = []
+
+    def grade_freeform_batch(self, items):
+        self.seen.extend(items)
+        return [{"correct": True, "reason": "llm"} for _ in items]
+
+
+def test_grade_batch_escalates_only_gray_zone(fake_embed, monkeypatch):
+    monkeypatch.setattr(local_grader, "ACCEPT", 0.85)
+    monkeypatch.setattr(local_grader, "REJECT", 0.2)
+    prov = _Provider()
+    items = [
+        {"question": "q1", "ground_truth": "confusion matrix", "user_answer": "confusion matrix"},
+        {"question": "q2", "ground_truth": "confusion matrix", "user_answer": "banana"},
+        {"question": "q3", "ground_truth": "true positive rate", "user_answer": "true positive share"},
+    ]
+    results = local_grader.grade_batch(items, prov)
+    assert results[0]["correct"] and results[0]["local"]
+    assert not results[1]["correct"] and results[1]["local"]
+    assert results[2] == {"correct": True, "reason": "llm"}
+    assert [it["question"] for it in prov.seen] == ["q3"]
+
+
+def test_hashing_backend_accepts_only_token_matches(monkeypatch):
+    monkeypatch.setenv("RAG_EMBEDDER", "hashing")
+    assert local_grader._decide(0.95) is None
+    assert local_grader._decide(0.1) is None
+    assert local_grader._decide(1.0)["correct"]
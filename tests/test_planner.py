@@ -0,0 +1,70 @@
+import pytest
+from services import planner
+
+
+def _sched(**kw):
+    profile = {"start_time": "13:00", "end_time": "03:00", "daily_minutes": 360, "days": 3, "technique": "focus"}
+    profile.update(kw)
+    return planner.build_schedule(profile)
+
+
+def _study(day):
+    return sum(b - a for a, b, _, kind in day if kind == "study")
+
+
+def test_default_profile_is_valid():
+    sched = _sched()
+    assert planner.validate_schedule(sched) == []
+    assert sched["effective"] == 360
+    assert all(_study(day) == 360 for day in sched["days"])
+
+
+@pytest.mark.parametrize("key", sorted(planner.TECHNIQUES))
+def test_blocks_never_exceed_technique_length(key):
+    sched = _sched(technique=key, daily_minutes=300)
+    limit = planner.TECHNIQUES[key]["study"]
+    assert all(b - a <= limit for day in sched["days"] for a, b, _, kind in day if kind == "study")
+    assert planner.validate_schedule(sched) == []
+
+
+def test_window_across_midnight():
+    sched = _sched(start_time="22:00", end_time="02:00", daily_minutes=180)
+    assert sched["end"] - sched["start"] == 240
+    assert planner.validate_schedule(sched) == []
+
+
+@pytest.mark.parametrize("start,end,expected", [
+    ("12:00", "12:50", 45),    # dva bloka 23+22 uz jednu pauzu
+    ("10:00", "12:00", 100),   # cetiri puna pomodora, ostatak slobodno
+])
+def test_short_window_shrinks_target_but_fills_window(start, end, expected):
+    sched = _sched(start_time=start, end_time=end, technique="pomodoro")
+    assert sched["effective"] == expected
+    assert sched["warnings"]
+    assert planner.validate_schedule(sched) == []
+
+
+def test_tiny_window_never_goes_negative():
+    sched = _sched(start_time="12:00", end_time="12:03", technique="deep")
+    assert sched["effective"] == 3
+    assert planner.validate_schedule(sched) == []
+
+
+def test_last_day_labels_differ():
+    sched = _sched(technique="pomodoro", daily_minutes=120)
+    labels = [label for _, _, label, kind in sched["days"][-1] if kind == "study"]
+    assert len(set(labels)) > 1
+    assert labels[-1] == "Samoprovera (probni test)"
+
+
+@pytest.mark.parametrize("bad", ["13", "25:00", "12:60", "ab:cd"])
+def test_bad_time_raises_value_error(bad):
+    with pytest.raises(ValueError):
+        _sched(start_time=bad)
+
+
+def test_choose_technique():
+    assert planner.choose_technique({"notes": "imam problem sa koncentracijom"}) == "pomodoro"
+    assert planner.choose_technique({"level": "PhD", "daily_minutes": 300}) == "deep"
+    assert planner.choose_technique({"daily_minutes": 300}) == "focus"
+    assert planner.choose_technique({"technique": "deep", "daily_minutes": 60}) == "deep"
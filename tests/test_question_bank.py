@@ -0,0 +1,44 @@
+import asyncio
+from models import BankQuestion
+from services import question_bank
+
+
+def _bank(s, rows):
+    for i, (kind, difficulty, chunk) in enumerate(rows):
+        s.add(BankQuestion(document_id=1, kind=kind, difficulty=difficulty, prompt=f"{kind} {difficulty} {i}",
+                           correct_answer="x", chunk_index=chunk, times_used=0))
+    s.commit()
+
+
+def _cfg(**kw):
+    cfg = {"mcq": 0, "tf": 0, "short": 0, "fill": 0, "difficulties": ["Easy", "Medium", "Hard"]}
+    cfg.update(kw)
+    return cfg
+
+
+def test_only_selected_difficulties_are_sampled(session):
+    _bank(session, [("mcq", "easy", 0), ("mcq", "hard", 0), ("mcq", "hard", 1), ("mcq", "medium", 2)])
+    items, missing = asyncio.run(question_bank.assemble(session, 1, _cfg(mcq=3, difficulties=["Hard"])))
+    assert [it["difficulty"] for it in items] == ["hard", "hard"]
+    assert missing == {"mcq": 1, "tf": 0, "short": 0, "fill": 0}
+
+
+def test_difficulties_alternate_and_use_marks_rows(session):
+    _bank(session, [("tf", "easy", 0), ("tf", "easy", 0), ("tf", "hard", 0), ("tf", "hard", 0)])
+    items, missing = asyncio.run(question_bank.assemble(session, 1, _cfg(tf=2, difficulties=["Easy", "Hard"])))
+    assert sorted(it["difficulty"] for it in items) == ["easy", "hard"]
+    assert not any(missing.values())
+    assert sorted(r.times_used for r in session.query(BankQuestion)) == [0, 0, 1, 1]
+
+
+def test_hint_limits_questions_to_matching_chunks(session, monkeypatch):
+    _bank(session, [("short", "easy", 0), ("short", "easy", 3), ("short", "medium", 3), ("short", "hard", 5)])
+
+    async def aretrieve(doc_id, query, top_k=5):
+        assert query == "entropija"
+        return [{"index": 3, "text": ""}]
+
+    monkeypatch.setattr(question_bank.rag, "aretrieve", aretrieve)
+    items, missing = asyncio.run(question_bank.assemble(session, 1, _cfg(short=3), user_hint="entropija"))
+    assert sorted(it["prompt"] for it in items) == ["short easy 1", "short medium 2"]
+    assert missing["short"] == 1
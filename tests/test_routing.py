@@ -0,0 +1,35 @@
+import pytest
+from ai_providers import routing
+
+
+@pytest.fixture(autouse=True)
+def _clean(monkeypatch):
+    monkeypatch.setattr(routing, "_latency", {})
+    monkeypatch.setattr(routing, "_offloaded", {})
+    monkeypatch.setenv("LLM_LATENCY_TARGET_MS", "quiz=1000")
+
+
+def test_default_routes():
+    assert routing.choose("grade", 100) == ("small", "op")
+    assert routing.choose("quiz", 100) == ("large", "op")
+
+
+def test_long_prompt_goes_to_large():
+    assert routing.choose("grade", 10_000) == ("large", "context")
+
+
+def test_slow_large_model_is_still_probed(monkeypatch):
+    monkeypatch.setattr(routing, "LATENCY_PROBE_EVERY", 5)
+    routing.record("quiz", "large", 3.0)
+    picks = [routing.choose("quiz", 100) for _ in range(10)]
+    assert picks.count(("large", "probe")) == 2
+    assert picks.count(("small", "latency")) == 8
+
+
+def test_probes_let_large_model_recover(monkeypatch):
+    monkeypatch.setattr(routing, "LATENCY_PROBE_EVERY", 1)
+    routing.record("quiz", "large", 3.0)
+    for _ in range(20):
+        tier, _ = routing.choose("quiz", 100)
+        routing.record("quiz", tier, 0.2)
+    assert routing.choose("quiz", 100) == ("large", "op")
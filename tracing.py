@@ -0,0 +1,106 @@
+# tracing.py
+# Lagano pracenje zahteva: ugnjezdeni spanovi preko contextvars, log sporih zahteva sa stablom spanova.
+import os, time, contextvars
+from contextlib import contextmanager
+
+TRACE_SLOW_MS = float(os.getenv("TRACE_SLOW_MS", "2000"))   # zahtevi sporiji od ovoga se loguju sa stablom
+TRACE_MIN_SPAN_MS = float(os.getenv("TRACE_MIN_SPAN_MS", "1"))   # kraci spanovi se ne ispisuju pojedinacno
+
+_current = contextvars.ContextVar("trace_span", default=None)
+
+
+class Span:
+    __slots__ = ("name", "attrs", "start", "end", "children")
+
+    def __init__(self, name: str, attrs: dict = None):
+        self.name = name
+        self.attrs = attrs or {}
+        self.start = time.perf_counter()
+        self.end = None
+        self.children = []
+
+    @property
+    def ms(self) -> float:
+        end = self.end if self.end is not None else time.perf_counter()
+        return (end - self.start) * 1000
+
+    def finish(self):
+        self.end = time.perf_counter()
+
+
+def begin(name: str, **attrs):
+    """Start a root span for the current request; returns (span, token) for finish()."""
+    root = Span(name, attrs)
+    return root, _current.set(root)
+
+
+def finish(root: Span, token) -> float:
+    root.finish()
+    _current.reset(token)
+    return root.ms
+
+
+def current():
+    return _current.get()
+
+
+#span van zahteva (bez roditelja) se ne pravi, pa instrumentacija u servisima ne kosta nista
+@contextmanager
+def span(name: str, **attrs):
+    parent = _current.get()
+    if parent is None:
+        yield None
+        return
+    s = Span(name, attrs)
+    parent.children.append(s)
+    token = _current.set(s)
+    try:
+        yield s
+    finally:
+        s.finish()
+        _current.reset(token)
+
+
+def start_span(name: str, **attrs):
+    """Leaf span that is finished manually (e.g. SQLAlchemy before/after events); None outside a trace."""
+    parent = _current.get()
+    if parent is None:
+        return None
+    s = Span(name, attrs)
+    parent.children.append(s)
+    return s
+
+
+def _label(s: Span) -> str:
+    attrs = " ".join(f"{k}={v}" for k, v in s.attrs.items())
+    return f"{s.name} {attrs}".strip()
+
+
+#uzastopni kratki spanovi istog imena (npr. db upiti) spajaju se u jedan red
+def _lines(s: Span, depth: int, out: list):
+    out.append(f"{'  ' * depth}{_label(s)}  {s.ms:.1f} ms")
+    i, kids = 0, s.children
+    while i < len(kids):
+        k = kids[i]
+        j = i
+        while j + 1 < len(kids) and kids[j + 1].name == k.name and not kids[j + 1].children \
+                and not k.children and kids[j + 1].ms < TRACE_MIN_SPAN_MS:
+            j += 1
+        if j > i:
+            total = sum(c.ms for c in kids[i:j + 1])
+            out.append(f"{'  ' * (depth + 1)}{k.name} x{j - i + 1}  {total:.1f} ms")
+        else:
+            _lines(k, depth + 1, out)
+        i = j + 1
+
+
+def format_tree(root: Span) -> str:
+    out = []
+    _lines(root, 0, out)
+    return "\n".join(out)
+
+
+def log_if_slow(root: Span, threshold_ms: float = None):
+    threshold_ms = TRACE_SLOW_MS if threshold_ms is None else threshold_ms
+    if root.ms >= threshold_ms:
+        print(f"[slow] {root.name} {root.ms:.0f} ms\n{format_tree(root)}")